@@ -17,15 +17,25 @@ from typing import List, Dict, Any, Optional, Tuple
 import fitz  # PyMuPDF
 import pymupdf4llm
 
+# Cache de respostas do consultarProcesso, compartilhado com o backend
+from backend.soap_cache import SoapCache
+
 # =========================
 # Configuração e constantes
 # =========================
-URL_WSDL = 'https://esaj.tjms.jus.br/mniws/servico-intercomunicacao-2.2.2/intercomunicacao?wsdl'
+URL_WSDL = os.getenv('TJMS_WSDL_URL', 'https://esaj.tjms.jus.br/mniws/servico-intercomunicacao-2.2.2/intercomunicacao?wsdl')
 WS_USER = "PGEMS"
 WS_PASS = "SAJ03PGEMS"
 
 REGEX_CONTEUDO = r"<ns2:conteudo>(.*?)</ns2:conteudo>"
 
+# Mesmo diretório e validade do cache do backend (TJMS_CACHE_*), em segundos
+CACHE_SOAP = SoapCache(
+    os.getenv("TJMS_CACHE_DIR", "soap_cache"),
+    float(os.getenv("TJMS_CACHE_TTL", "600")),
+    float(os.getenv("TJMS_CACHE_STALE_TTL", "3600")),
+)
+
 # Mapa de categorias (cdcategoria == tipoDocumento)
 CATEGORIAS_MAP = {
     "6": "Despacho",
@@ -161,12 +171,8 @@ def extrair_info_instancia(xml_text: str) -> Dict[str, Any]:
     except Exception as e:
         return {'erro': str(e)}
 
-def soap_buscar_processo_generico(session, numero_processo: str, timeout=60, debug=False) -> str:
-    """
-    Busca genérica do processo sem especificar classe processual específica.
-    Permite que o ESAJ encontre o processo em qualquer instância/classe.
-    """
-    xml_data = f'''
+def _envelope_consulta(numero_processo: str, incluir_documentos: bool) -> str:
+    return f'''
     <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ser="http://www.cnj.jus.br/servico-intercomunicacao-2.2.2/" xmlns:tip="http://www.cnj.jus.br/tipos-servico-intercomunicacao-2.2.2">
         <soapenv:Header/>
         <soapenv:Body>
@@ -175,44 +181,56 @@ def soap_buscar_processo_generico(session, numero_processo: str, timeout=60, deb
                 <tip:senhaConsultante>{WS_PASS}</tip:senhaConsultante>
                 <tip:numeroProcesso>{numero_processo}</tip:numeroProcesso>
                 <tip:movimentos>true</tip:movimentos>
-                <tip:incluirDocumentos>true</tip:incluirDocumentos>
+                <tip:incluirDocumentos>{"true" if incluir_documentos else "false"}</tip:incluirDocumentos>
             </ser:consultarProcesso>
         </soapenv:Body>
     </soapenv:Envelope>'''.strip()
 
-    if debug:
-        print(f"[DEBUG] Busca genérica para processo: {numero_processo}")
-    
+# Tamanho e latência das respostas de consultarProcesso, por modo
+# ("completo" = com metadados dos documentos, "movimentos" = sem)
+METRICAS_CONSULTA: Dict[str, Dict[str, float]] = {
+    modo: {"consultas": 0, "bytes": 0, "ms": 0.0} for modo in ("completo", "movimentos")
+}
+
+def _post_consulta(session, xml_data: str, incluir_documentos: bool, timeout, debug=False) -> str:
+    inicio = time.perf_counter()
     r = session.post(URL_WSDL, data=xml_data, timeout=timeout)
     r.raise_for_status()
+    ms = (time.perf_counter() - inicio) * 1000
+    metricas = METRICAS_CONSULTA["completo" if incluir_documentos else "movimentos"]
+    metricas["consultas"] += 1
+    metricas["bytes"] += len(r.content)
+    metricas["ms"] += ms
+    if debug:
+        print(f"[DEBUG] Resposta: {len(r.content)} bytes em {ms:.0f} ms (documentos: {incluir_documentos})")
     return r.text
 
-def soap_consultar_processo(session, numero_processo: str, timeout=60, debug=False) -> str:
-    xml_data = f'''
-    <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ser="http://www.cnj.jus.br/servico-intercomunicacao-2.2.2/" xmlns:tip="http://www.cnj.jus.br/tipos-servico-intercomunicacao-2.2.2">
-        <soapenv:Header/>
-        <soapenv:Body>
-            <ser:consultarProcesso>
-                <tip:idConsultante>{WS_USER}</tip:idConsultante>
-                <tip:senhaConsultante>{WS_PASS}</tip:senhaConsultante>
-                <tip:numeroProcesso>{numero_processo}</tip:numeroProcesso>
-                <tip:movimentos>true</tip:movimentos>
-                <tip:incluirDocumentos>true</tip:incluirDocumentos>
-            </ser:consultarProcesso>
-        </soapenv:Body>
-    </soapenv:Envelope>'''.strip()
+def soap_buscar_processo_generico(session, numero_processo: str, timeout=60, debug=False, incluir_documentos=True) -> str:
+    """
+    Busca genérica do processo sem especificar classe processual específica.
+    Permite que o ESAJ encontre o processo em qualquer instância/classe.
+    Com incluir_documentos=False a resposta traz só dados básicos e movimentos.
+    """
+    xml_data = _envelope_consulta(numero_processo, incluir_documentos)
+
+    if debug:
+        print(f"[DEBUG] Busca genérica para processo: {numero_processo}")
+    
+    return _post_consulta(session, xml_data, incluir_documentos, timeout, debug)
+
+def soap_consultar_processo(session, numero_processo: str, timeout=60, debug=False, incluir_documentos=True) -> str:
+    xml_data = _envelope_consulta(numero_processo, incluir_documentos)
 
     if debug:
         print(f"[DEBUG] XML sendo enviado:\n{xml_data}")
     
-    r = session.post(URL_WSDL, data=xml_data, timeout=timeout)
-    r.raise_for_status()
-    return r.text
+    return _post_consulta(session, xml_data, incluir_documentos, timeout, debug)
 
-def consultar_todas_instancias(session, numero_processo: str, timeout=60, debug=False) -> List[Dict[str, Any]]:
+def consultar_todas_instancias(session, numero_processo: str, timeout=60, debug=False, incluir_documentos=True, usar_cache=True) -> List[Dict[str, Any]]:
     """
     Busca o processo usando consulta genérica que permite o ESAJ 
-    encontrar automaticamente em todas as instâncias/classes processuais
+    encontrar automaticamente em todas as instâncias/classes processuais.
+    A resposta passa pelo CACHE_SOAP; usar_cache=False força nova consulta.
     """
     resultados = []
     
@@ -221,7 +239,12 @@ def consultar_todas_instancias(session, numero_processo: str, timeout=60, debug=
             print(f"[DEBUG] Buscando processo {numero_processo} em todas as instâncias...")
         
         # Faz busca genérica (sem especificar classe processual)
-        xml_response = soap_buscar_processo_generico(session, numero_processo, timeout, debug)
+        xml_response = CACHE_SOAP.get(
+            numero_processo,
+            "completo" if incluir_documentos else "movimentos",
+            lambda: soap_buscar_processo_generico(session, numero_processo, timeout, debug, incluir_documentos),
+            bypass=not usar_cache,
+        )
         
         # Verifica se a resposta indica sucesso
         if '<sucesso>true</sucesso>' in xml_response:
@@ -665,6 +688,9 @@ def _doc_matches_year(doc: Dict[str, Any], years: List[str]) -> bool:
 # =========================
 def processar_processos(cfg, log_queue, progress_callback):
     session = criar_sessao_com_retry()
+    # As métricas de consulta do resumo final são desta execução
+    for metricas in METRICAS_CONSULTA.values():
+        metricas.update(consultas=0, bytes=0, ms=0.0)
 
     total = min(cfg["max_processos"], len(cfg["processos"]))
     cont = 0
@@ -703,7 +729,9 @@ def processar_processos(cfg, log_queue, progress_callback):
             if cfg["multiplas_instancias"]:
                 log_queue.put("Buscando processo em todas as instâncias automaticamente...")
                 log_queue.put(f"[DEBUG] Timeout configurado: {cfg['timeout_consulta']}s")
-                resultados_instancias = consultar_todas_instancias(session, numero, timeout=cfg["timeout_consulta"], debug=True)
+                resultados_instancias = consultar_todas_instancias(
+                    session, numero, timeout=cfg["timeout_consulta"], debug=True, usar_cache=cfg["usar_cache"]
+                )
                 
                 if not resultados_instancias:
                     log_queue.put(f"[AVISO] Processo {numero} não encontrado em nenhuma instância")
@@ -847,6 +875,18 @@ def processar_processos(cfg, log_queue, progress_callback):
 
     log_queue.put("")
     log_queue.put(f"✔ Finalizado. Processos processados: {cont}/{total}")
+    if cfg["multiplas_instancias"] and CACHE_SOAP.enabled:
+        c = CACHE_SOAP.stats()
+        log_queue.put(
+            f"Cache de consultas: {c['hits']} acertos, {c['stale_hits']} desatualizados (revalidados), "
+            f"{c['misses']} faltas, {c['bypasses']} ignorados"
+        )
+    for modo, m in METRICAS_CONSULTA.items():
+        if m["consultas"]:
+            log_queue.put(
+                f"Consultas ao TJ-MS ({modo}): {m['consultas']:.0f}, média de "
+                f"{m['bytes'] / m['consultas'] / 1024:.0f} KB e {m['ms'] / m['consultas']:.0f} ms por resposta"
+            )
 
 # =========================
 # Interface Tkinter
@@ -871,6 +911,7 @@ class ESAJApp(tk.Tk):
         self.merge_pdfs = tk.BooleanVar(value=False)
         self.save_xml = tk.BooleanVar(value=False)
         self.multiplas_instancias = tk.BooleanVar(value=False)
+        self.usar_cache = tk.BooleanVar(value=True)
         self.filtrar_por_ano = tk.BooleanVar(value=False)
         self.ano_filtro = tk.StringVar(value="")
 
@@ -927,6 +968,7 @@ class ESAJApp(tk.Tk):
         ttk.Checkbutton(opt_frame, text="Juntar PDFs por processo (ordem cronológica)", variable=self.merge_pdfs).pack(side=tk.LEFT, padx=6, pady=4)
         ttk.Checkbutton(opt_frame, text="Salvar XML completo do processo", variable=self.save_xml).pack(side=tk.LEFT, padx=6, pady=4)
         ttk.Checkbutton(opt_frame, text="Busca automática em todas instâncias", variable=self.multiplas_instancias).pack(side=tk.LEFT, padx=6, pady=4)
+        ttk.Checkbutton(opt_frame, text="Usar cache de consultas", variable=self.usar_cache).pack(side=tk.LEFT, padx=6, pady=4)
         year_frame = ttk.Frame(opt_frame)
         year_frame.pack(side=tk.LEFT, padx=6, pady=4)
         ttk.Checkbutton(
@@ -1075,6 +1117,7 @@ class ESAJApp(tk.Tk):
             "merge_pdfs": bool(self.merge_pdfs.get()),
             "save_xml": bool(self.save_xml.get()),
             "multiplas_instancias": bool(self.multiplas_instancias.get()),
+            "usar_cache": bool(self.usar_cache.get()),
             "categorias": {cod: bool(var.get()) for cod, var in self.categorias_vars.items()},
             "filtrar_por_ano": bool(self.filtrar_por_ano.get()),
             "anos_filtro": anos_validos,
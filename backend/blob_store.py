@@ -0,0 +1,88 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Callable, Dict, Iterable, Tuple
+
+# Content-addressed store for raw SOAP responses: each blob is gzip-compressed
+# and saved as BLOB_DIR/<sha[:2]>/<sha[2:4]>/<sha>.gz, keyed by the sha256 of the
+# uncompressed bytes. Identical XML is therefore stored only once.
+BLOB_DIR = "blobs"
+COMPRESS_LEVEL = 6
+
+# Blobs are shared by content, so a blob one writer just replaced may be the one
+# another writer is about to reference. Writers pin what they store until the
+# rows pointing at it are committed, and delete_unreferenced skips pinned blobs
+# and re-checks references under the same lock.
+_lock = threading.Lock()
+_pins: Dict[str, int] = {}
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], f"{sha256}.gz")
+
+def has_blob(sha256: str) -> bool:
+    return os.path.exists(blob_path(sha256))
+
+def put_blob(data: bytes, pin: bool = False) -> Tuple[str, int]:
+    """
+    Stores data (if not already present) and returns its (sha256, size).
+    With pin=True the blob is protected from delete_unreferenced until unpin().
+    """
+    sha256 = content_hash(data)
+    path = blob_path(sha256)
+    with _lock:
+        if pin:
+            _pins[sha256] = _pins.get(sha256, 0) + 1
+        exists = os.path.exists(path)
+    # A pinned blob can't be deleted from under us, so write outside the lock
+    if not exists:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return sha256, len(data)
+
+def get_blob(sha256: str) -> bytes:
+    with open(blob_path(sha256), "rb") as f:
+        return gzip.decompress(f.read())
+
+def delete_blob(sha256: str):
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(path)
+
+def unpin(shas: Iterable[str]):
+    with _lock:
+        for sha256 in shas:
+            count = _pins.get(sha256, 0) - 1
+            if count > 0:
+                _pins[sha256] = count
+            else:
+                _pins.pop(sha256, None)
+
+def delete_unreferenced(shas: Iterable[str], is_referenced: Callable[[str], bool]):
+    """
+    Deletes each blob that is neither pinned nor is_referenced(sha256), both
+    checked under the store lock so no writer can pin it in between.
+    """
+    with _lock:
+        for sha256 in shas:
+            if sha256 not in _pins and not is_referenced(sha256):
+                delete_blob(sha256)
+
+def put_text(text: str, pin: bool = False) -> Tuple[str, int]:
+    return put_blob(text.encode("utf-8"), pin)
+
+def get_text(sha256: str) -> str:
+    return get_blob(sha256).decode("utf-8")
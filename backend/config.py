@@ -9,8 +9,53 @@ load_dotenv(dotenv_path=env_path)
 class Config:
     TJMS_USER = os.getenv("TJMS_USER", "PGEMS")
     TJMS_PASS = os.getenv("TJMS_PASS", "SAJ03PGEMS")
-    TJMS_WSDL_URL = "https://esaj.tjms.jus.br/mniws/servico-intercomunicacao-2.2.2/intercomunicacao?wsdl"
+    # Override to point at a stand-in server (see tests/stub_tjms.py)
+    TJMS_WSDL_URL = os.getenv(
+        "TJMS_WSDL_URL", "https://esaj.tjms.jus.br/mniws/servico-intercomunicacao-2.2.2/intercomunicacao?wsdl"
+    )
+    # Shared HTTP session for the SOAP client: max keep-alive connections to TJ-MS
+    # and retry policy (attempts, exponential backoff factor in seconds).
+    TJMS_POOL_SIZE = int(os.getenv("TJMS_POOL_SIZE", "10"))
+    TJMS_MAX_RETRIES = int(os.getenv("TJMS_MAX_RETRIES", "5"))
+    TJMS_BACKOFF_FACTOR = float(os.getenv("TJMS_BACKOFF_FACTOR", "1"))
+    # Async client (bulk fetches): max SOAP calls in flight across all requests
+    TJMS_MAX_CONCURRENT = int(os.getenv("TJMS_MAX_CONCURRENT", "10"))
+    # Throttle shared by every TJ-MS call: attempts per second and burst, and the
+    # circuit breaker (overloaded attempts in a row to open it, seconds until a probe).
+    # The adaptive concurrency limit tops out at TJMS_MAX_CONCURRENT.
+    TJMS_RATE_LIMIT = float(os.getenv("TJMS_RATE_LIMIT", "10"))
+    TJMS_RATE_BURST = int(os.getenv("TJMS_RATE_BURST", "10"))
+    TJMS_BREAKER_THRESHOLD = int(os.getenv("TJMS_BREAKER_THRESHOLD", "5"))
+    TJMS_BREAKER_RESET = float(os.getenv("TJMS_BREAKER_RESET", "30"))
+    # Background re-sync of tracked processes (see services/sync_scheduler.py):
+    # seconds between cycles (0 disables), processes re-consulted per cycle and
+    # at once, and whether changed processes are reclassified (with how many LLM calls at once).
+    TJMS_SYNC_INTERVAL = float(os.getenv("TJMS_SYNC_INTERVAL", "0"))
+    TJMS_SYNC_BUDGET = int(os.getenv("TJMS_SYNC_BUDGET", "200"))
+    TJMS_SYNC_CONCURRENCY = int(os.getenv("TJMS_SYNC_CONCURRENCY", "4"))
+    TJMS_SYNC_RECLASSIFY = os.getenv("TJMS_SYNC_RECLASSIFY", "true").lower() in ("1", "true", "yes")
+    TJMS_SYNC_CLASSIFY_CONCURRENCY = int(os.getenv("TJMS_SYNC_CLASSIFY_CONCURRENCY", "2"))
+    # consultarProcesso response cache (see soap_cache.py): seconds an entry is
+    # fresh, plus how long after that it may still be served while refreshing.
+    # TJMS_CACHE_TTL=0 disables it.
+    TJMS_CACHE_DIR = os.getenv("TJMS_CACHE_DIR", "soap_cache")
+    TJMS_CACHE_TTL = float(os.getenv("TJMS_CACHE_TTL", "600"))
+    TJMS_CACHE_STALE_TTL = float(os.getenv("TJMS_CACHE_STALE_TTL", "3600"))
     
     OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
     # Model ID requested by user. Ensure this model is available on OpenRouter.
     OPENROUTER_MODEL_ID = os.getenv("OPENROUTER_MODEL_ID", "google/gemini-2.0-pro-exp-02-05:free")
+    # Shared OpenRouter HTTP client (see services/ai_classifier.py): max connections,
+    # idle keep-alive connections and how long they are kept (s), request and
+    # connect timeouts (s), and HTTP/2 (used only if the h2 package is installed).
+    LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+    LLM_KEEPALIVE = int(os.getenv("LLM_KEEPALIVE", "20"))
+    LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+    LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes")
+    # Classification result cache (see llm_cache.py): SQLite file, seconds an
+    # entry is reused (default 30 days) and max entries. LLM_CACHE_TTL=0 disables it.
+    LLM_CACHE_FILE = os.getenv("LLM_CACHE_FILE", "llm_cache.db")
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(30 * 24 * 3600)))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
@@ -1,50 +1,623 @@
-import json
 import os
-from typing import List, Dict, Any
-from .models import ProcessoData, ClassificacaoResult
+import sqlite3
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable
+from .models import Movimento, MovimentoList, MovimentoRow, ProcessoData, ProcessoResumo, ClassificacaoResult
+from .blob_store import put_text, unpin, delete_unreferenced
+from .serialization import dumps_str, loads
 
+SQLITE_FILE = "processes.db"
+
+# Legacy JSON storage. Imported once into SQLite when the database is created.
 DB_FILE = "processes.json"
 CLASSIFICATIONS_FILE = "classifications.json"
 
-def load_db() -> List[ProcessoData]:
-    if not os.path.exists(DB_FILE):
-        return []
+SCHEMA_VERSION = 6
+
+# Compact the classification log once superseded entries outnumber live ones
+# (and there are at least this many of them).
+LOG_COMPACTION_MIN = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processes (
+    numero TEXT PRIMARY KEY,
+    competencia TEXT,
+    classe_processual TEXT,
+    assuntos TEXT NOT NULL DEFAULT '[]',
+    xml_sha256 TEXT,  -- raw XML is kept in the blob store
+    xml_size INTEGER,
+    fingerprint TEXT,
+    -- Summary projection for list views (see ProcessoResumo)
+    total_movimentos INTEGER NOT NULL DEFAULT 0,
+    ultima_movimentacao TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_processes_classe ON processes(classe_processual);
+
+CREATE TABLE IF NOT EXISTS movements (
+    numero TEXT NOT NULL REFERENCES processes(numero) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    data_hora TEXT,
+    descricao TEXT NOT NULL,
+    complemento TEXT,
+    codigo TEXT,
+    PRIMARY KEY (numero, seq)
+) WITHOUT ROWID;
+
+-- Append-only: every result (or deletion tombstone, classificacao NULL) is a new
+-- row and the latest seq per process wins. Superseded rows are removed by
+-- compact_classification_log().
+CREATE TABLE IF NOT EXISTS classification_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    numero_processo TEXT NOT NULL,
+    classe_processual TEXT,
+    classificacao TEXT,
+    data_classificacao TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_classification_log_numero ON classification_log(numero_processo, seq);
+
+-- processes_generation is bumped by every process write, so in-memory caches
+-- (see repository.py) can tell whether they are stale with one cheap read.
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('processes_generation', 0);
+"""
+
+# Indexes on columns that older databases only get from a migration, so they
+# are created after migrating. xml_sha256: blob reference checks.
+MIGRATED_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_processes_xml_sha256 ON processes(xml_sha256)",
+]
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Returns the SQLite connection of the current thread, opening it on first use.
+    Sync routes run in a threadpool, so each worker keeps its own connection.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == SQLITE_FILE:
+        return conn
+
+    conn = sqlite3.connect(SQLITE_FILE, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    _ensure_schema(conn)
+
+    _local.conn = conn
+    _local.path = SQLITE_FILE
+    return conn
+
+def close_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+def _ensure_schema(conn: sqlite3.Connection):
+    with _schema_lock:
+        if SQLITE_FILE in _schema_ready:
+            return
+        conn.executescript(SCHEMA)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        with conn:
+            if version == 0:
+                _import_legacy_json(conn)
+            else:
+                for target in range(version + 1, SCHEMA_VERSION + 1):
+                    # Versions that only add tables need no entry: SCHEMA creates them
+                    migrate = MIGRATIONS.get(target)
+                    if migrate:
+                        migrate(conn)
+            for statement in MIGRATED_INDEXES:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        if 0 < version < SCHEMA_VERSION:
+            # Reclaim pages freed by the migrations (e.g. xml_raw moved out)
+            conn.execute("VACUUM")
+        _schema_ready.add(SQLITE_FILE)
+
+def _migrate_v2(conn: sqlite3.Connection):
+    # classifications table -> append-only classification_log
+    conn.execute(
+        """
+        INSERT INTO classification_log (numero_processo, classe_processual, classificacao, data_classificacao)
+        SELECT numero_processo, classe_processual, classificacao, data_classificacao
+        FROM classifications ORDER BY rowid
+        """
+    )
+    conn.execute("DROP TABLE classifications")
+
+def _migrate_v3(conn: sqlite3.Connection):
+    # processes.xml_raw -> blob store
+    conn.execute("ALTER TABLE processes ADD COLUMN xml_sha256 TEXT")
+    conn.execute("ALTER TABLE processes ADD COLUMN xml_size INTEGER")
+    rows = conn.execute("SELECT numero, xml_raw FROM processes WHERE xml_raw IS NOT NULL").fetchall()
+    for row in rows:
+        sha256, size = put_text(row["xml_raw"])
+        conn.execute(
+            "UPDATE processes SET xml_sha256 = ?, xml_size = ? WHERE numero = ?",
+            (sha256, size, row["numero"]),
+        )
     try:
-        with open(DB_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return [ProcessoData(**d) for d in data]
-    except Exception:
-        return []
+        conn.execute("ALTER TABLE processes DROP COLUMN xml_raw")
+    except sqlite3.OperationalError:
+        # DROP COLUMN needs SQLite 3.35+; just release the data on older versions
+        conn.execute("UPDATE processes SET xml_raw = NULL")
 
-def save_db(processes: List[ProcessoData]):
-    with open(DB_FILE, "w", encoding="utf-8") as f:
-        json.dump([p.model_dump(mode='json') for p in processes], f, indent=2, ensure_ascii=False)
+def _migrate_v4(conn: sqlite3.Connection):
+    # Content fingerprints for change detection, computed from the stored fields
+    conn.execute("ALTER TABLE processes ADD COLUMN fingerprint TEXT")
+    numeros = [row["numero"] for row in conn.execute("SELECT numero FROM processes")]
+    for numero in numeros:
+        process = _read_process(conn, numero)
+        conn.execute(
+            "UPDATE processes SET fingerprint = ? WHERE numero = ?",
+            (process.compute_fingerprint(), numero),
+        )
 
-def load_classifications() -> List[Dict[str, Any]]:
-    if not os.path.exists(CLASSIFICATIONS_FILE):
-        return []
+def _migrate_v6(conn: sqlite3.Connection):
+    # Summary projection columns, backfilled from the movements table
+    conn.execute("ALTER TABLE processes ADD COLUMN total_movimentos INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE processes ADD COLUMN ultima_movimentacao TEXT")
+    numeros = [row["numero"] for row in conn.execute("SELECT numero FROM processes")]
+    for numero in numeros:
+        resumo = _read_process(conn, numero).resumo()
+        conn.execute(
+            "UPDATE processes SET total_movimentos = ?, ultima_movimentacao = ? WHERE numero = ?",
+            (resumo.total_movimentos, _dump_movimento(resumo.ultima_movimentacao), numero),
+        )
+
+MIGRATIONS = {
+    2: _migrate_v2,
+    3: _migrate_v3,
+    4: _migrate_v4,
+    6: _migrate_v6,
+}
+
+def _import_legacy_json(conn: sqlite3.Connection):
+    """
+    One-time migration of processes.json / classifications.json into SQLite.
+    """
+    if os.path.exists(DB_FILE):
+        try:
+            with open(DB_FILE, "rb") as f:
+                # Files are untrusted input: always fully validated
+                for d in loads(f.read()):
+                    _write_process(conn, ProcessoData(**d))
+        except Exception as e:
+            print(f"Erro ao importar {DB_FILE}: {e}")
+
+    if os.path.exists(CLASSIFICATIONS_FILE):
+        try:
+            with open(CLASSIFICATIONS_FILE, "rb") as f:
+                _append_classifications(conn, [ClassificacaoResult(**c) for c in loads(f.read())])
+        except Exception as e:
+            print(f"Erro ao importar {CLASSIFICATIONS_FILE}: {e}")
+
+# --- Row conversion ---
+
+def _write_process(conn: sqlite3.Connection, process: ProcessoData, pinned: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Upserts a process and its movements. Returns the blob it referenced before,
+    if this write replaced it (see _unreferenced_blobs / _delete_blobs).
+    The stored XML blob is pinned and appended to pinned, if given; the caller
+    unpins it once the transaction has ended.
+    """
+    previous = conn.execute("SELECT xml_sha256 FROM processes WHERE numero = ?", (process.numero,)).fetchone()
+    if process.xml_raw is not None:
+        process.xml_sha256, process.xml_size = put_text(process.xml_raw, pin=pinned is not None)
+        if pinned is not None:
+            pinned.append(process.xml_sha256)
+    if process.fingerprint is None:
+        process.fingerprint = process.compute_fingerprint()
+    resumo = process.resumo()
+
+    conn.execute(
+        """
+        INSERT INTO processes (
+            numero, competencia, classe_processual, assuntos, xml_sha256, xml_size, fingerprint,
+            total_movimentos, ultima_movimentacao, updated_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(numero) DO UPDATE SET
+            competencia=excluded.competencia,
+            classe_processual=excluded.classe_processual,
+            assuntos=excluded.assuntos,
+            xml_sha256=excluded.xml_sha256,
+            xml_size=excluded.xml_size,
+            fingerprint=excluded.fingerprint,
+            total_movimentos=excluded.total_movimentos,
+            ultima_movimentacao=excluded.ultima_movimentacao,
+            updated_at=excluded.updated_at
+        """,
+        (
+            process.numero,
+            process.competencia,
+            process.classeProcessual,
+            dumps_str(process.assuntos),
+            process.xml_sha256,
+            process.xml_size,
+            process.fingerprint,
+            resumo.total_movimentos,
+            _dump_movimento(resumo.ultima_movimentacao),
+            datetime.now().isoformat(),
+        ),
+    )
+    conn.execute("DELETE FROM movements WHERE numero = ?", (process.numero,))
+    conn.executemany(
+        "INSERT INTO movements (numero, seq, data_hora, descricao, complemento, codigo) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (
+                process.numero,
+                seq,
+                m.dataHora.isoformat() if m.dataHora else None,
+                m.descricao,
+                m.complemento,
+                m.codigo,
+            )
+            for seq, m in enumerate(process.movimentos)
+        ],
+    )
+    replaced = previous["xml_sha256"] if previous else None
+    return replaced if replaced != process.xml_sha256 else None
+
+def _blob_referenced(conn: sqlite3.Connection, sha256: str) -> bool:
+    return conn.execute("SELECT 1 FROM processes WHERE xml_sha256 = ? LIMIT 1", (sha256,)).fetchone() is not None
+
+def _unreferenced_blobs(conn: sqlite3.Connection, shas: Iterable[Optional[str]]) -> List[str]:
+    # Blobs are shared by content: only those no process row points to any more
+    return [sha256 for sha256 in set(shas) if sha256 and not _blob_referenced(conn, sha256)]
+
+def _delete_blobs(conn: sqlite3.Connection, shas: Iterable[str]):
+    # After the commit, so a rolled-back write never loses the blob it still uses.
+    # Re-checked under the blob store lock: another writer may have committed a
+    # row pointing at the same content since, or be about to (then it's pinned).
+    delete_unreferenced(shas, lambda sha256: _blob_referenced(conn, sha256))
+
+def _append_classifications(conn: sqlite3.Connection, results: List[ClassificacaoResult]):
+    rows = []
+    for result in results:
+        data = result.model_dump(mode='json')
+        rows.append((
+            data['numero_processo'],
+            data['classe_processual'],
+            dumps_str(data['classificacao']),
+            data['data_classificacao'],
+        ))
+    conn.executemany(
+        """
+        INSERT INTO classification_log (numero_processo, classe_processual, classificacao, data_classificacao)
+        VALUES (?, ?, ?, ?)
+        """,
+        rows,
+    )
+
+def _dump_movimento(movimento) -> Optional[str]:
+    if movimento is None:
+        return None
+    return dumps_str(movimento.model_dump(mode='json'))
+
+def _construct_movimento(data: Dict[str, Any]) -> Movimento:
+    # Trusted path: rows were validated when written, so skip pydantic validation
+    data_hora = data["dataHora"]
+    return Movimento.model_construct(
+        dataHora=datetime.fromisoformat(data_hora) if data_hora else None,
+        descricao=data["descricao"],
+        complemento=data.get("complemento"),
+        codigo=data.get("codigo"),
+    )
+
+def _movement_row(row: sqlite3.Row) -> MovimentoRow:
+    data_hora = row["data_hora"]
+    return (
+        datetime.fromisoformat(data_hora) if data_hora else None,
+        row["descricao"],
+        row["complemento"],
+        row["codigo"],
+    )
+
+def _movements_loader(numero: str):
+    def load() -> List[MovimentoRow]:
+        return [
+            _movement_row(m)
+            for m in get_connection().execute("SELECT * FROM movements WHERE numero = ? ORDER BY seq", (numero,))
+        ]
+    return load
+
+def _process_from_row(row: sqlite3.Row, movements: MovimentoList, strict: bool = False) -> ProcessoData:
+    """
+    Builds a ProcessoData from a processes row. By default the row is trusted and
+    hydrated with model_construct; strict=True runs full validation instead.
+    """
+    fields = dict(
+        numero=row["numero"],
+        competencia=row["competencia"],
+        classeProcessual=row["classe_processual"],
+        assuntos=loads(row["assuntos"]),
+        xml_sha256=row["xml_sha256"],
+        xml_size=row["xml_size"],
+        fingerprint=row["fingerprint"],
+    )
+    if strict:
+        return ProcessoData(movimentos=[m.model_dump() for m in movements], **fields)
+    return ProcessoData.model_construct(movimentos=movements, xml_raw=None, **fields)
+
+def _summary_from_row(row: sqlite3.Row) -> ProcessoResumo:
+    ultima = row["ultima_movimentacao"]
+    return ProcessoResumo.model_construct(
+        numero=row["numero"],
+        competencia=row["competencia"],
+        classeProcessual=row["classe_processual"],
+        total_movimentos=row["total_movimentos"],
+        ultima_movimentacao=_construct_movimento(loads(ultima)) if ultima else None,
+    )
+
+def _classification_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "numero_processo": row["numero_processo"],
+        "classe_processual": row["classe_processual"],
+        "classificacao": loads(row["classificacao"]),
+        "data_classificacao": row["data_classificacao"],
+    }
+
+# --- Processes ---
+
+def load_db(strict: bool = False) -> List[ProcessoData]:
+    """
+    Loads every process without validating it again: movements are read from the
+    movements table only when a process's movement list is first accessed.
+    strict=True re-validates everything (movements included) through pydantic.
+    """
+    conn = get_connection()
+    return [
+        _process_from_row(row, MovimentoList(loader=_movements_loader(row["numero"])), strict=strict)
+        for row in conn.execute("SELECT * FROM processes ORDER BY rowid")
+    ]
+
+def load_summaries() -> List[ProcessoResumo]:
+    """
+    Reads the stored summary projection only; the movements table is not touched.
+    """
+    conn = get_connection()
+    return [
+        _summary_from_row(row)
+        for row in conn.execute(
+            """
+            SELECT numero, competencia, classe_processual, total_movimentos, ultima_movimentacao
+            FROM processes ORDER BY rowid
+            """
+        )
+    ]
+
+def load_process(numero: str, strict: bool = False) -> Optional[ProcessoData]:
+    return _read_process(get_connection(), numero, strict=strict)
+
+def _read_process(conn: sqlite3.Connection, numero: str, strict: bool = False) -> Optional[ProcessoData]:
+    row = conn.execute("SELECT * FROM processes WHERE numero = ?", (numero,)).fetchone()
+    if row is None:
+        return None
+    movements = MovimentoList(
+        _movement_row(m)
+        for m in conn.execute("SELECT * FROM movements WHERE numero = ? ORDER BY seq", (numero,))
+    )
+    return _process_from_row(row, movements, strict=strict)
+
+def get_generation() -> int:
+    """
+    Returns the process store generation, incremented by every process write.
+    """
+    row = get_connection().execute(
+        "SELECT value FROM meta WHERE key = 'processes_generation'"
+    ).fetchone()
+    return row["value"]
+
+def _bump_generation(conn: sqlite3.Connection) -> int:
+    conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'processes_generation'")
+    return conn.execute("SELECT value FROM meta WHERE key = 'processes_generation'").fetchone()["value"]
+
+def save_process(process: ProcessoData) -> int:
+    """
+    Inserts or replaces a single process and its movements.
+    Returns the new store generation.
+    """
+    conn = get_connection()
+    pinned = []
+    try:
+        with conn:
+            replaced = _write_process(conn, process, pinned)
+            orphans = _unreferenced_blobs(conn, [replaced])
+            generation = _bump_generation(conn)
+    finally:
+        # Committed (or rolled back): the rows now protect the blobs
+        unpin(pinned)
+    _delete_blobs(conn, orphans)
+    return generation
+
+def save_processes(processes: List[ProcessoData], clear_classifications: Iterable[str] = ()) -> int:
+    """
+    Inserts or replaces many processes in a single transaction, optionally
+    dropping the classifications of the given numeros in the same transaction
+    (content changed, so they must be re-analyzed). Returns the new store generation.
+    """
+    conn = get_connection()
+    pinned = []
     try:
-        with open(CLASSIFICATIONS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
-        return []
+        with conn:
+            replaced = [_write_process(conn, p, pinned) for p in processes]
+            orphans = _unreferenced_blobs(conn, replaced)
+            classified = classification_index()
+            conn.executemany(
+                "INSERT INTO classification_log (numero_processo) VALUES (?)",
+                [(numero,) for numero in clear_classifications if numero in classified],
+            )
+            generation = _bump_generation(conn)
+    finally:
+        unpin(pinned)
+    _delete_blobs(conn, orphans)
+    _classification_index.sync(conn)
+    return generation
+
+def save_db(processes: List[ProcessoData]) -> int:
+    """
+    Replaces the whole process table. Prefer save_process for single updates.
+    """
+    conn = get_connection()
+    pinned = []
+    try:
+        with conn:
+            numeros = [p.numero for p in processes]
+            placeholders = ','.join('?' * len(numeros))
+            dropped = [
+                row["xml_sha256"]
+                for row in conn.execute(f"SELECT xml_sha256 FROM processes WHERE numero NOT IN ({placeholders})", numeros)
+            ]
+            conn.execute(f"DELETE FROM processes WHERE numero NOT IN ({placeholders})", numeros)
+            replaced = [_write_process(conn, p, pinned) for p in processes]
+            orphans = _unreferenced_blobs(conn, dropped + replaced)
+            generation = _bump_generation(conn)
+    finally:
+        unpin(pinned)
+    _delete_blobs(conn, orphans)
+    return generation
+
+def delete_process(numero: str) -> int:
+    conn = get_connection()
+    with conn:
+        row = conn.execute("SELECT xml_sha256 FROM processes WHERE numero = ?", (numero,)).fetchone()
+        conn.execute("DELETE FROM processes WHERE numero = ?", (numero,))
+        generation = _bump_generation(conn)
+        orphans = _unreferenced_blobs(conn, [row["xml_sha256"] if row else None])
+    _delete_blobs(conn, orphans)
+    return generation
+
+# --- Classifications ---
+
+class _ClassificationIndex:
+    """
+    In-memory "latest result wins" view of the classification log.
+    Kept current by tailing the log from the last seen seq, so writes made by
+    other threads or processes are picked up with a single indexed range query.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.last_seq = 0
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.superseded = 0
+
+    def sync(self, conn: sqlite3.Connection):
+        with self.lock:
+            if self.path != SQLITE_FILE:
+                self.path = SQLITE_FILE
+                self.last_seq = 0
+                self.entries = {}
+                self.superseded = 0
+
+            rows = conn.execute(
+                "SELECT * FROM classification_log WHERE seq > ? ORDER BY seq", (self.last_seq,)
+            ).fetchall()
+            for row in rows:
+                numero = row["numero_processo"]
+                previous = self.entries.get(numero)
+                # Replaced in place: lock-free lookups never see a classified numero go missing
+                if row["classificacao"] is not None:
+                    self.entries[numero] = _classification_from_row(row)
+                elif previous is not None:
+                    del self.entries[numero]
+                if previous is not None:
+                    self.superseded += 1
+                self.last_seq = row["seq"]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            return dict(self.entries)
+
+_classification_index = _ClassificationIndex()
+
+def classification_index() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the live numero_processo -> latest classification map. Read-only,
+    and only for single lookups (get / in): other threads update it while you
+    hold it. Use classification_snapshot() to iterate or to look up twice.
+    """
+    _classification_index.sync(get_connection())
+    return _classification_index.entries
+
+def classification_snapshot() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns a private copy of the numero_processo -> latest classification map.
+    """
+    _classification_index.sync(get_connection())
+    return _classification_index.snapshot()
+
+def classification_version() -> int:
+    """
+    Returns the last classification log seq seen; changes whenever any result is written.
+    """
+    _classification_index.sync(get_connection())
+    return _classification_index.last_seq
+
+def load_classifications() -> List[Dict[str, Any]]:
+    return list(classification_snapshot().values())
+
+def load_classification(numero: str) -> Optional[Dict[str, Any]]:
+    return classification_index().get(numero)
+
+def save_classification_results(results: List[ClassificacaoResult]):
+    """
+    Appends a batch of results to the classification log in a single transaction.
+    """
+    if not results:
+        return
+    conn = get_connection()
+    with conn:
+        _append_classifications(conn, results)
+    _classification_index.sync(conn)
+    _maybe_compact(conn)
 
 def save_classification_result(result: ClassificacaoResult):
-    data = load_classifications()
-    # Remove existing classification for this process if exists (replace)
-    data = [c for c in data if c['numero_processo'] != result.numero_processo]
-    
-    data.append(result.model_dump(mode='json'))
-    with open(CLASSIFICATIONS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
-def delete_process(numero: str):
-    processes = load_db()
-    processes = [p for p in processes if p.numero != numero]
-    save_db(processes)
+    save_classification_results([result])
 
 def delete_classification(numero: str):
-    data = load_classifications()
-    data = [c for c in data if c['numero_processo'] != numero]
-    with open(CLASSIFICATIONS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    conn = get_connection()
+    if numero not in classification_index():
+        return
+    with conn:
+        conn.execute(
+            "INSERT INTO classification_log (numero_processo) VALUES (?)", (numero,)
+        )
+    _classification_index.sync(conn)
+
+def _maybe_compact(conn: sqlite3.Connection):
+    index = _classification_index
+    if index.superseded >= max(LOG_COMPACTION_MIN, len(index.entries)):
+        compact_classification_log(conn)
+
+def compact_classification_log(conn: Optional[sqlite3.Connection] = None):
+    """
+    Drops log entries superseded by a later entry for the same process,
+    leaving one row (result or tombstone) per process.
+    """
+    conn = conn or get_connection()
+    with conn:
+        conn.execute(
+            """
+            DELETE FROM classification_log
+            WHERE seq < (
+                SELECT MAX(l.seq) FROM classification_log l
+                WHERE l.numero_processo = classification_log.numero_processo
+            )
+            """
+        )
+    with _classification_index.lock:
+        _classification_index.superseded = 0
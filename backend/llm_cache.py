@@ -0,0 +1,163 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from .serialization import dumps_str, loads
+
+# Persistent cache of LLM classification outputs, in its own SQLite file (safe
+# to delete). The key is the sha256 of everything that determines the answer:
+# system prompt, class prompt, model id and the rendered process context. Any
+# edit to one of them is a different key, so entries never need invalidating;
+# they only expire.
+#
+# Entries older than ttl seconds are ignored and pruned. The table is trimmed
+# to max_entries, least recently used first, every PRUNE_EVERY stores (so it
+# may briefly hold up to PRUNE_EVERY more). ttl <= 0 or max_entries <= 0
+# disables the cache.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used);
+"""
+
+PRUNE_EVERY = 100
+
+def cache_key(*parts: str) -> str:
+    return hashlib.sha256(dumps_str(list(parts)).encode("utf-8")).hexdigest()
+
+class LLMCache:
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.bypasses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread (callers go through asyncio.to_thread)
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.path == self.path:
+            return conn
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.path = self.path
+        return conn
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key: str, bypass: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Returns the stored result for key, or None on a miss, an expired entry or
+        bypass (which still lets put() store the fresh result).
+        """
+        if not self.enabled:
+            return None
+        if bypass:
+            self._count("bypasses")
+            return None
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT result, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] < self.ttl:
+                with conn:
+                    conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+                self._count("hits")
+                return loads(row[0])
+        except sqlite3.Error as e:
+            # A broken cache must not break classification
+            self._count("errors")
+            print(f"Erro no cache de classificações: {e}")
+            return None
+        self._count("expired" if row is not None else "misses")
+        return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, result, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, dumps_str(result), now, now),
+                )
+            with self._lock:
+                self.stores += 1
+                prune = self.stores % PRUNE_EVERY == 0
+            if prune:
+                self.prune()
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"Erro no cache de classificações: {e}")
+
+    def prune(self) -> int:
+        """
+        Drops expired entries, then the least recently used beyond max_entries.
+        Returns how many were removed.
+        """
+        conn = self._connection()
+        with conn:
+            removed = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+            excess = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                ).rowcount
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        entries = None
+        if self.enabled:
+            try:
+                entries = self._connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            except sqlite3.Error:
+                pass
+        with self._lock:
+            lookups = self.hits + self.misses + self.expired
+            return {
+                "enabled": self.enabled,
+                "ttl": self.ttl,
+                "max_entries": self.max_entries,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "bypasses": self.bypasses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "errors": self.errors,
+            }
@@ -1,8 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import processes, classification, export, prompts, chat
+from .services.result_writer import classification_writer
+from .services.ingest import shutdown_executor
+from .services.tjms_client import tjms_session, async_tjms_client
+from .services.sync_scheduler import sync_scheduler
+from .services.ai_classifier import openrouter_client
+from .serialization import FastJSONResponse
 
-app = FastAPI(title="Classificador de Intimações API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    classification_writer.start()
+    openrouter_client.open()
+    sync_scheduler.start()
+    yield
+    # Stop re-syncing first: its reclassifications go through the writer
+    await sync_scheduler.stop()
+    # Flush pending classification results before shutting down
+    await classification_writer.stop()
+    shutdown_executor()
+    tjms_session.close()
+    await async_tjms_client.aclose()
+    await openrouter_client.aclose()
+
+app = FastAPI(
+    title="Classificador de Intimações API",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 # CORS
 app.add_middleware(
@@ -11,6 +37,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(processes.router)
@@ -1,6 +1,12 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from pydantic import BaseModel, Field, GetCoreSchemaHandler
+from pydantic_core import core_schema
+from typing import List, Optional, Dict, Any, Callable, Iterable, Iterator, Sequence, Tuple, Union
+from datetime import datetime, timedelta, timezone
+from array import array
+from sys import intern
+import hashlib
+import json
+from .blob_store import get_text
 
 class Movimento(BaseModel):
     dataHora: Optional[datetime]
@@ -8,13 +14,236 @@ class Movimento(BaseModel):
     complemento: Optional[str] = None
     codigo: Optional[str] = None
 
+# Row shape accepted by MovimentoList: (dataHora, descricao, complemento, codigo)
+MovimentoRow = Tuple[Optional[datetime], str, Optional[str], Optional[str]]
+
+_EPOCH = datetime(1970, 1, 1)
+_NO_DATE = -(2 ** 63)
+
+def _to_micros(value: Optional[datetime]) -> int:
+    if value is None:
+        return _NO_DATE
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+def _movimento(data_hora: Optional[datetime], descricao: str, complemento: Optional[str], codigo: Optional[str]) -> Movimento:
+    # Values were validated when the list was built: skip validation
+    return Movimento.model_construct(dataHora=data_hora, descricao=descricao, complemento=complemento, codigo=codigo)
+
+class MovimentoList(Sequence):
+    """
+    Read-only, columnar sequence of movements.
+
+    Instead of one Movimento object per movement, a process keeps parallel
+    columns: dataHora as epoch microseconds in an array, interned descricao and
+    codigo strings, and every complemento concatenated into one string addressed
+    by (start, length) arrays. Indexing and iteration build Movimento objects on
+    the fly, so callers see the usual m.dataHora / m.descricao / m.complemento.
+    Timezone-aware datetimes are stored as naive UTC.
+
+    Built either from movements/rows, or from a loader that returns rows and is
+    called on first access (processes hydrated from the database use this, so a
+    movement list is only read when something looks at it).
+    """
+    __slots__ = ("_data_hora", "_descricao", "_codigo", "_comp_text", "_comp_start", "_comp_len", "_loader")
+
+    def __init__(self, items: Optional[Iterable[Union[Movimento, MovimentoRow]]] = None, loader: Optional[Callable[[], Iterable[MovimentoRow]]] = None):
+        self._loader = loader
+        self._data_hora = None
+        if items is not None or loader is None:
+            self._fill(items or ())
+
+    def _fill(self, items: Iterable[Union[Movimento, MovimentoRow]]):
+        data_hora = array("q")
+        descricoes: List[str] = []
+        codigos: List[Optional[str]] = []
+        comp_parts: List[str] = []
+        comp_start = array("q")
+        comp_len = array("q")
+        offset = 0
+        for item in items:
+            if isinstance(item, Movimento):
+                item = (item.dataHora, item.descricao, item.complemento, item.codigo)
+            when, descricao, complemento, codigo = item
+            data_hora.append(_to_micros(when))
+            descricoes.append(intern(descricao))
+            codigos.append(intern(codigo) if codigo is not None else None)
+            comp_start.append(offset)
+            if complemento is None:
+                comp_len.append(-1)
+            else:
+                comp_parts.append(complemento)
+                comp_len.append(len(complemento))
+                offset += len(complemento)
+        self._data_hora = data_hora
+        self._descricao = descricoes
+        self._codigo = codigos
+        self._comp_text = "".join(comp_parts)
+        self._comp_start = comp_start
+        self._comp_len = comp_len
+
+    @property
+    def loaded(self) -> bool:
+        return self._data_hora is not None
+
+    def _ensure_loaded(self):
+        if self._data_hora is None:
+            self._fill(self._loader())
+            self._loader = None
+
+    def _movimento(self, i: int) -> Movimento:
+        micros = self._data_hora[i]
+        length = self._comp_len[i]
+        start = self._comp_start[i]
+        return _movimento(
+            _EPOCH + timedelta(0, 0, micros) if micros != _NO_DATE else None,
+            self._descricao[i],
+            self._comp_text[start:start + length] if length >= 0 else None,
+            self._codigo[i],
+        )
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._data_hora)
+
+    def __getitem__(self, index):
+        self._ensure_loaded()
+        if isinstance(index, slice):
+            return [self._movimento(i) for i in range(*index.indices(len(self._data_hora)))]
+        if index < 0:
+            index += len(self._data_hora)
+        if not 0 <= index < len(self._data_hora):
+            raise IndexError("MovimentoList index out of range")
+        return self._movimento(index)
+
+    def __iter__(self) -> Iterator[Movimento]:
+        self._ensure_loaded()
+        return (self._movimento(i) for i in range(len(self._data_hora)))
+
+    def rows(self) -> List[MovimentoRow]:
+        return [(m.dataHora, m.descricao, m.complemento, m.codigo) for m in self]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MovimentoList):
+            return self.rows() == other.rows()
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        if not self.loaded:
+            return "MovimentoList(<not loaded>)"
+        return f"MovimentoList({list(self)!r})"
+
+    def __reduce__(self):
+        # Pickles (e.g. across a process pool) carry the movements, not the loader
+        return (MovimentoList, (self.rows(),))
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        list_schema = handler.generate_schema(List[Movimento])
+        from_list = core_schema.no_info_after_validator_function(cls, list_schema)
+        return core_schema.json_or_python_schema(
+            json_schema=from_list,
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(cls), from_list]),
+            serialization=core_schema.plain_serializer_function_ser_schema(list, return_schema=list_schema),
+        )
+
 class ProcessoData(BaseModel):
     numero: str
     competencia: Optional[str]
     classeProcessual: Optional[str]
     assuntos: List[str] = []
-    movimentos: List[Movimento] = []
-    xml_raw: Optional[str] = None # Store raw XML if needed
+    movimentos: MovimentoList = Field(default_factory=MovimentoList)
+    # Raw SOAP response lives in the blob store; only its hash and size are kept here.
+    # xml_raw is transient: set by the parser and written to the blob store on save.
+    xml_sha256: Optional[str] = None
+    xml_size: Optional[int] = None
+    xml_raw: Optional[str] = Field(default=None, exclude=True)
+    # Hash of the legally relevant content (see compute_fingerprint)
+    fingerprint: Optional[str] = None
+
+    def resumo(self) -> "ProcessoResumo":
+        return ProcessoResumo(
+            numero=self.numero,
+            competencia=self.competencia,
+            classeProcessual=self.classeProcessual,
+            total_movimentos=len(self.movimentos),
+            ultima_movimentacao=self.movimentos[-1] if self.movimentos else None,
+        )
+
+    def load_xml_raw(self) -> Optional[str]:
+        """
+        Returns the raw XML, reading it from the blob store on first access.
+        """
+        if self.xml_raw is None and self.xml_sha256:
+            self.xml_raw = get_text(self.xml_sha256)
+        return self.xml_raw
+
+    def compute_fingerprint(self) -> str:
+        """
+        Hashes the normalized dadosBasicos, assuntos and movements, ignoring
+        everything else in the SOAP response (envelope, mensagem, partes...).
+        """
+        def norm(value) -> str:
+            return " ".join(str(value).split()) if value is not None else ""
+
+        canonical = {
+            "numero": norm(self.numero),
+            "competencia": norm(self.competencia),
+            "classeProcessual": norm(self.classeProcessual),
+            "assuntos": sorted(norm(a) for a in self.assuntos),
+            "movimentos": [
+                [
+                    m.dataHora.isoformat() if m.dataHora else "",
+                    norm(m.codigo),
+                    norm(m.descricao),
+                    norm(m.complemento),
+                ]
+                for m in self.movimentos
+            ],
+        }
+        encoded = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class ProcessoResumo(BaseModel):
+    """
+    Projection used by list views: no movement list and no raw XML.
+    Stored alongside each process so listing never touches the movements table.
+    """
+    numero: str
+    competencia: Optional[str]
+    classeProcessual: Optional[str]
+    total_movimentos: int = 0
+    ultima_movimentacao: Optional[Movimento] = None
+
+class UploadArquivo(BaseModel):
+    """
+    Outcome of one uploaded file: novo, atualizado, ignorado or erro.
+    """
+    arquivo: str
+    status: str
+    numero_processo: Optional[str] = None
+    detalhe: Optional[str] = None
+
+class UploadResultado(BaseModel):
+    total: int = 0
+    novos: int = 0
+    atualizados: int = 0
+    ignorados: int = 0
+    erros: int = 0
+    arquivos: List[UploadArquivo] = []
+
+    def contar(self, status: str):
+        """
+        Increments the counter for a file status (novo, atualizado, ignorado, erro).
+        """
+        field = {"novo": "novos", "atualizado": "atualizados", "ignorado": "ignorados"}.get(status, "erros")
+        setattr(self, field, getattr(self, field) + 1)
+
+class BulkFetchRequest(BaseModel):
+    numeros: List[str] = Field(min_length=1)
 
 class ClassificacaoRequest(BaseModel):
     numero_processo: str
@@ -0,0 +1,192 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Any, Tuple
+from .models import ProcessoData, ProcessoResumo
+from . import database
+
+SortKey = Callable[[ProcessoResumo, Optional[Dict[str, Any]]], tuple]
+
+# Sort keys for list views, as (summary, classification) -> comparable tuple.
+# Missing values sort first ascending / last descending via the leading flag.
+SORT_KEYS: Dict[str, SortKey] = {
+    "data_classificacao": lambda s, c: (c is not None, c["data_classificacao"] if c else ""),
+    "numero": lambda s, c: (s.numero,),
+    "classe": lambda s, c: (s.classeProcessual or "",),
+    "total_movimentos": lambda s, c: (s.total_movimentos,),
+    "ultima_movimentacao": lambda s, c: (
+        s.ultima_movimentacao is not None and s.ultima_movimentacao.dataHora is not None,
+        s.ultima_movimentacao.dataHora.isoformat() if s.ultima_movimentacao and s.ultima_movimentacao.dataHora else "",
+    ),
+}
+
+class ProcessRepository:
+    """
+    Process-wide, indexed view of the process store.
+
+    Holds every process in memory, indexed by numero and by classeProcessual,
+    plus the stored summary projection used by list views, and serves classifications from the database's numero -> classification map.
+    The snapshot is reloaded only when the store generation differs from the one
+    it was built at; writes made through the repository update the indexes in
+    place, so only writes from elsewhere (another worker, a script) force a reload.
+    Returned objects are shared: treat them as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._path: Optional[str] = None
+        self._generation: Optional[int] = None
+        self._by_numero: Dict[str, ProcessoData] = {}
+        self._by_classe: Dict[str, Dict[str, ProcessoData]] = {}
+        self._summaries: Dict[str, ProcessoResumo] = {}
+        # sort name -> ((generation, classification version), ascending [(key, numero)])
+        self._sorted: Dict[str, Tuple[tuple, List[Tuple[tuple, str]]]] = {}
+
+    # --- Snapshot maintenance ---
+
+    def _ensure_fresh(self):
+        generation = database.get_generation()
+        with self._lock:
+            if self._path == database.SQLITE_FILE and self._generation == generation:
+                return
+            self._by_numero = {}
+            self._by_classe = {}
+            self._summaries = {s.numero: s for s in database.load_summaries()}
+            for process in database.load_db():
+                self._index(process)
+            self._path = database.SQLITE_FILE
+            self._generation = generation
+
+    def _index(self, process: ProcessoData, summary: Optional[ProcessoResumo] = None):
+        if summary is not None:
+            self._summaries[process.numero] = summary
+        self._by_numero[process.numero] = process
+        self._by_classe.setdefault(process.classeProcessual or "", {})[process.numero] = process
+
+    def _unindex_classe(self, process: ProcessoData):
+        bucket = self._by_classe.get(process.classeProcessual or "", {})
+        bucket.pop(process.numero, None)
+        if not bucket:
+            self._by_classe.pop(process.classeProcessual or "", None)
+
+    def _unindex(self, numero: str):
+        process = self._by_numero.pop(numero, None)
+        self._summaries.pop(numero, None)
+        if process is not None:
+            self._unindex_classe(process)
+
+    def _index_saved(self, process: ProcessoData):
+        # Entries are replaced in place, so lock-free lookups never see the numero missing
+        previous = self._by_numero.get(process.numero)
+        if previous is not None and (previous.classeProcessual or "") != (process.classeProcessual or ""):
+            self._unindex_classe(previous)
+        # Raw XML is in the blob store now; don't pin it in memory
+        self._index(process.model_copy(update={"xml_raw": None}), process.resumo())
+
+    def _apply_write(self, generation: int, apply):
+        with self._lock:
+            if self._generation is not None and generation == self._generation + 1:
+                apply()
+                self._generation = generation
+            else:
+                # Someone else wrote in between; rebuild on next access
+                self._generation = None
+
+    def invalidate(self):
+        with self._lock:
+            self._generation = None
+
+    # --- Processes ---
+
+    def get(self, numero: str) -> Optional[ProcessoData]:
+        self._ensure_fresh()
+        return self._by_numero.get(numero)
+
+    def all(self) -> List[ProcessoData]:
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._by_numero.values())
+
+    def by_classe(self, classe: Optional[str]) -> List[ProcessoData]:
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._by_classe.get(classe or "", {}).values())
+
+    def summary(self, numero: str) -> Optional[ProcessoResumo]:
+        self._ensure_fresh()
+        return self._summaries.get(numero)
+
+    def summary_map(self) -> Dict[str, ProcessoResumo]:
+        """
+        Returns a copy of the numero -> summary map after a single freshness
+        check, for request-wide lookups.
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return dict(self._summaries)
+
+    def summaries(self) -> List[ProcessoResumo]:
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._summaries.values())
+
+    def sorted_index(self, sort: str) -> List[Tuple[tuple, str]]:
+        """
+        Returns [(key, numero)] in ascending order for one of SORT_KEYS. The list is
+        built once and reused until a process or classification write changes it.
+        """
+        self._ensure_fresh()
+        version = (self._generation, database.classification_version())
+        with self._lock:
+            cached = self._sorted.get(sort)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            key = SORT_KEYS[sort]
+            classifications = database.classification_index()
+            entries = sorted(
+                (key(summary, classifications.get(numero)), numero)
+                for numero, summary in self._summaries.items()
+            )
+            self._sorted[sort] = (version, entries)
+            return entries
+
+    def count(self) -> int:
+        self._ensure_fresh()
+        return len(self._by_numero)
+
+    def save(self, process: ProcessoData):
+        self._ensure_fresh()
+        self._apply_write(database.save_process(process), lambda: self._index_saved(process))
+
+    def save_many(self, processes: List[ProcessoData], clear_classifications: Iterable[str] = ()):
+        """
+        Saves a batch of processes in one transaction (see database.save_processes).
+        """
+        self._ensure_fresh()
+
+        def apply():
+            for process in processes:
+                self._index_saved(process)
+
+        self._apply_write(database.save_processes(processes, clear_classifications), apply)
+
+    def delete(self, numero: str):
+        self._ensure_fresh()
+        self._apply_write(database.delete_process(numero), lambda: self._unindex(numero))
+
+    # --- Classifications ---
+
+    def classification(self, numero: str) -> Optional[Dict[str, Any]]:
+        return database.classification_index().get(numero)
+
+    def classification_map(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns a copy of the numero -> classification map (one sync query).
+        """
+        return database.classification_snapshot()
+
+    def is_classified(self, numero: str) -> bool:
+        return numero in database.classification_index()
+
+    def classifications(self) -> List[Dict[str, Any]]:
+        return database.load_classifications()
+
+repository = ProcessRepository()
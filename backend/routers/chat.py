@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional
-from ..database import load_db, load_classifications
+from ..repository import repository
 from ..services.ai_classifier import get_client
-from ..routers.prompts import load_prompts
+from ..routers.prompts import prompt_for_class
 from ..config import Config
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -39,15 +39,13 @@ async def chat_about_process(numero_processo: str, request: ChatRequest):
     """
     
     # 1. Verificar se o processo existe
-    db = load_db()
-    process_data = next((p for p in db if p.numero == numero_processo), None)
+    process_data = repository.get(numero_processo)
     
     if not process_data:
         raise HTTPException(status_code=404, detail="Processo não encontrado.")
     
     # 2. Verificar se o processo foi classificado
-    classifications = load_classifications()
-    classification = next((c for c in classifications if c['numero_processo'] == numero_processo), None)
+    classification = repository.classification(numero_processo)
     
     if not classification:
         raise HTTPException(
@@ -56,14 +54,8 @@ async def chat_about_process(numero_processo: str, request: ChatRequest):
         )
     
     # 3. Buscar o prompt que foi usado na classificação
-    prompts = load_prompts()
-    class_code = process_data.classeProcessual
-    prompt_used = None
-    
-    for p in prompts:
-        if class_code in p.classes:
-            prompt_used = p.content
-            break
+    prompt = prompt_for_class(process_data.classeProcessual)
+    prompt_used = prompt.content if prompt else None
     
     if not prompt_used:
         prompt_used = "Nenhum prompt específico foi encontrado para esta classe processual."
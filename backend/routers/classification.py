@@ -2,42 +2,23 @@ from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
 import asyncio
 from ..models import ClassificacaoResult
-from ..services.ai_classifier import classify_process
-from ..database import load_db, save_classification_result, load_classifications
-import json
+from ..services.ai_classifier import classify_process, llm_cache
+from ..services.result_writer import classification_writer
+from ..database import save_classification_result
+from ..repository import repository
+from ..serialization import dumps_str
 import os
 from datetime import datetime
 from typing import Optional
 
 router = APIRouter(prefix="/classify", tags=["classification"])
 
-@router.post("/{numero_processo}", response_model=ClassificacaoResult)
-async def classify_process_endpoint(numero_processo: str):
-    # 1. Get process data
-    db = load_db()
-    process_data = next((p for p in db if p.numero == numero_processo), None)
-    
-    if not process_data:
-        raise HTTPException(status_code=404, detail="Processo não encontrado. Adicione-o primeiro.")
-    
-    # 2. Call AI
-    try:
-        result = await classify_process(process_data)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro na classificação: {str(e)}")
-    
-    # 3. Save result
-    save_classification_result(result)
-    
-    return result
-
-    return result
-
 @router.post("/analyze_all")
 async def analyze_all_endpoint(
     force: bool = False,
     max_concurrent: int = Query(default=5, ge=1, le=20),
-    classe_processual: Optional[str] = None
+    classe_processual: Optional[str] = None,
+    cache: bool = True
 ):
     """
     Classifica todos os processos pendentes em lote.
@@ -46,20 +27,13 @@ async def analyze_all_endpoint(
         force: Se True, reclassifica processos já classificados
         max_concurrent: Número máximo de classificações simultâneas (1-20)
         classe_processual: Se especificado, classifica apenas processos desta classe
+        cache: Se False, ignora respostas da IA em cache e consulta novamente
     """
-    processes = load_db()
-    classifications = load_classifications()
-
-    # Filter processes to analyze
-    to_analyze = []
-    for p in processes:
-        # Filter by classe if specified
-        if classe_processual and p.classeProcessual != classe_processual:
-            continue
+    processes = repository.all()
 
-        is_classified = any(c['numero_processo'] == p.numero for c in classifications)
-        if not is_classified or force:
-            to_analyze.append(p)
+    # Filter processes to analyze (by classe, if specified)
+    candidates = repository.by_classe(classe_processual) if classe_processual else processes
+    to_analyze = [p for p in candidates if force or not repository.is_classified(p.numero)]
 
     if not to_analyze:
         return {
@@ -77,23 +51,25 @@ async def analyze_all_endpoint(
     errors = []
 
     async def analyze_with_limit(process):
-        async with semaphore:
-            try:
-                result = await classify_process(process)
-                save_classification_result(result)
-                results.append({
-                    "numero": process.numero,
-                    "classe": process.classeProcessual,
-                    "classificacao": result.classificacao.get("tipo_intimacao", "N/A")
-                })
-            except Exception as e:
-                error_detail = {
-                    "numero": process.numero,
-                    "classe": process.classeProcessual,
-                    "erro": str(e)
-                }
-                errors.append(error_detail)
-                print(f"Erro ao classificar {process.numero}: {str(e)}")
+        try:
+            async with semaphore:
+                result = await classify_process(process, use_cache=cache)
+                saved = classification_writer.submit(result)
+            # Wait for the group commit outside the semaphore so the next LLM call can start
+            await saved
+            results.append({
+                "numero": process.numero,
+                "classe": process.classeProcessual,
+                "classificacao": result.classificacao.get("tipo_intimacao", "N/A")
+            })
+        except Exception as e:
+            error_detail = {
+                "numero": process.numero,
+                "classe": process.classeProcessual,
+                "erro": str(e)
+            }
+            errors.append(error_detail)
+            print(f"Erro ao classificar {process.numero}: {str(e)}")
 
     await asyncio.gather(*[analyze_with_limit(p) for p in to_analyze])
 
@@ -116,7 +92,8 @@ async def analyze_all_endpoint(
 async def batch_classify_with_progress(
     force: bool = False,
     max_concurrent: int = Query(default=5, ge=1, le=20),
-    classe_processual: Optional[str] = None
+    classe_processual: Optional[str] = None,
+    cache: bool = True
 ):
     """
     Classifica todos os processos pendentes com feedback em tempo real via SSE.
@@ -125,32 +102,25 @@ async def batch_classify_with_progress(
         force: Se True, reclassifica processos já classificados
         max_concurrent: Número máximo de classificações simultâneas (1-20)
         classe_processual: Se especificado, classifica apenas processos desta classe
+        cache: Se False, ignora respostas da IA em cache e consulta novamente
 
     Returns:
         Stream de eventos com o progresso da classificação
     """
     async def event_generator():
-        processes = load_db()
-        classifications = load_classifications()
-
-        # Filter processes to analyze
-        to_analyze = []
-        for p in processes:
-            if classe_processual and p.classeProcessual != classe_processual:
-                continue
-            is_classified = any(c['numero_processo'] == p.numero for c in classifications)
-            if not is_classified or force:
-                to_analyze.append(p)
+        # Filter processes to analyze (by classe, if specified)
+        candidates = repository.by_classe(classe_processual) if classe_processual else repository.all()
+        to_analyze = [p for p in candidates if force or not repository.is_classified(p.numero)]
 
         total = len(to_analyze)
 
         if total == 0:
-            yield f"data: {json.dumps({'type': 'info', 'message': 'Nenhum processo pendente para análise'})}\n\n"
-            yield f"data: {json.dumps({'type': 'complete', 'total': 0, 'sucesso': 0, 'erros': 0})}\n\n"
+            yield f"data: {dumps_str({'type': 'info', 'message': 'Nenhum processo pendente para análise'})}\n\n"
+            yield f"data: {dumps_str({'type': 'complete', 'total': 0, 'sucesso': 0, 'erros': 0})}\n\n"
             return
 
         # Send initial info
-        yield f"data: {json.dumps({'type': 'start', 'total': total, 'max_concurrent': max_concurrent})}\n\n"
+        yield f"data: {dumps_str({'type': 'start', 'total': total, 'max_concurrent': max_concurrent})}\n\n"
 
         start_time = datetime.now()
         semaphore = asyncio.Semaphore(max_concurrent)
@@ -165,8 +135,8 @@ async def batch_classify_with_progress(
 
         async def analyze_with_progress(process):
             nonlocal completed, success_count, error_count
-            async with semaphore:
-                try:
+            try:
+                async with semaphore:
                     # Send processing event
                     progress_data = {
                         'type': 'processing',
@@ -177,41 +147,43 @@ async def batch_classify_with_progress(
                     }
                     await event_queue.put(progress_data)
 
-                    result = await classify_process(process)
-                    save_classification_result(result)
-
-                    completed += 1
-                    success_count += 1
-
-                    # Send success event
-                    success_data = {
-                        'type': 'success',
-                        'numero': process.numero,
-                        'classe': process.classeProcessual,
-                        'classificacao': result.classificacao.get("tipo_intimacao", "N/A"),
-                        'completed': completed,
-                        'total': total,
-                        'progress_percent': round((completed / total) * 100, 1)
-                    }
-                    await event_queue.put(success_data)
-                    results.append(success_data)
-
-                except Exception as e:
-                    completed += 1
-                    error_count += 1
+                    result = await classify_process(process, use_cache=cache)
+                    saved = classification_writer.submit(result)
+                # Wait for the group commit outside the semaphore so the next LLM call can start
+                await saved
+
+                completed += 1
+                success_count += 1
+
+                # Send success event
+                success_data = {
+                    'type': 'success',
+                    'numero': process.numero,
+                    'classe': process.classeProcessual,
+                    'classificacao': result.classificacao.get("tipo_intimacao", "N/A"),
+                    'completed': completed,
+                    'total': total,
+                    'progress_percent': round((completed / total) * 100, 1)
+                }
+                await event_queue.put(success_data)
+                results.append(success_data)
 
-                    # Send error event
-                    error_data = {
-                        'type': 'error',
-                        'numero': process.numero,
-                        'classe': process.classeProcessual,
-                        'erro': str(e),
-                        'completed': completed,
-                        'total': total,
-                        'progress_percent': round((completed / total) * 100, 1)
-                    }
-                    await event_queue.put(error_data)
-                    errors.append(error_data)
+            except Exception as e:
+                completed += 1
+                error_count += 1
+
+                # Send error event
+                error_data = {
+                    'type': 'error',
+                    'numero': process.numero,
+                    'classe': process.classeProcessual,
+                    'erro': str(e),
+                    'completed': completed,
+                    'total': total,
+                    'progress_percent': round((completed / total) * 100, 1)
+                }
+                await event_queue.put(error_data)
+                errors.append(error_data)
 
         # Start all tasks
         tasks = [asyncio.create_task(analyze_with_progress(p)) for p in to_analyze]
@@ -220,7 +192,7 @@ async def batch_classify_with_progress(
         while completed < total:
             try:
                 event_data = await asyncio.wait_for(event_queue.get(), timeout=1.0)
-                yield f"data: {json.dumps(event_data)}\n\n"
+                yield f"data: {dumps_str(event_data)}\n\n"
             except asyncio.TimeoutError:
                 continue
 
@@ -241,7 +213,7 @@ async def batch_classify_with_progress(
             'resultados': results,
             'detalhes_erros': errors
         }
-        yield f"data: {json.dumps(complete_data)}\n\n"
+        yield f"data: {dumps_str(complete_data)}\n\n"
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
@@ -250,8 +222,8 @@ def get_classification_statistics():
     """
     Retorna estatísticas sobre as classificações realizadas.
     """
-    processes = load_db()
-    classifications = load_classifications()
+    processes = repository.all()
+    classifications = repository.classifications()
 
     total_processes = len(processes)
     total_classified = len(classifications)
@@ -265,8 +237,7 @@ def get_classification_statistics():
             by_class[classe] = {"total": 0, "classified": 0, "pending": 0}
         by_class[classe]["total"] += 1
 
-        is_classified = any(c['numero_processo'] == p.numero for c in classifications)
-        if is_classified:
+        if repository.is_classified(p.numero):
             by_class[classe]["classified"] += 1
         else:
             by_class[classe]["pending"] += 1
@@ -286,6 +257,41 @@ def get_classification_statistics():
         "classification_types": classification_types
     }
 
+@router.post("/{numero_processo}", response_model=ClassificacaoResult)
+async def classify_process_endpoint(numero_processo: str, cache: bool = True):
+    # 1. Get process data
+    process_data = repository.get(numero_processo)
+    
+    if not process_data:
+        raise HTTPException(status_code=404, detail="Processo não encontrado. Adicione-o primeiro.")
+    
+    # 2. Call AI
+    try:
+        result = await classify_process(process_data, use_cache=cache)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na classificação: {str(e)}")
+    
+    # 3. Save result
+    save_classification_result(result)
+    
+    return result
+
+    return result
+
+@router.get("/writer_stats")
+def get_writer_statistics():
+    """
+    Retorna métricas do gravador em lote (profundidade da fila e latência de gravação).
+    """
+    return classification_writer.stats()
+
+@router.get("/cache_stats")
+def get_cache_statistics():
+    """
+    Retorna métricas do cache de respostas da IA (acertos, faltas, entradas e remoções).
+    """
+    return llm_cache.stats()
+
 @router.get("/", response_model=list)
 def list_classifications():
-    return load_classifications()
+    return repository.classifications()
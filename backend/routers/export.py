@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Response
 from typing import List
 from ..models import ProcessoData, ClassificacaoResult
-from ..database import load_db, load_classifications
+from ..repository import repository
 import json
 import pandas as pd
 from io import BytesIO
@@ -14,19 +14,13 @@ def export_json():
     """
     Export all processes and their classifications to JSON.
     """
-    processes = load_db()
-    classifications = load_classifications()
-    
     # Merge data
     data = []
-    for p in processes:
+    for p in repository.all():
         p_dict = p.model_dump(mode='json')
-        # Remove raw XML to keep it clean
-        if 'xml_raw' in p_dict:
-            del p_dict['xml_raw']
-            
+
         # Find classification
-        cls = next((c for c in classifications if c['numero_processo'] == p.numero), None)
+        cls = repository.classification(p.numero)
         if cls:
             p_dict['classificacao'] = cls['classificacao']
             p_dict['data_classificacao'] = cls['data_classificacao']
@@ -39,12 +33,9 @@ def export_excel():
     """
     Export summary data to Excel.
     """
-    processes = load_db()
-    classifications = load_classifications()
-    
     rows = []
-    for p in processes:
-        cls = next((c for c in classifications if c['numero_processo'] == p.numero), None)
+    for p in repository.all():
+        cls = repository.classification(p.numero)
         
         row = {
             "Número do Processo": p.numero,
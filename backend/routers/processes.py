@@ -1,144 +1,466 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File
-from typing import List, Dict, Any
-from ..models import ProcessoData
-from ..services.tjms_client import soap_consultar_processo
+from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File, Query, Response, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import List, Dict, Any, Optional, Set, Literal
+from datetime import date, timedelta
+from bisect import bisect_left, bisect_right
+import asyncio
+import base64
+from ..models import ProcessoData, ProcessoResumo, UploadResultado, BulkFetchRequest
+from ..services.tjms_client import (
+    soap_consultar_processo_async, tjms_session, async_tjms_client, tjms_throttle, consult_metrics, soap_cache,
+    erro_consulta, MODO_MOVIMENTOS,
+)
+from ..services.throttle import CircuitOpenError
+from ..services.sync_scheduler import sync_scheduler
 from ..services.xml_parser import parse_processo_xml
-from ..database import load_db, save_db, load_classifications
+from ..services.ingest import (
+    parse_files, merge_parsed, detect_format, iter_entries, next_batch, SPOOL_MEMORY_BYTES, INGEST_BATCH_SIZE,
+)
+from ..serialization import dumps_str
+from ..repository import repository, SORT_KEYS
 import json
 import os
+import tempfile
+import time
 
 router = APIRouter(prefix="/processes", tags=["processes"])
 
+# Default projection: the stored summary plus the classification code/date.
+SUMMARY_FIELDS = set(ProcessoResumo.model_fields) | {"tipo_intimacao", "data_classificacao"}
+# Fields a client must opt into with include= (or by naming them in fields=)
+HEAVY_FIELDS = {"assuntos", "movimentos", "classificacao", "xml_sha256", "xml_size", "fingerprint"}
+
+# consultarProcesso mode for TJ-MS fetches: the pipeline only needs movements
+ModoConsulta = Literal["completo", "movimentos"]
+
+def _parse_field_list(value: Optional[str], param: str) -> Set[str]:
+    if not value:
+        return set()
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = names - SUMMARY_FIELDS - HEAVY_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos em '{param}': {', '.join(sorted(unknown))}")
+    return names
+
+def _codigo_classificacao(classificacao: Dict[str, Any]) -> Optional[str]:
+    return classificacao.get('tipo_intimacao') or classificacao.get('codigo') or classificacao.get('classificacao')
+
+def _project(summary: ProcessoResumo, cls: Optional[Dict[str, Any]], include: Set[str], fields: Set[str]) -> Dict[str, Any]:
+    item = summary.model_dump(mode='json')
+
+    item['tipo_intimacao'] = _codigo_classificacao(cls['classificacao']) if cls else None
+    item['data_classificacao'] = cls['data_classificacao'] if cls else None
+
+    heavy = (include | fields) & HEAVY_FIELDS
+    if heavy - {"classificacao"}:
+        process = repository.get(summary.numero)
+        item.update(process.model_dump(mode='json', include=heavy - {"classificacao"}))
+    if "classificacao" in heavy:
+        item['classificacao'] = cls['classificacao'] if cls else None
+
+    if fields:
+        item = {k: v for k, v in item.items() if k in fields}
+    return item
+
+def _encode_cursor(sort: str, order: str, entry) -> str:
+    key, numero = entry
+    payload = json.dumps({"s": sort, "o": order, "k": list(key), "n": numero}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str, sort: str, order: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if payload["s"] != sort or payload["o"] != order:
+            raise ValueError("sort/order mismatch")
+        return (tuple(payload["k"]), payload["n"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido para esta ordenação")
+
 @router.get("/", response_model=List[Dict[str, Any]])
-def list_processes():
-    processes = load_db()
-    classifications = load_classifications()
-
-    result = []
-    for p in processes:
-        p_dict = p.model_dump(mode='json')
-        # Find classification
-        cls = next((c for c in classifications if c['numero_processo'] == p.numero), None)
-        if cls:
-            p_dict['classificacao'] = cls['classificacao']
-            p_dict['data_classificacao'] = cls['data_classificacao']
-        result.append(p_dict)
-
-    # Sort by classification date (most recent first)
-    # Processes with classification come first, sorted by date descending
-    # Processes without classification come after
-    result.sort(key=lambda x: (
-        x.get('data_classificacao') is not None,  # True (classified) comes after False (not classified) if reverse=True? No.
-        # Let's be explicit:
-        # We want: Classified (Newest -> Oldest) -> Unclassified
-        # Tuple comparison: (is_classified, date)
-        # (1, "2023-10-27") > (1, "2023-10-26") > (0, "")
-        # So reverse=True works.
-        x.get('data_classificacao') is not None,
-        x.get('data_classificacao', '')
-    ), reverse=True)
-
-    return result
-
-@router.post("/upload", response_model=List[ProcessoData])
+def list_processes(
+    response: Response,
+    include: Optional[str] = None,
+    fields: Optional[str] = None,
+    classe_processual: Optional[str] = None,
+    status: Optional[Literal["classificado", "pendente"]] = None,
+    tipo_intimacao: Optional[str] = None,
+    classificado_desde: Optional[date] = None,
+    classificado_ate: Optional[date] = None,
+    sort: Literal["data_classificacao", "numero", "classe", "total_movimentos", "ultima_movimentacao"] = "data_classificacao",
+    order: Literal["asc", "desc"] = "desc",
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+):
+    """
+    Lista os processos usando a projeção resumida (sem movimentações nem XML).
+
+    Args:
+        include: Campos pesados a incluir, separados por vírgula (ex: movimentos,classificacao)
+        fields: Restringe a resposta a estes campos, separados por vírgula
+        classe_processual, status, tipo_intimacao, classificado_desde, classificado_ate: Filtros
+        sort, order: Ordenação (padrão: classificados mais recentes primeiro, depois pendentes)
+        limit: Tamanho da página. Quando há mais resultados, o cabeçalho X-Next-Cursor
+            traz o valor a enviar em cursor= para buscar a próxima página.
+    """
+    include_set = _parse_field_list(include, "include")
+    fields_set = _parse_field_list(fields, "fields")
+
+    desde = classificado_desde.isoformat() if classificado_desde else None
+    ate = (classificado_ate + timedelta(days=1)).isoformat() if classificado_ate else None
+
+    # One freshness check and one classification sync for the whole request. Both are
+    # private copies: concurrent saves and classification writes can't change them under us
+    summaries = repository.summary_map()
+    classifications = repository.classification_map()
+
+    # Narrow to the matching numeros with the class index and the classified set
+    candidates: Optional[Set[str]] = None
+    if classe_processual:
+        candidates = {p.numero for p in repository.by_classe(classe_processual)}
+    if status == "pendente":
+        candidates = (set(summaries) if candidates is None else candidates) - classifications.keys()
+    elif status == "classificado" or tipo_intimacao or desde or ate:
+        candidates = set(classifications) if candidates is None else candidates & classifications.keys()
+
+    def matches(cls: Dict[str, Any]) -> bool:
+        if tipo_intimacao and _codigo_classificacao(cls['classificacao']) != tipo_intimacao:
+            return False
+        if desde and cls['data_classificacao'] < desde:
+            return False
+        if ate and cls['data_classificacao'] >= ate:
+            return False
+        return True
+
+    if candidates is None:
+        # Unfiltered: walk the precomputed sorted index
+        entries = repository.sorted_index(sort)
+    else:
+        if tipo_intimacao or desde or ate:
+            candidates = {n for n in candidates if n in classifications and matches(classifications[n])}
+        key = SORT_KEYS[sort]
+        entries = sorted(
+            (key(summaries[n], classifications.get(n)), n) for n in candidates if n in summaries
+        )
+
+    descending = order == "desc"
+    if cursor:
+        position = _decode_cursor(cursor, sort, order)
+        index = bisect_left(entries, position) - 1 if descending else bisect_right(entries, position)
+    else:
+        index = len(entries) - 1 if descending else 0
+    step = -1 if descending else 1
+
+    page = []
+    last_entry = None
+    while 0 <= index < len(entries):
+        numero = entries[index][1]
+        summary = summaries.get(numero)
+        if summary is not None:
+            page.append(_project(summary, classifications.get(numero), include_set, fields_set))
+            last_entry = entries[index]
+            if limit and len(page) >= limit:
+                break
+        index += step
+
+    if limit and len(page) >= limit and 0 <= index + step < len(entries):
+        response.headers["X-Next-Cursor"] = _encode_cursor(sort, order, last_entry)
+
+    return page
+
+@router.post("/upload", response_model=UploadResultado)
 async def upload_processes(files: List[UploadFile] = File(...)):
-    uploaded_processes = []
-    db = load_db()
-    
-    for file in files:
-        try:
-            content = await file.read()
-            xml_content = content.decode('utf-8')
-            process_data = parse_processo_xml(xml_content)
-            
-            # Check for duplicates
-            existing_process = next((p for p in db if p.numero == process_data.numero), None)
-            if existing_process:
-                # Check if classified
-                classifications = load_classifications()
-                is_classified = any(c['numero_processo'] == process_data.numero for c in classifications)
-                
-                if is_classified:
-                    if existing_process.xml_raw == process_data.xml_raw:
-                        print(f"Skipping {process_data.numero}: Already classified and identical.")
-                        continue # Skip this file
-                    else:
-                        # Content changed, remove old classification to re-analyze
-                        from ..database import delete_classification
-                        delete_classification(process_data.numero)
-
-            # Remove existing if any
-            db = [p for p in db if p.numero != process_data.numero]
-            db.append(process_data)
-            uploaded_processes.append(process_data)
-        except Exception as e:
-            print(f"Error parsing file {file.filename}: {e}")
-            continue
-            
-    save_db(db)
-    return uploaded_processes
+    """
+    Processa os XMLs enviados em paralelo e grava todos numa única transação.
+    Retorna o resultado por arquivo (novo, atualizado, ignorado ou erro).
+    """
+    contents = [(file.filename or "", await file.read()) for file in files]
+    parsed = await parse_files(contents)
+    return await asyncio.to_thread(merge_parsed, parsed)
+
+@router.post("/ingest")
+async def ingest_archive(request: Request, formato: Optional[Literal["zip", "tar.gz", "ndjson"]] = None):
+    """
+    Importa em lote um arquivo ZIP, tar.gz ou NDJSON enviado como corpo da requisição
+    (ex: curl --data-binary @intimacoes.zip). Os XMLs são extraídos e processados
+    aos poucos, com as mesmas regras de duplicidade do upload, e o progresso de cada
+    arquivo é enviado via SSE.
+
+    Args:
+        formato: zip, tar.gz ou ndjson; se omitido, é detectado pelo Content-Type ou pelo conteúdo
+    """
+    # Spool the body (to disk past SPOOL_MEMORY_BYTES) so memory stays bounded
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    head = b""
+    size = 0
+    async for chunk in request.stream():
+        if len(head) < 4:
+            head += chunk[:4 - len(head)]
+        spool.write(chunk)
+        size += len(chunk)
+    if size == 0:
+        spool.close()
+        raise HTTPException(status_code=400, detail="Corpo da requisição vazio.")
+    spool.seek(0)
+
+    formato = formato or detect_format(head, request.headers.get("content-type"))
+    # Also closed by the generator, but that never runs if the client leaves before it starts
+    return StreamingResponse(
+        _ingest_events(spool, formato), media_type="text/event-stream", background=BackgroundTask(spool.close)
+    )
+
+async def _ingest_events(spool, formato: str):
+    totals = UploadResultado()
+    start = time.perf_counter()
+    try:
+        yield f"data: {dumps_str({'type': 'start', 'formato': formato})}\n\n"
+        entries = iter_entries(spool, formato)
+
+        while True:
+            # Archive reads and decompression happen in a worker thread
+            batch = await asyncio.to_thread(next_batch, entries)
+            if not batch:
+                break
+
+            parsed_ok = iter(await parse_files([(name, content) for name, content, _ in batch if content is not None]))
+            parsed = [
+                next(parsed_ok) if content is not None else (name, None, error)
+                for name, content, error in batch
+            ]
+            resultado = await asyncio.to_thread(merge_parsed, parsed)
+
+            for arquivo in resultado.arquivos:
+                totals.total += 1
+                totals.contar(arquivo.status)
+                event = {'type': 'arquivo', **arquivo.model_dump(), 'processados': totals.total}
+                yield f"data: {dumps_str(event)}\n\n"
+    except Exception as e:
+        # Corrupt archive, database locked, disk full...: report it, then the partial totals
+        yield f"data: {dumps_str({'type': 'error', 'erro': f'Erro na importação: {e}', 'processados': totals.total})}\n\n"
+    finally:
+        spool.close()
+
+    duration = time.perf_counter() - start
+    complete = {
+        'type': 'complete',
+        **totals.model_dump(exclude={'arquivos'}),
+        'duracao_segundos': round(duration, 2),
+        'arquivos_por_segundo': round(totals.total / duration, 2) if duration > 0 else 0,
+    }
+    yield f"data: {dumps_str(complete)}\n\n"
 
 @router.delete("/{numero_processo}")
 def delete_process_endpoint(numero_processo: str):
-    from ..database import delete_process, delete_classification
-    delete_process(numero_processo)
+    from ..database import delete_classification
+    repository.delete(numero_processo)
     delete_classification(numero_processo)
+    soap_cache.invalidate(numero_processo)
     return {"message": "Processo excluído com sucesso"}
 
-@router.post("/{numero_processo}", response_model=ProcessoData)
-def add_process(numero_processo: str):
-    # 1. Fetch XML
-    try:
-        xml_content = soap_consultar_processo(numero_processo)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao consultar TJ-MS: {str(e)}")
-    
-    # 2. Parse XML
-    try:
-        process_data = parse_processo_xml(xml_content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erro ao processar XML: {str(e)}")
-    
+@router.post("/bulk")
+async def bulk_fetch_processes(
+    request: BulkFetchRequest,
+    max_concurrent: int = Query(default=10, ge=1, le=50),
+    modo: ModoConsulta = MODO_MOVIMENTOS,
+    cache: bool = True,
+):
+    """
+    Consulta no TJ-MS uma lista de processos (até milhares), em paralelo, e grava
+    cada um com as mesmas regras de duplicidade do upload. O progresso é enviado via SSE.
+
+    Args:
+        max_concurrent: Número máximo de consultas simultâneas desta requisição (1-50)
+        modo: "movimentos" (padrão, sem metadados dos documentos) ou "completo"
+        cache: false para ignorar respostas em cache e consultar sempre o TJ-MS
+    """
+    # Strip and de-duplicate, keeping the original order
+    numeros = list(dict.fromkeys(n.strip() for n in request.numeros if n.strip()))
+
+    async def event_generator():
+        total = len(numeros)
+        yield f"data: {dumps_str({'type': 'start', 'total': total, 'max_concurrent': max_concurrent})}\n\n"
+
+        start_time = time.perf_counter()
+        semaphore = asyncio.Semaphore(max_concurrent)
+        parsed_queue: asyncio.Queue = asyncio.Queue()
+        event_queue: asyncio.Queue = asyncio.Queue()
+        totals = UploadResultado(total=total)
+
+        async def fetch(numero: str):
+            try:
+                async with semaphore:
+                    xml_content = await soap_consultar_processo_async(numero, modo=modo, bypass_cache=not cache)
+                erro = erro_consulta(xml_content)
+                if erro:
+                    # e.g. not found: there is no process to save
+                    parsed = (numero, None, erro)
+                else:
+                    parsed = (await parse_files([(numero, xml_content.encode('utf-8'))]))[0]
+            except Exception as e:
+                parsed = (numero, None, f"Erro ao consultar TJ-MS: {e}")
+            await parsed_queue.put(parsed)
+
+        async def merge():
+            # Single writer: drains whatever is parsed and saves it in one transaction
+            completed = 0
+            try:
+                while completed < total:
+                    batch = [await parsed_queue.get()]
+                    while not parsed_queue.empty() and len(batch) < INGEST_BATCH_SIZE:
+                        batch.append(parsed_queue.get_nowait())
+                    resultado = await asyncio.to_thread(merge_parsed, batch)
+                    for arquivo in resultado.arquivos:
+                        completed += 1
+                        totals.contar(arquivo.status)
+                        await event_queue.put({
+                            'type': 'error' if arquivo.status == 'erro' else 'success',
+                            'numero': arquivo.arquivo,
+                            'status': arquivo.status,
+                            'detalhe': arquivo.detalhe,
+                            'completed': completed,
+                            'total': total,
+                            'progress_percent': round((completed / total) * 100, 1),
+                        })
+            except Exception as e:
+                # e.g. database locked or disk full: report it and end the stream
+                await event_queue.put({
+                    'type': 'error',
+                    'erro': f"Erro ao gravar processos: {e}",
+                    'completed': completed,
+                    'total': total,
+                })
+            finally:
+                event_queue.put_nowait(None)
+
+        tasks = [asyncio.create_task(fetch(n)) for n in numeros]
+        tasks.append(asyncio.create_task(merge()))
+        try:
+            while True:
+                event_data = await event_queue.get()
+                if event_data is None:
+                    break
+                yield f"data: {dumps_str(event_data)}\n\n"
+        finally:
+            # Client went away or the merge failed: stop fetching
+            for task in tasks:
+                task.cancel()
+
+        duration = time.perf_counter() - start_time
+        complete_data = {
+            'type': 'complete',
+            **totals.model_dump(exclude={'arquivos'}),
+            'duracao_segundos': round(duration, 2),
+            'processos_por_segundo': round(total / duration, 2) if duration > 0 else 0,
+        }
+        yield f"data: {dumps_str(complete_data)}\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+@router.post("/sync", status_code=202)
+async def start_sync():
+    """
+    Inicia agora um ciclo de ressincronização com o TJ-MS (sem esperar o intervalo).
+    """
+    started = sync_scheduler.trigger()
+    return {
+        "message": "Sincronização iniciada" if started else "Sincronização já em andamento",
+        **sync_scheduler.stats(),
+    }
+
+@router.get("/sync_status")
+def get_sync_status():
+    """
+    Estado da ressincronização periódica: ciclos, processos verificados e alterados,
+    movimentos novos e fila de reclassificação.
+    """
+    return sync_scheduler.stats()
+
+def _store_fetched(process_data: ProcessoData):
     # 3. Check for duplicates
-    db = load_db()
-    existing_process = next((p for p in db if p.numero == process_data.numero), None)
-    
+    existing_process = repository.get(process_data.numero)
+
     if existing_process:
         # Check if classified
-        classifications = load_classifications()
-        is_classified = any(c['numero_processo'] == process_data.numero for c in classifications)
-        
+        is_classified = repository.is_classified(process_data.numero)
+
         if is_classified:
-            if existing_process.xml_raw == process_data.xml_raw:
+            if existing_process.fingerprint == process_data.fingerprint:
                 raise HTTPException(status_code=409, detail="Processo já classificado com esta mesma intimação.")
             else:
                 # Content changed, remove old classification to re-analyze
                 from ..database import delete_classification
                 delete_classification(process_data.numero)
 
-    # 4. Save to DB
-    # Remove existing if any
-    db = [p for p in db if p.numero != process_data.numero]
-    db.append(process_data)
-    save_db(db)
-    
+    # 4. Save to DB (insert or replace)
+    repository.save(process_data)
+
+def _parse_timed(xml_content: str, modo: str) -> ProcessoData:
+    start = time.perf_counter()
+    process_data = parse_processo_xml(xml_content)
+    consult_metrics.record_parse(modo, (time.perf_counter() - start) * 1000)
     return process_data
 
+@router.post("/{numero_processo}", response_model=ProcessoData)
+async def add_process(numero_processo: str, modo: ModoConsulta = MODO_MOVIMENTOS, cache: bool = True):
+    """
+    Consulta o processo no TJ-MS e o grava.
+
+    Args:
+        modo: "movimentos" (padrão, sem metadados dos documentos) ou "completo"
+        cache: false para ignorar a resposta em cache e consultar o TJ-MS
+    """
+    # 1. Fetch XML (or a cached response)
+    try:
+        xml_content = await soap_consultar_processo_async(numero_processo, modo=modo, bypass_cache=not cache)
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(max(int(e.retry_after), 1))}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao consultar TJ-MS: {str(e)}")
+
+    erro = erro_consulta(xml_content)
+    if erro:
+        raise HTTPException(status_code=404, detail=erro)
+
+    # 2. Parse XML (CPU-bound, off the event loop)
+    try:
+        process_data = await asyncio.to_thread(_parse_timed, xml_content, modo)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao processar XML: {str(e)}")
+
+    # 3-4. Dedupe and save (SQLite + blob store)
+    await asyncio.to_thread(_store_fetched, process_data)
+
+    return process_data
+
+@router.get("/tjms_stats")
+def get_tjms_stats():
+    """
+    Estatísticas da sessão HTTP compartilhada com o TJ-MS (requisições, latência
+    e reaproveitamento de conexões) e, por modo de consulta, tamanho das respostas,
+    latência e tempo de parsing, além dos acertos do cache de respostas e do estado
+    do limitador (circuito, limite de concorrência, tokens).
+    """
+    return {
+        "throttle": tjms_throttle.stats(),
+        "session": tjms_session.stats(),
+        "async_client": async_tjms_client.stats(),
+        "modos": consult_metrics.stats(),
+        "cache": soap_cache.stats(),
+    }
+
 @router.get("/{numero_processo}", response_model=Dict[str, Any])
-def get_process(numero_processo: str):
-    db = load_db()
-    process = next((p for p in db if p.numero == numero_processo), None)
+def get_process(numero_processo: str, include: Optional[str] = None, fields: Optional[str] = None):
+    """
+    Retorna um processo na projeção resumida; use include= para campos pesados.
+    """
+    include_set = _parse_field_list(include, "include")
+    fields_set = _parse_field_list(fields, "fields")
+
+    summary = repository.summary(numero_processo)
     
-    if not process:
+    if not summary:
         raise HTTPException(status_code=404, detail="Processo não encontrado")
         
-    p_dict = process.model_dump(mode='json')
-    
-    # Add classification if exists
-    classifications = load_classifications()
-    cls = next((c for c in classifications if c['numero_processo'] == numero_processo), None)
-    if cls:
-        p_dict['classificacao'] = cls['classificacao']
-        p_dict['data_classificacao'] = cls['data_classificacao']
-        
-    return p_dict
+    return _project(summary, repository.classification(numero_processo), include_set, fields_set)
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
 import os
+import tempfile
+import threading
 
 router = APIRouter(prefix="/prompts", tags=["prompts"])
 
@@ -14,7 +16,22 @@ class PromptConfig(BaseModel):
     classes: List[str] # List of class codes, e.g. ["7", "1116"]
     content: str
 
-def load_prompts() -> List[PromptConfig]:
+# Parsed prompts and the class code -> prompt index, kept until prompts.json
+# changes: save_prompts() swaps in the new state, and a hand edit of the file
+# (new mtime/size) triggers a rebuild on the next read.
+_cache: Optional[Tuple[tuple, List[PromptConfig], Dict[str, PromptConfig]]] = None
+_cache_lock = threading.Lock()
+# Serializes the CRUD routes' read-modify-write of prompts.json
+_write_lock = threading.Lock()
+
+def _file_key() -> tuple:
+    try:
+        st = os.stat(PROMPTS_FILE)
+        return (os.path.abspath(PROMPTS_FILE), st.st_mtime_ns, st.st_size)
+    except OSError:
+        return (os.path.abspath(PROMPTS_FILE), None, None)
+
+def _read_prompts() -> List[PromptConfig]:
     if not os.path.exists(PROMPTS_FILE):
         # Default prompts if file doesn't exist
         return [
@@ -39,9 +56,71 @@ Retorne um JSON no seguinte formato:
     except:
         return []
 
+def _build_index(prompts: List[PromptConfig]) -> Dict[str, PromptConfig]:
+    index: Dict[str, PromptConfig] = {}
+    for p in prompts:
+        for classe in p.classes:
+            if classe in index and index[classe].id != p.id:
+                # Written before conflicts were rejected: keep the first match, as before
+                print(f"Aviso: classe '{classe}' está nos prompts '{index[classe].id}' e '{p.id}'; usando '{index[classe].id}'")
+                continue
+            index.setdefault(classe, p)
+    return index
+
+def _load() -> Tuple[tuple, List[PromptConfig], Dict[str, PromptConfig]]:
+    global _cache
+    key = _file_key()
+    with _cache_lock:
+        if _cache is None or _cache[0] != key:
+            prompts = _read_prompts()
+            _cache = (key, prompts, _build_index(prompts))
+        return _cache
+
+def load_prompts() -> List[PromptConfig]:
+    return list(_load()[1])
+
+def prompt_for_class(classe_processual: Optional[str]) -> Optional[PromptConfig]:
+    """
+    The prompt configured for a class code, or None.
+    """
+    return _load()[2].get(classe_processual)
+
+def class_conflicts(prompt: PromptConfig, prompts: List[PromptConfig], replacing: Optional[str] = None) -> Dict[str, str]:
+    """
+    Classes of `prompt` already assigned to another prompt (class -> prompt id).
+    `replacing` is the id of the prompt being updated, which does not count.
+    """
+    classes = set(prompt.classes)
+    return {
+        classe: p.id
+        for p in prompts
+        if p.id not in (prompt.id, replacing)
+        for classe in p.classes
+        if classe in classes
+    }
+
+def _check_conflicts(prompt: PromptConfig, prompts: List[PromptConfig], replacing: Optional[str] = None):
+    conflicts = class_conflicts(prompt, prompts, replacing)
+    if conflicts:
+        detail = ", ".join(f"{classe} (prompt '{pid}')" for classe, pid in sorted(conflicts.items()))
+        raise HTTPException(status_code=409, detail=f"Classe já atribuída a outro prompt: {detail}")
+
 def save_prompts(prompts: List[PromptConfig]):
-    with open(PROMPTS_FILE, "w", encoding="utf-8") as f:
-        json.dump([p.model_dump() for p in prompts], f, indent=2, ensure_ascii=False)
+    global _cache
+    directory = os.path.dirname(os.path.abspath(PROMPTS_FILE))
+    # Write to a temp file and rename so a reader never sees a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump([p.model_dump() for p in prompts], f, indent=2, ensure_ascii=False)
+        with _cache_lock:
+            os.replace(tmp_path, PROMPTS_FILE)
+            prompts = list(prompts)
+            _cache = (_file_key(), prompts, _build_index(prompts))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 @router.get("/", response_model=List[PromptConfig])
 def list_prompts():
@@ -49,26 +128,31 @@ def list_prompts():
 
 @router.post("/", response_model=PromptConfig)
 def create_prompt(prompt: PromptConfig):
-    prompts = load_prompts()
-    if any(p.id == prompt.id for p in prompts):
-        raise HTTPException(status_code=400, detail="Prompt ID already exists")
-    prompts.append(prompt)
-    save_prompts(prompts)
+    with _write_lock:
+        prompts = load_prompts()
+        if any(p.id == prompt.id for p in prompts):
+            raise HTTPException(status_code=400, detail="Prompt ID already exists")
+        _check_conflicts(prompt, prompts)
+        prompts.append(prompt)
+        save_prompts(prompts)
     return prompt
 
 @router.put("/{prompt_id}", response_model=PromptConfig)
 def update_prompt(prompt_id: str, prompt: PromptConfig):
-    prompts = load_prompts()
-    for i, p in enumerate(prompts):
-        if p.id == prompt_id:
-            prompts[i] = prompt
-            save_prompts(prompts)
-            return prompt
+    with _write_lock:
+        prompts = load_prompts()
+        for i, p in enumerate(prompts):
+            if p.id == prompt_id:
+                _check_conflicts(prompt, prompts, replacing=prompt_id)
+                prompts[i] = prompt
+                save_prompts(prompts)
+                return prompt
     raise HTTPException(status_code=404, detail="Prompt not found")
 
 @router.delete("/{prompt_id}")
 def delete_prompt(prompt_id: str):
-    prompts = load_prompts()
-    prompts = [p for p in prompts if p.id != prompt_id]
-    save_prompts(prompts)
+    with _write_lock:
+        prompts = load_prompts()
+        prompts = [p for p in prompts if p.id != prompt_id]
+        save_prompts(prompts)
     return {"message": "Prompt deleted"}
@@ -0,0 +1,44 @@
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# JSON codec used for storage columns, SSE events and API responses.
+# orjson is used when installed; otherwise the stdlib json module is the fallback.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode='json')
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if orjson is not None:
+    CODEC = "orjson"
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(data) -> Any:
+        return orjson.loads(data)
+else:
+    CODEC = "json"
+
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data) -> Any:
+        return json.loads(data)
+
+def dumps_str(obj: Any) -> str:
+    return dumps(obj).decode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """
+    Default response class: renders with the codec above (compact, UTF-8).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
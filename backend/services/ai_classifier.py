@@ -1,15 +1,99 @@
 from openai import AsyncOpenAI
+import asyncio
+import importlib.util
 import json
+from typing import Optional
+import httpx
 from ..config import Config
+from ..llm_cache import LLMCache, cache_key
 from ..models import ProcessoData, ClassificacaoResult
 
-def get_client():
-    if not Config.OPENROUTER_API_KEY:
-        raise ValueError("OPENROUTER_API_KEY não configurada no arquivo .env")
-    return AsyncOpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=Config.OPENROUTER_API_KEY,
-    )
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+class OpenRouterClient:
+    """
+    Process-lifetime AsyncOpenAI client for OpenRouter, shared by classification
+    and chat.
+
+    Opened by the app lifespan and closed on shutdown, so concurrent calls reuse
+    keep-alive connections (multiplexed over HTTP/2 when h2 is installed)
+    instead of a new pool and TLS handshake per call. Like AsyncTJMSClient, the
+    underlying httpx pool belongs to one event loop; a call from another loop
+    (scripts, tests) gets its own client.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int,
+        keepalive: int,
+        keepalive_expiry: float,
+        timeout: float,
+        connect_timeout: float,
+        http2: bool,
+    ):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[AsyncOpenAI] = None
+        self.clients_created = 0
+
+    def open(self):
+        """
+        Creates the client for the running loop, if an API key is configured.
+        """
+        if Config.OPENROUTER_API_KEY:
+            self.get()
+
+    def get(self) -> AsyncOpenAI:
+        if not Config.OPENROUTER_API_KEY:
+            raise ValueError("OPENROUTER_API_KEY não configurada no arquivo .env")
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            http_client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.keepalive,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            )
+            self._client = AsyncOpenAI(
+                base_url=self.base_url,
+                api_key=Config.OPENROUTER_API_KEY,
+                http_client=http_client,
+            )
+            self.clients_created += 1
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.close()
+        self._client = None
+        self._loop = None
+
+openrouter_client = OpenRouterClient(
+    "https://openrouter.ai/api/v1",
+    Config.LLM_POOL_SIZE,
+    Config.LLM_KEEPALIVE,
+    Config.LLM_KEEPALIVE_EXPIRY,
+    Config.LLM_TIMEOUT,
+    Config.LLM_CONNECT_TIMEOUT,
+    Config.LLM_HTTP2,
+)
+
+def get_client() -> AsyncOpenAI:
+    return openrouter_client.get()
+
+llm_cache = LLMCache(Config.LLM_CACHE_FILE, Config.LLM_CACHE_TTL, Config.LLM_CACHE_MAX_ENTRIES)
 
 SYSTEM_PROMPT = """
 Você é um assistente jurídico especializado em classificar intimações e movimentações processuais.
@@ -17,20 +101,14 @@ Sua tarefa é analisar os dados de um processo judicial e identificar a natureza
 Retorne APENAS um JSON com a classificação.
 """
 
-from ..routers.prompts import load_prompts
+from ..routers.prompts import prompt_for_class
 
 def get_prompt_for_class(classe_processual: str) -> str:
-    prompts = load_prompts()
-    
-    # 1. Try to find a prompt that explicitly lists this class
-    for p in prompts:
-        if classe_processual in p.classes:
-            return p.content
-            
-    # 2. Strict Mode: No fallback. Return None if no specific prompt found.
-    return None
+    # Strict Mode: No fallback. Return None if no prompt lists this class.
+    prompt = prompt_for_class(classe_processual)
+    return prompt.content if prompt else None
 
-async def classify_process(process_data: ProcessoData) -> ClassificacaoResult:
+async def classify_process(process_data: ProcessoData, use_cache: bool = True) -> ClassificacaoResult:
     # Revert to using classeProcessual as it contains the code (e.g. "7")
     class_code = process_data.classeProcessual
     
@@ -61,6 +139,17 @@ async def classify_process(process_data: ProcessoData) -> ClassificacaoResult:
     {movs_text}
     """
     
+    # Same prompts, model and context as an earlier call: reuse its answer.
+    # use_cache=False skips the lookup but still stores the new answer.
+    key = cache_key(SYSTEM_PROMPT, prompt, Config.OPENROUTER_MODEL_ID, full_content)
+    cached = await asyncio.to_thread(llm_cache.get, key, not use_cache)
+    if cached is not None:
+        return ClassificacaoResult(
+            numero_processo=process_data.numero,
+            classe_processual=process_data.classeProcessual or "N/A",
+            classificacao=cached
+        )
+    
     client = get_client()
     response = await client.chat.completions.create(
         model=Config.OPENROUTER_MODEL_ID,
@@ -84,6 +173,9 @@ async def classify_process(process_data: ProcessoData) -> ClassificacaoResult:
             
     except json.JSONDecodeError:
         result_json = {"erro": "Falha ao decodificar JSON da IA", "raw_content": content}
+    else:
+        # Only answers that parsed are worth reusing
+        await asyncio.to_thread(llm_cache.put, key, result_json)
         
     return ClassificacaoResult(
         numero_processo=process_data.numero,
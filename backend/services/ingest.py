@@ -0,0 +1,245 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
+from ..models import ProcessoData, UploadArquivo, UploadResultado
+from ..repository import repository
+from .xml_parser import parse_processo_xml
+
+# XML parsing is CPU-bound: it runs in worker processes so neither the GIL nor
+# the event loop is held while hundreds of files are parsed.
+UPLOAD_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# Bulk ingest (archives / NDJSON): entries are parsed and merged this many at a
+# time, so memory is bounded by one batch regardless of the archive size.
+INGEST_BATCH_SIZE = 50
+# Request bodies are spooled to a temp file past this size (ZIP needs seeking)
+SPOOL_MEMORY_BYTES = 16 * 1024 * 1024
+# Largest single entry accepted from an archive (uncompressed bytes)
+MAX_ENTRY_BYTES = 64 * 1024 * 1024
+
+INGEST_FORMATS = ("zip", "tar.gz", "ndjson")
+
+# (filename, parsed process or None, error message or None)
+ParsedFile = Tuple[str, Optional[ProcessoData], Optional[str]]
+# (entry name, raw XML bytes or None, error message or None)
+ArchiveEntry = Tuple[str, Optional[bytes], Optional[str]]
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def parse_upload(filename: str, content: bytes) -> ParsedFile:
+    """
+    Decodes and parses one uploaded XML. Runs in a worker process; errors are
+    returned rather than raised so one bad file doesn't fail the whole upload.
+    """
+    try:
+        return filename, parse_processo_xml(content.decode('utf-8')), None
+    except Exception as e:
+        return filename, None, str(e)
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: never fork a server process that holds threads and SQLite connections
+            _executor = ProcessPoolExecutor(
+                max_workers=UPLOAD_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+def _discard_broken_executor(executor: ProcessPoolExecutor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+async def parse_files(files: List[Tuple[str, bytes]]) -> List[ParsedFile]:
+    """
+    Parses the files in the process pool, preserving their order. If the pool
+    breaks (a worker died), the affected files are parsed in a thread instead.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    futures = [loop.run_in_executor(executor, parse_upload, name, content) for name, content in files]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+
+    parsed: List[ParsedFile] = []
+    for (name, content), result in zip(files, results):
+        if isinstance(result, BrokenProcessPool):
+            _discard_broken_executor(executor)
+            result = await asyncio.to_thread(parse_upload, name, content)
+        elif isinstance(result, BaseException):
+            result = (name, None, str(result))
+        parsed.append(result)
+    return parsed
+
+def merge_parsed(parsed: List[ParsedFile]) -> UploadResultado:
+    """
+    Applies the duplicate rules to every parsed file and saves the survivors in a
+    single transaction. A process already classified with identical content is
+    skipped; if its content changed, its classification is dropped so it gets
+    re-analyzed. Later files win over earlier ones for the same numero.
+    Blocking (SQLite + blob store): call it from a worker thread.
+    """
+    resultado = UploadResultado(total=len(parsed))
+    pending: Dict[str, ProcessoData] = {}
+    clear: Set[str] = set()
+
+    for filename, process, error in parsed:
+        if process is None:
+            print(f"Error parsing file {filename}: {error}")
+            resultado.arquivos.append(UploadArquivo(arquivo=filename, status="erro", detalhe=error))
+            continue
+
+        numero = process.numero
+        if not numero:
+            resultado.arquivos.append(UploadArquivo(
+                arquivo=filename, status="erro", detalhe="XML sem número de processo (dadosBasicos/@numero).",
+            ))
+            continue
+        earlier = pending.get(numero)
+        if earlier is not None and earlier.fingerprint == process.fingerprint:
+            resultado.arquivos.append(UploadArquivo(
+                arquivo=filename, status="ignorado", numero_processo=numero,
+                detalhe="Arquivo duplicado neste envio.",
+            ))
+            continue
+
+        stored = repository.get(numero)
+        status = "novo" if stored is None and earlier is None else "atualizado"
+
+        if stored is not None and repository.is_classified(numero):
+            if stored.fingerprint != process.fingerprint:
+                # Content changed, remove old classification to re-analyze
+                clear.add(numero)
+            elif earlier is None:
+                print(f"Skipping {numero}: Already classified and identical.")
+                resultado.arquivos.append(UploadArquivo(
+                    arquivo=filename, status="ignorado", numero_processo=numero,
+                    detalhe="Processo já classificado com esta mesma intimação.",
+                ))
+                continue
+            else:
+                # Back to the stored content: keep its classification
+                clear.discard(numero)
+
+        pending[numero] = process
+        resultado.arquivos.append(UploadArquivo(arquivo=filename, status=status, numero_processo=numero))
+
+    if pending:
+        repository.save_many(list(pending.values()), clear)
+
+    for arquivo in resultado.arquivos:
+        resultado.contar(arquivo.status)
+    return resultado
+
+# --- Bulk ingest ---
+
+def detect_format(head: bytes, content_type: Optional[str] = None) -> str:
+    """
+    Picks the ingest format from the Content-Type, falling back to magic bytes.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("application/zip", "application/x-zip-compressed"):
+        return "zip"
+    if content_type in ("application/gzip", "application/x-gzip", "application/x-tar+gzip", "application/x-gtar"):
+        return "tar.gz"
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return "ndjson"
+    if head.startswith(b"PK\x03\x04"):
+        return "zip"
+    if head.startswith(b"\x1f\x8b"):
+        return "tar.gz"
+    return "ndjson"
+
+def _too_large(name: str) -> ArchiveEntry:
+    return name, None, f"Arquivo maior que o limite de {MAX_ENTRY_BYTES // (1024 * 1024)} MB."
+
+def _is_xml(name: str) -> bool:
+    return name.lower().endswith(".xml")
+
+def _iter_zip(fileobj: BinaryIO) -> Iterator[ArchiveEntry]:
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not _is_xml(info.filename):
+                continue
+            if info.file_size > MAX_ENTRY_BYTES:
+                yield _too_large(info.filename)
+                continue
+            try:
+                with archive.open(info) as entry:
+                    # Bounded read: don't trust the declared size
+                    content = entry.read(MAX_ENTRY_BYTES + 1)
+            except (zipfile.BadZipFile, OSError, RuntimeError) as e:
+                yield info.filename, None, str(e)
+                continue
+            yield _too_large(info.filename) if len(content) > MAX_ENTRY_BYTES else (info.filename, content, None)
+
+def _iter_tar(fileobj: BinaryIO) -> Iterator[ArchiveEntry]:
+    # "r|gz": pure streaming, members are decompressed in order without seeking
+    with tarfile.open(fileobj=fileobj, mode="r|gz") as archive:
+        for member in archive:
+            if not member.isfile() or not _is_xml(member.name):
+                continue
+            if member.size > MAX_ENTRY_BYTES:
+                yield _too_large(member.name)
+                continue
+            entry = archive.extractfile(member)
+            yield member.name, entry.read() if entry is not None else b"", None
+
+def _iter_ndjson(fileobj: BinaryIO) -> Iterator[ArchiveEntry]:
+    """
+    One entry per line: a JSON string with the XML, or an object
+    {"arquivo": "...", "xml": "..."} ("arquivo" is optional).
+    """
+    for line_number, line in enumerate(fileobj, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        name = f"linha {line_number}"
+        try:
+            item = json.loads(line)
+            if isinstance(item, dict):
+                name = str(item.get("arquivo") or name)
+                item = item.get("xml")
+            if not isinstance(item, str):
+                raise ValueError("esperado o XML como string ou em um objeto com o campo 'xml'")
+        except ValueError as e:
+            yield name, None, f"Linha inválida: {e}"
+            continue
+        yield name, item.encode("utf-8"), None
+
+def iter_entries(fileobj: BinaryIO, formato: str) -> Iterator[ArchiveEntry]:
+    """
+    Yields the XML entries of a spooled archive one at a time (blocking I/O:
+    consume it from a worker thread). Archive-level errors surface as an error entry.
+    """
+    readers = {"zip": _iter_zip, "tar.gz": _iter_tar, "ndjson": _iter_ndjson}
+    try:
+        yield from readers[formato](fileobj)
+    except (zipfile.BadZipFile, tarfile.TarError, OSError, EOFError) as e:
+        yield "(arquivo compactado)", None, f"Arquivo compactado inválido: {e}"
+
+def next_batch(entries: Iterator[ArchiveEntry], size: int = INGEST_BATCH_SIZE) -> List[ArchiveEntry]:
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= size:
+            break
+    return batch
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from typing import List, Optional, Tuple, Dict, Any
+from ..models import ClassificacaoResult
+from ..database import save_classification_results
+
+# Group-commit window: flush when this many results are queued or when the
+# oldest queued result has waited this long (seconds), whichever comes first.
+MAX_BATCH_SIZE = 50
+MAX_BATCH_DELAY = 0.5
+
+class ClassificationWriter:
+    """
+    Background task that batches classification results and persists each batch
+    with a single write in a worker thread, so the event loop never blocks on disk.
+    """
+
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_delay: float = MAX_BATCH_DELAY):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.max_queue_depth = 0
+        self.batches_flushed = 0
+        self.results_flushed = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        """
+        Flushes everything still queued and stops the writer task.
+        """
+        if self._task is None or self._task.done():
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    def submit(self, result: ClassificacaoResult) -> asyncio.Future:
+        """
+        Queues a result for the next batch. The returned future resolves once the
+        batch containing it has been written (or raises if the write failed).
+        """
+        self.start()
+        future = self._loop.create_future()
+        self._queue.put_nowait((result, future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = self._loop.time() + self.max_delay
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # Drain anything queued after the stop request
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                remaining.append(item)
+        if remaining:
+            await self._flush(remaining)
+
+    async def _flush(self, batch: List[Tuple[ClassificacaoResult, asyncio.Future]]):
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(save_classification_results, [result for result, _ in batch])
+        except Exception as e:
+            self.flush_errors += 1
+            print(f"Erro ao gravar lote de {len(batch)} classificações: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.batches_flushed += 1
+        self.results_flushed += len(batch)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "batches_flushed": self.batches_flushed,
+            "results_flushed": self.results_flushed,
+            "flush_errors": self.flush_errors,
+            "avg_batch_size": round(self.results_flushed / self.batches_flushed, 2) if self.batches_flushed else 0,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self.batches_flushed, 2) if self.batches_flushed else 0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+classification_writer = ClassificationWriter()
@@ -0,0 +1,244 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from ..config import Config
+from ..models import ClassificacaoResult, ProcessoData
+from ..repository import repository
+from .ai_classifier import classify_process
+from .ingest import parse_files
+from .result_writer import classification_writer
+from .throttle import CircuitOpenError
+from .tjms_client import soap_consultar_processo_async, erro_consulta, MODO_MOVIMENTOS
+
+class SyncScheduler:
+    """
+    Background re-sync of the tracked processes against TJ-MS.
+
+    Every `interval` seconds a cycle re-consults up to `budget` processes
+    (movements-only mode, bypassing the response cache), at most `concurrency`
+    at a time and through the shared TJ-MS throttle. Processes are visited in
+    rounds: each round covers every tracked process once, most recently moved
+    first, so the least recently changed come last. Processes skipped because
+    the circuit breaker was open are retried in the next cycle.
+
+    A process is saved only when its fingerprint changed (any stale
+    classification is cleared in the same transaction), and only those are
+    queued for reclassification, so LLM calls follow the volume of change
+    rather than the size of the caseload.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        budget: int,
+        concurrency: int,
+        reclassify: bool = True,
+        classify_concurrency: int = 2,
+        classify: Callable[[ProcessoData], Awaitable[ClassificacaoResult]] = classify_process,
+    ):
+        self.interval = interval
+        self.budget = budget
+        self.concurrency = concurrency
+        self.reclassify = reclassify
+        self.classify_concurrency = classify_concurrency
+        self.classify = classify
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._cycle: Optional[asyncio.Task] = None
+        self._workers: List[asyncio.Task] = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[str] = set()
+        # numeros already checked in the current round
+        self._round: Set[str] = set()
+
+        self.cycles = 0
+        self.rounds = 0
+        self.checked = 0
+        self.changed = 0
+        self.errors = 0
+        self.movements_added = 0
+        self.reclassified = 0
+        self.reclassify_errors = 0
+        self.last_cycle: Optional[Dict[str, Any]] = None
+        self.next_run_at: Optional[str] = None
+
+    # --- Lifecycle ---
+
+    def _ensure_workers(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Tasks and the queue belong to the loop that created them
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._queued = set()
+            self._workers = []
+        if self.reclassify and not any(not w.done() for w in self._workers):
+            self._workers = [loop.create_task(self._classify_worker()) for _ in range(self.classify_concurrency)]
+
+    def start(self):
+        """
+        Starts the periodic cycles (no-op when interval <= 0).
+        """
+        if self.interval <= 0:
+            return
+        self._ensure_workers()
+        if self._task is None or self._task.done():
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        tasks = [t for t in (self._task, self._cycle, *self._workers) if t is not None and not t.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = self._cycle = None
+        self._workers = []
+        self.next_run_at = None
+
+    def trigger(self) -> bool:
+        """
+        Starts a cycle now. Returns False if one is already running.
+        Must be called from the event loop (e.g. an async route).
+        """
+        if self._cycle is not None and not self._cycle.done():
+            return False
+        self._ensure_workers()
+        self._cycle = self._loop.create_task(self.run_cycle())
+        return True
+
+    async def _run(self):
+        while True:
+            self.next_run_at = datetime.fromtimestamp(time.time() + self.interval).isoformat(timespec="seconds")
+            await asyncio.sleep(self.interval)
+            if self.trigger():
+                await self._cycle
+
+    # --- Cycle ---
+
+    def _next_batch(self) -> List[str]:
+        # Ascending by last movement, missing dates first; walk it newest first
+        order = [numero for _, numero in reversed(repository.sorted_index("ultima_movimentacao"))]
+        self._round &= set(order)
+        pending = [numero for numero in order if numero not in self._round]
+        if not pending:
+            self._round.clear()
+            self.rounds += 1
+            pending = order
+        return pending[:self.budget]
+
+    def _apply(self, process: ProcessoData) -> Optional[int]:
+        """
+        Saves a re-consulted process if it changed. Returns the number of new
+        movements, or None when it is unchanged (or no longer tracked).
+        """
+        stored = repository.get(process.numero)
+        if stored is None or stored.fingerprint == process.fingerprint:
+            return None
+        summary = repository.summary(process.numero)
+        previous = summary.total_movimentos if summary else 0
+        classified = [process.numero] if repository.is_classified(process.numero) else []
+        repository.save_many([process], clear_classifications=classified)
+        return max(len(process.movimentos) - previous, 0)
+
+    async def run_cycle(self) -> Dict[str, Any]:
+        self._ensure_workers()
+        started = time.perf_counter()
+        started_at = datetime.now().isoformat(timespec="seconds")
+        numeros = await asyncio.to_thread(self._next_batch)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        cycle = {"checked": 0, "changed": 0, "unchanged": 0, "errors": 0, "movements_added": 0}
+
+        async def check(numero: str):
+            try:
+                async with semaphore:
+                    xml_content = await soap_consultar_processo_async(numero, modo=MODO_MOVIMENTOS, bypass_cache=True)
+                erro = erro_consulta(xml_content)
+                if erro:
+                    raise ValueError(erro)
+                _, process, error = (await parse_files([(numero, xml_content.encode("utf-8"))]))[0]
+                if error:
+                    raise ValueError(error)
+                added = await asyncio.to_thread(self._apply, process)
+            except CircuitOpenError:
+                # TJ-MS is down: leave it for the next cycle without logging each one
+                cycle["errors"] += 1
+                return
+            except Exception as e:
+                # Counted as visited: a process that keeps failing waits for the next round
+                self._round.add(numero)
+                cycle["errors"] += 1
+                print(f"Erro ao sincronizar {numero}: {e}")
+                return
+            self._round.add(numero)
+            cycle["checked"] += 1
+            if added is None:
+                cycle["unchanged"] += 1
+                return
+            cycle["changed"] += 1
+            cycle["movements_added"] += added
+            self._enqueue(process.numero)
+
+        await asyncio.gather(*(check(n) for n in numeros))
+
+        self.cycles += 1
+        self.checked += cycle["checked"]
+        self.changed += cycle["changed"]
+        self.errors += cycle["errors"]
+        self.movements_added += cycle["movements_added"]
+        self.last_cycle = {
+            "started_at": started_at,
+            "duration_seconds": round(time.perf_counter() - started, 2),
+            **cycle,
+        }
+        return self.last_cycle
+
+    # --- Reclassification ---
+
+    def _enqueue(self, numero: str):
+        if not self.reclassify or numero in self._queued:
+            return
+        self._queued.add(numero)
+        self._queue.put_nowait(numero)
+
+    async def _classify_worker(self):
+        while True:
+            numero = await self._queue.get()
+            self._queued.discard(numero)
+            try:
+                process = await asyncio.to_thread(repository.get, numero)
+                if process is None:
+                    continue
+                result = await self.classify(process)
+                await classification_writer.submit(result)
+                self.reclassified += 1
+            except Exception as e:
+                self.reclassify_errors += 1
+                print(f"Erro ao reclassificar {numero}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.interval > 0,
+            "interval_seconds": self.interval,
+            "budget": self.budget,
+            "running": self._cycle is not None and not self._cycle.done(),
+            "next_run_at": self.next_run_at,
+            "cycles": self.cycles,
+            "rounds_completed": self.rounds,
+            "round_progress": len(self._round),
+            "checked": self.checked,
+            "changed": self.changed,
+            "errors": self.errors,
+            "movements_added": self.movements_added,
+            "reclassify_queue": self._queue.qsize() if self._queue else 0,
+            "reclassified": self.reclassified,
+            "reclassify_errors": self.reclassify_errors,
+            "last_cycle": self.last_cycle,
+        }
+
+sync_scheduler = SyncScheduler(
+    Config.TJMS_SYNC_INTERVAL,
+    Config.TJMS_SYNC_BUDGET,
+    Config.TJMS_SYNC_CONCURRENCY,
+    Config.TJMS_SYNC_RECLASSIFY,
+    Config.TJMS_SYNC_CLASSIFY_CONCURRENCY,
+)
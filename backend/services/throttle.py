@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# How often a caller waiting for a concurrency slot checks again
+POLL_INTERVAL = 0.05
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling TJ-MS while the circuit breaker is open.
+    """
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"TJ-MS indisponível (circuito aberto); nova tentativa em {retry_after:.0f} s")
+
+class Throttle:
+    """
+    Admission control for every SOAP attempt to TJ-MS, shared by threads and
+    the event loop:
+
+    - token bucket: at most `rate` attempts per second, bursts up to `burst`;
+    - AIMD concurrency: the in-flight limit grows by ~1 per limit-worth of
+      successes and halves (at most once per `decrease_interval`) on 429/5xx,
+      timeouts and connection errors, between min_concurrency and max_concurrency;
+    - circuit breaker: `failure_threshold` overloaded attempts in a row open it,
+      and callers fail fast with CircuitOpenError. After `reset_timeout` seconds
+      one probe goes through (half-open); its outcome closes or reopens it.
+
+    Callers pair acquire()/acquire_async() with release(overloaded).
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_concurrency: int,
+        max_concurrency: int,
+        failure_threshold: int,
+        reset_timeout: float,
+        decrease_interval: float = 1.0,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.decrease_interval = decrease_interval
+        self._lock = threading.Lock()
+
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+        self.admitted = 0
+        self.rejected = 0
+        self.waits = 0
+        self.decreases = 0
+        self.trips = 0
+
+    def _try_admit(self) -> float:
+        # Called with the lock held. Returns 0 when admitted, else seconds to wait.
+        now = time.monotonic()
+        if self._state == OPEN:
+            remaining = self._opened_at + self.reset_timeout - now
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(remaining)
+            self._state = HALF_OPEN
+            self._probing = False
+        if self._state == HALF_OPEN and self._probing:
+            self.rejected += 1
+            raise CircuitOpenError(self.reset_timeout)
+
+        if self._in_flight >= int(self._limit):
+            return POLL_INTERVAL
+        self._tokens = min(float(self.burst), self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+
+        self._tokens -= 1
+        self._in_flight += 1
+        self.admitted += 1
+        if self._state == HALF_OPEN:
+            self._probing = True
+        return 0
+
+    def acquire(self):
+        waited = False
+        while True:
+            with self._lock:
+                wait = self._try_admit()
+                if wait and not waited:
+                    self.waits += 1
+                    waited = True
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        waited = False
+        while True:
+            with self._lock:
+                wait = self._try_admit()
+                if wait and not waited:
+                    self.waits += 1
+                    waited = True
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, overloaded: bool):
+        with self._lock:
+            now = time.monotonic()
+            self._in_flight -= 1
+            if overloaded:
+                self._failures += 1
+                if now - self._last_decrease >= self.decrease_interval:
+                    self._limit = max(float(self.min_concurrency), self._limit / 2)
+                    self._last_decrease = now
+                    self.decreases += 1
+                if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                    self._state = OPEN
+                    self._opened_at = now
+                    self.trips += 1
+            else:
+                self._failures = 0
+                self._limit = min(float(self.max_concurrency), self._limit + 1 / self._limit)
+                if self._state == HALF_OPEN:
+                    self._state = CLOSED
+            if self._state != HALF_OPEN:
+                self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            retry_after = self._opened_at + self.reset_timeout - time.monotonic() if self._state == OPEN else 0
+            return {
+                "state": state,
+                "retry_after": round(max(retry_after, 0), 1),
+                "consecutive_failures": self._failures,
+                "concurrency_limit": int(self._limit),
+                "in_flight": self._in_flight,
+                "rate": self.rate,
+                "tokens": round(self._tokens, 2),
+                "admitted": self.admitted,
+                "waits": self.waits,
+                "rejected": self.rejected,
+                "decreases": self.decreases,
+                "trips": self.trips,
+            }
@@ -1,40 +1,420 @@
+import asyncio
+import html
+import re
+import threading
+import time
+from functools import lru_cache
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Dict, Optional, Tuple
+from xml.sax.saxutils import escape
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from ..config import Config
+from ..soap_cache import SoapCache, is_success
+from .throttle import Throttle
 
-def criar_sessao_com_retry():
+# Responses that mean "overloaded/unavailable, try again later"
+RETRY_STATUS = frozenset({500, 502, 503, 504, 429})
+
+def criar_sessao_com_retry(
+    pool_size: int = 10,
+    max_retries: int = 5,
+    backoff_factor: float = 1,
+) -> requests.Session:
     session = requests.Session()
     retry = Retry(
-        total=5,
-        backoff_factor=1,
-        status_forcelist=[500, 502, 503, 504, 429]
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=sorted(RETRY_STATUS),
+        # consultarProcesso is a read-only query, so retrying the POST is safe
+        allowed_methods=frozenset({"POST"}),
+        # Out of retries: hand back the last response (raise_for_status reports it)
+        raise_on_status=False,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    # pool_block: never open more than pool_size connections to TJ-MS; extra
+    # callers wait for a free keep-alive connection instead
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=pool_size, pool_block=True)
     session.mount('http://', adapter)
     session.mount('https://', adapter)
+    # No cookies are needed; refusing them keeps the shared session stateless across threads
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
     return session
 
-def soap_consultar_processo(numero_processo: str, timeout=60) -> str:
+# consultarProcesso modes. "movimentos" leaves out document metadata
+# (incluirDocumentos=false), which is most of a typical response and is never
+# read by the classification pipeline; "completo" asks for everything.
+MODO_COMPLETO = "completo"
+MODO_MOVIMENTOS = "movimentos"
+MODOS = (MODO_COMPLETO, MODO_MOVIMENTOS)
+
+class ConsultMetrics:
+    """
+    Per-mode payload size, latency and parse time of consultarProcesso calls,
+    so the savings of the movements-only mode show up in /processes/tjms_stats.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modes = {modo: {"requests": 0, "bytes": 0, "total_ms": 0.0, "parses": 0, "parse_ms": 0.0} for modo in MODOS}
+
+    def record_response(self, modo: str, size: int, elapsed_ms: float):
+        with self._lock:
+            entry = self._modes[modo]
+            entry["requests"] += 1
+            entry["bytes"] += size
+            entry["total_ms"] += elapsed_ms
+
+    def record_parse(self, modo: str, elapsed_ms: float):
+        with self._lock:
+            entry = self._modes[modo]
+            entry["parses"] += 1
+            entry["parse_ms"] += elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                modo: {
+                    "requests": e["requests"],
+                    "bytes": e["bytes"],
+                    "avg_bytes": round(e["bytes"] / e["requests"]) if e["requests"] else 0,
+                    "avg_ms": round(e["total_ms"] / e["requests"], 2) if e["requests"] else 0,
+                    "parses": e["parses"],
+                    "avg_parse_ms": round(e["parse_ms"] / e["parses"], 2) if e["parses"] else 0,
+                }
+                for modo, e in self._modes.items()
+            }
+
+consult_metrics = ConsultMetrics()
+
+class TJMSSession:
     """
-    Realiza a consulta do processo via SOAP no TJ-MS.
+    Process-wide pooled HTTP session for the TJ-MS SOAP endpoint.
+
+    Created on first use and shared by every caller (routes, bulk fetchers), so
+    TCP+TLS connections are kept alive and reused instead of being set up per
+    request. Retries 5xx/429 and connection errors with exponential backoff,
+    each attempt admitted by the shared Throttle (when given). Tracks request
+    counts and latency, plus new vs reused connections as reported by the
+    underlying urllib3 pools.
     """
-    session = criar_sessao_com_retry()
-    
-    xml_data = f'''
+
+    def __init__(self, pool_size: int, max_retries: int, backoff_factor: float, throttle: Optional[Throttle] = None):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.throttle = throttle
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.max_ms = 0.0
+        self._total_ms = 0.0
+
+    @property
+    def session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                # Retries happen in post(), where the throttle sees every attempt
+                self._session = criar_sessao_com_retry(self.pool_size, 0, 0)
+            return self._session
+
+    def _send(self, session: requests.Session, url: str, data: bytes, timeout: float) -> requests.Response:
+        if self.throttle is not None:
+            self.throttle.acquire()
+        overloaded = False
+        try:
+            response = session.post(url, data=data, timeout=timeout, headers={"Content-Type": "text/xml; charset=utf-8"})
+            overloaded = response.status_code in RETRY_STATUS
+            return response
+        except (requests.ConnectionError, requests.Timeout):
+            # Only capacity signals feed the throttle: a bad URL or a bug must
+            # surface as itself, not open the breaker
+            overloaded = True
+            raise
+        finally:
+            if self.throttle is not None:
+                self.throttle.release(overloaded)
+
+    def post(self, url: str, data: bytes, timeout: float) -> requests.Response:
+        session = self.session
+        start = time.perf_counter()
+        try:
+            attempt = 0
+            while True:
+                try:
+                    response = self._send(session, url, data, timeout)
+                    if response.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                        response.raise_for_status()
+                        return response
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt >= self.max_retries:
+                        raise
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.requests += 1
+                self._total_ms += elapsed_ms
+                self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def _pool_counts(self) -> Tuple[int, int]:
+        # (connections opened, requests sent) across urllib3 pools
+        opened = sent = 0
+        if self._session is None:
+            return opened, sent
+        # The same adapter is mounted for http:// and https://
+        adapters = {id(a): a for a in self._session.adapters.values()}.values()
+        for adapter in adapters:
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+                    sent += pool.num_requests
+        return opened, sent
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            opened, sent = self._pool_counts()
+            return {
+                "pool_size": self.pool_size,
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "http_requests": sent,
+                "connections_opened": opened,
+                "connections_reused": max(sent - opened, 0),
+                "reuse_rate": round((sent - opened) / sent, 3) if sent else 0,
+                "avg_ms": round(self._total_ms / self.requests, 2) if self.requests else 0,
+                "max_ms": round(self.max_ms, 2),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+# Shared by the sync session and the async client: one budget for TJ-MS
+tjms_throttle = Throttle(
+    rate=Config.TJMS_RATE_LIMIT,
+    burst=Config.TJMS_RATE_BURST,
+    min_concurrency=1,
+    max_concurrency=Config.TJMS_MAX_CONCURRENT,
+    failure_threshold=Config.TJMS_BREAKER_THRESHOLD,
+    reset_timeout=Config.TJMS_BREAKER_RESET,
+)
+
+tjms_session = TJMSSession(Config.TJMS_POOL_SIZE, Config.TJMS_MAX_RETRIES, Config.TJMS_BACKOFF_FACTOR, tjms_throttle)
+
+class AsyncTJMSClient:
+    """
+    asyncio SOAP client for consultarProcesso, for bulk fetches.
+
+    One httpx.AsyncClient (keep-alive pool) per event loop, and a semaphore that
+    caps the calls in flight across every caller, whatever their own limits.
+    Retries connection errors and 5xx/429 with exponential backoff, like the
+    sync session, with each attempt admitted by the shared Throttle (when given).
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        pool_size: int,
+        max_retries: int,
+        backoff_factor: float,
+        throttle: Optional[Throttle] = None,
+    ):
+        self.max_concurrent = max_concurrent
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.throttle = throttle
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.max_ms = 0.0
+        self._total_ms = 0.0
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # A client and semaphore belong to the loop that created them
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                headers={"Content-Type": "text/xml; charset=utf-8"},
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._client
+
+    async def _send(self, client: httpx.AsyncClient, url: str, data: bytes, timeout: float) -> httpx.Response:
+        if self.throttle is not None:
+            await self.throttle.acquire_async()
+        overloaded = False
+        try:
+            response = await client.post(url, content=data, timeout=timeout)
+            overloaded = response.status_code in RETRY_STATUS
+            return response
+        except httpx.UnsupportedProtocol:
+            # A TransportError too, but it means a misconfigured URL
+            raise
+        except httpx.TransportError:
+            overloaded = True
+            raise
+        finally:
+            if self.throttle is not None:
+                self.throttle.release(overloaded)
+
+    async def _post(self, client: httpx.AsyncClient, url: str, data: bytes, timeout: float) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = await self._send(client, url, data, timeout)
+                if response.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+            except httpx.TransportError:
+                if attempt >= self.max_retries:
+                    raise
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+
+    async def consultar_processo(self, numero_processo: str, timeout: float = 60, modo: str = MODO_COMPLETO) -> str:
+        client = self._ensure_client()
+        async with self._semaphore:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            start = time.perf_counter()
+            try:
+                response = await self._post(client, Config.TJMS_WSDL_URL, build_envelope(numero_processo, modo), timeout)
+                consult_metrics.record_response(modo, len(response.content), (time.perf_counter() - start) * 1000)
+                return response.text
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.in_flight -= 1
+                self.requests += 1
+                self._total_ms += elapsed_ms
+                self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "avg_ms": round(self._total_ms / self.requests, 2) if self.requests else 0,
+            "max_ms": round(self.max_ms, 2),
+        }
+
+    async def aclose(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+
+async_tjms_client = AsyncTJMSClient(
+    Config.TJMS_MAX_CONCURRENT, Config.TJMS_POOL_SIZE, Config.TJMS_MAX_RETRIES, Config.TJMS_BACKOFF_FACTOR, tjms_throttle
+)
+
+ENVELOPE_TEMPLATE = '''
     <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ser="http://www.cnj.jus.br/servico-intercomunicacao-2.2.2/" xmlns:tip="http://www.cnj.jus.br/tipos-servico-intercomunicacao-2.2.2">
         <soapenv:Header/>
         <soapenv:Body>
             <ser:consultarProcesso>
-                <tip:idConsultante>{Config.TJMS_USER}</tip:idConsultante>
-                <tip:senhaConsultante>{Config.TJMS_PASS}</tip:senhaConsultante>
+                <tip:idConsultante>{usuario}</tip:idConsultante>
+                <tip:senhaConsultante>{senha}</tip:senhaConsultante>
                 <tip:numeroProcesso>{numero_processo}</tip:numeroProcesso>
                 <tip:movimentos>true</tip:movimentos>
-                <tip:incluirDocumentos>true</tip:incluirDocumentos>
+                <tip:incluirDocumentos>{incluir_documentos}</tip:incluirDocumentos>
             </ser:consultarProcesso>
         </soapenv:Body>
     </soapenv:Envelope>'''.strip()
 
-    response = session.post(Config.TJMS_WSDL_URL, data=xml_data, timeout=timeout)
-    response.raise_for_status()
+_NUMERO_MARKER = "\0numero\0"
+
+@lru_cache(maxsize=8)
+def _envelope_parts(usuario: str, senha: str, modo: str) -> Tuple[bytes, bytes]:
+    # Everything but the process number is fixed: render it once, split at the number
+    if modo not in MODOS:
+        raise ValueError(f"Modo de consulta inválido: {modo}")
+    rendered = ENVELOPE_TEMPLATE.format(
+        usuario=escape(usuario),
+        senha=escape(senha),
+        numero_processo=_NUMERO_MARKER,
+        incluir_documentos="true" if modo == MODO_COMPLETO else "false",
+    )
+    prefix, suffix = rendered.split(_NUMERO_MARKER)
+    return prefix.encode("utf-8"), suffix.encode("utf-8")
+
+def build_envelope(numero_processo: str, modo: str = MODO_COMPLETO) -> bytes:
+    prefix, suffix = _envelope_parts(Config.TJMS_USER, Config.TJMS_PASS, modo)
+    return prefix + escape(numero_processo).encode("utf-8") + suffix
+
+soap_cache = SoapCache(Config.TJMS_CACHE_DIR, Config.TJMS_CACHE_TTL, Config.TJMS_CACHE_STALE_TTL)
+
+def _consultar(numero_processo: str, timeout, modo: str) -> str:
+    envelope = build_envelope(numero_processo, modo)
+    start = time.perf_counter()
+    response = tjms_session.post(Config.TJMS_WSDL_URL, envelope, timeout)
+    consult_metrics.record_response(modo, len(response.content), (time.perf_counter() - start) * 1000)
     return response.text
+
+_MENSAGEM = re.compile(r"<(?:\w+:)?mensagem>(.*?)</(?:\w+:)?mensagem>", re.S)
+
+def erro_consulta(xml_content: str) -> Optional[str]:
+    """
+    Mensagem do TJ-MS quando a consulta não teve sucesso (<sucesso>false</sucesso>,
+    ex: processo não encontrado); None se a resposta traz o processo.
+    """
+    if is_success(xml_content):
+        return None
+    match = _MENSAGEM.search(xml_content[:8192])
+    mensagem = html.unescape(match.group(1).strip()) if match else ""
+    return f"TJ-MS: {mensagem or 'consulta sem sucesso'}"
+
+def soap_consultar_processo(numero_processo: str, timeout=60, modo: str = MODO_COMPLETO, bypass_cache: bool = False) -> str:
+    """
+    Realiza a consulta do processo via SOAP no TJ-MS, passando pelo cache de respostas.
+
+    Args:
+        modo: MODO_COMPLETO (com metadados dos documentos) ou MODO_MOVIMENTOS
+        bypass_cache: Ignora a resposta em cache e consulta o TJ-MS (o cache é atualizado)
+    """
+    return soap_cache.get(
+        numero_processo, modo, lambda: _consultar(numero_processo, timeout, modo), bypass=bypass_cache
+    )
+
+async def soap_consultar_processo_async(
+    numero_processo: str, timeout=60, modo: str = MODO_COMPLETO, bypass_cache: bool = False
+) -> str:
+    """
+    Versão assíncrona de soap_consultar_processo (cliente compartilhado, concorrência limitada).
+    """
+    return await soap_cache.aget(
+        numero_processo, modo, lambda: async_tjms_client.consultar_processo(numero_processo, timeout, modo),
+        bypass=bypass_cache,
+    )
@@ -1,12 +1,35 @@
 import xml.etree.ElementTree as ET
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, Mapping
 from datetime import datetime
+import hashlib
 import re
 from ..models import ProcessoData, Movimento
 
+# lxml is used when installed; otherwise the stdlib streaming parser is the fallback.
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+PARSER_BACKEND = "lxml" if lxml_etree is not None else "stdlib"
+
+# MNI 2.2.2 data namespace (dadosBasicos, assunto, movimento...)
+MNI_NS = "http://www.cnj.jus.br/intercomunicacao-2.2.2"
+
 def _parse_date(date_str: str) -> Optional[datetime]:
     if not date_str:
         return None
+    # Fast path for the usual fixed-width forms; strptime is slow and dominates parsing
+    if date_str.isascii() and date_str.isdigit() and len(date_str) in (8, 14):
+        try:
+            if len(date_str) == 14:
+                return datetime(
+                    int(date_str[0:4]), int(date_str[4:6]), int(date_str[6:8]),
+                    int(date_str[8:10]), int(date_str[10:12]), int(date_str[12:14]),
+                )
+            return datetime(int(date_str[0:4]), int(date_str[4:6]), int(date_str[6:8]))
+        except ValueError:
+            pass
     try:
         # Format: YYYYMMDDHHMMSS
         return datetime.strptime(date_str, "%Y%m%d%H%M%S")
@@ -17,82 +40,255 @@ def _parse_date(date_str: str) -> Optional[datetime]:
         except ValueError:
             return None
 
-def parse_processo_xml(xml_content: str) -> ProcessoData:
+def _make_movimento(
+    data_hora: Optional[str],
+    local: Optional[Mapping[str, str]],
+    nacional: Optional[Mapping[str, str]],
+    complemento: Optional[str],
+) -> Movimento:
+    descricao = ""
+    codigo_mov = ""
+    # Try movimentoLocal first, then movimentoNacional
+    if local is not None:
+        descricao = local.get('descricao', '')
+        codigo_mov = local.get('codigoMovimento', '')
+    elif nacional is not None:
+        codigo_mov = nacional.get('codigoNacional', '')
+        # Descricao might not be present for nacional, usually needs a lookup table
+        descricao = nacional.get('descricao', f"Movimento Nacional {codigo_mov}")
+
+    return Movimento(
+        dataHora=_parse_date(data_hora),
+        descricao=descricao,
+        complemento=complemento or None,
+        codigo=codigo_mov
+    )
+
+def _build_process(
+    numero: str,
+    competencia: str,
+    classe_processual: str,
+    assuntos: List[str],
+    movimentos: List[Movimento],
+    xml_content: str,
+    xml_sha256: str,
+    xml_size: int,
+) -> ProcessoData:
+    # Sort movements by date
+    movimentos.sort(key=lambda x: x.dataHora if x.dataHora else datetime.min)
+
+    process = ProcessoData(
+        numero=numero,
+        competencia=competencia,
+        classeProcessual=classe_processual,
+        assuntos=assuntos,
+        movimentos=movimentos,
+        xml_raw=xml_content,
+        xml_sha256=xml_sha256,
+        xml_size=xml_size
+    )
+    process.fingerprint = process.compute_fingerprint()
+    return process
+
+# --- stdlib streaming parser ---
+
+# Input is fed to the pull parser in chunks of this many characters, so the
+# pending event queue (and thus memory) stays bounded for very large responses.
+FEED_CHUNK_SIZE = 64 * 1024
+
+_MOVIMENTO_CHILDREN = frozenset(('movimentoLocal', 'movimentoNacional', 'complemento'))
+
+class _MovimentoState:
     """
-    Parses the TJ-MS XML response and extracts relevant process data.
+    Values collected for one <movimento> while its subtree is streamed.
+    Like a first-descendant lookup, each slot keeps the first matching element.
     """
-    root = ET.fromstring(xml_content)
-    
-    # Namespaces are often tricky in ElementTree with SOAP. 
-    # We'll use a strategy to ignore namespaces or handle them if needed.
-    # The sample XML uses ns2 for data.
-    
-    # Helper to find elements ignoring namespace
-    def find_all(element, tag_name):
-        return [e for e in element.iter() if e.tag.endswith(tag_name)]
-    
-    def find_first(element, tag_name):
-        results = find_all(element, tag_name)
-        return results[0] if results else None
-
-    dados_basicos = find_first(root, 'dadosBasicos')
-    
+    __slots__ = ("data_hora", "local", "nacional", "complemento_elem", "complemento")
+
+    def __init__(self, data_hora: Optional[str]):
+        self.data_hora = data_hora
+        self.local = None
+        self.nacional = None
+        self.complemento_elem = None
+        self.complemento = None
+
+    def to_movimento(self) -> Movimento:
+        return _make_movimento(self.data_hora, self.local, self.nacional, self.complemento)
+
+def _parse_stdlib(xml_content: str) -> ProcessoData:
+    """
+    Single pass over the document: elements are matched by local name (namespaces
+    ignored) as they stream in, and each element is dropped once it has ended, so
+    memory does not grow with the size of the response (e.g. embedded documents).
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    hasher = hashlib.sha256()
+    xml_size = 0
+
     numero = ""
     competencia = ""
     classe_processual = ""
+    assuntos: List[Optional[str]] = []
+    movimentos: List[Optional[Movimento]] = []
+
+    dados_basicos = None  # first dadosBasicos element, while open
+    dados_seen = False
+    open_assuntos: List[list] = []  # [index into assuntos, first codigoNacional element]
+    open_movimentos: List[Tuple[int, _MovimentoState]] = []  # (index into movimentos, state)
+    path: List[ET.Element] = []
+
+    def events():
+        nonlocal xml_size
+        for offset in range(0, len(xml_content), FEED_CHUNK_SIZE):
+            chunk = xml_content[offset:offset + FEED_CHUNK_SIZE]
+            encoded = chunk.encode('utf-8')
+            hasher.update(encoded)
+            xml_size += len(encoded)
+            parser.feed(chunk)
+            yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+
+    for event, elem in events():
+        tag = elem.tag
+        name = tag[tag.rfind('}') + 1:]
+
+        if event == "start":
+            path.append(elem)
+            if name == 'movimento':
+                movimentos.append(None)
+                open_movimentos.append((len(movimentos) - 1, _MovimentoState(elem.get('dataHora'))))
+            elif open_movimentos and name in _MOVIMENTO_CHILDREN:
+                for _, state in open_movimentos:
+                    if name == 'movimentoLocal':
+                        if state.local is None:
+                            state.local = dict(elem.attrib)
+                    elif name == 'movimentoNacional':
+                        if state.nacional is None:
+                            state.nacional = dict(elem.attrib)
+                    elif state.complemento_elem is None:
+                        state.complemento_elem = elem
+            elif name == 'dadosBasicos' and not dados_seen:
+                dados_seen = True
+                dados_basicos = elem
+                numero = elem.get('numero', '')
+                competencia = elem.get('competencia', '')
+                classe_processual = elem.get('classeProcessual', '')
+            elif name == 'assunto' and dados_basicos is not None:
+                assuntos.append(None)
+                open_assuntos.append([len(assuntos) - 1, None])
+            elif name == 'codigoNacional':
+                for entry in open_assuntos:
+                    if entry[1] is None:
+                        entry[1] = elem
+            continue
+
+        # "end": the element's text and children are complete
+        path.pop()
+        if name == 'movimento':
+            index, state = open_movimentos.pop()
+            movimentos[index] = state.to_movimento()
+        elif name == 'complemento':
+            for _, state in open_movimentos:
+                if state.complemento_elem is elem:
+                    state.complemento = elem.text
+        elif name == 'codigoNacional':
+            for entry in open_assuntos:
+                if entry[1] is elem and elem.text:
+                    assuntos[entry[0]] = elem.text
+        elif name == 'assunto' and open_assuntos:
+            open_assuntos.pop()
+        elif elem is dados_basicos:
+            dados_basicos = None
+
+        # Done with this element: drop it (it is always its parent's last child)
+        elem.clear()
+        if path:
+            del path[-1][-1]
+
+    return _build_process(
+        numero, competencia, classe_processual, [a for a in assuntos if a], movimentos,
+        xml_content, hasher.hexdigest(), xml_size,
+    )
+
+# --- lxml fast path ---
+
+if lxml_etree is not None:
+    def _xpath(expression: str):
+        return lxml_etree.XPath(expression, namespaces={"mni": MNI_NS})
+
+    # Compiled once. Each query matches MNI 2.2.2 elements and unqualified ones;
+    # documents using any other namespace are left to the stdlib parser.
+    _DADOS_BASICOS = _xpath("(//mni:dadosBasicos | //dadosBasicos)[1]")
+    _ASSUNTOS = _xpath(".//mni:assunto | .//assunto")
+    _CODIGO_NACIONAL = _xpath("(.//mni:codigoNacional | .//codigoNacional)[1]")
+    _MOVIMENTOS = _xpath("//mni:movimento | //movimento")
+    # Everything a movement needs in one query (document order); the first of
+    # each local name is picked in Python, which beats three queries per movement.
+    _MOVIMENTO_PARTS = _xpath(
+        ".//mni:movimentoLocal | .//movimentoLocal"
+        " | .//mni:movimentoNacional | .//movimentoNacional"
+        " | .//mni:complemento | .//complemento"
+    )
+
+    # Input is always re-encoded as UTF-8, overriding the declared encoding.
+    # huge_tree: embedded documents can exceed libxml2's default text node limit.
+    _LXML_PARSER = lxml_etree.XMLParser(encoding="utf-8", huge_tree=True)
+
+def _parse_lxml(xml_content: str) -> Optional[ProcessoData]:
+    """
+    Parses with lxml and the precompiled XPath queries above. Returns None when
+    the document can't be handled here (no MNI 2.2.2 dadosBasicos, or lxml
+    rejects it) so the caller falls back to the stdlib parser.
+    """
+    xml_bytes = xml_content.encode('utf-8')
+    try:
+        root = lxml_etree.fromstring(xml_bytes, _LXML_PARSER)
+    except lxml_etree.XMLSyntaxError:
+        return None
+
+    dados = _DADOS_BASICOS(root)
+    if not dados:
+        return None
+    dados_basicos = dados[0]
+
     assuntos = []
-    
-    if dados_basicos is not None:
-        numero = dados_basicos.get('numero', '')
-        competencia = dados_basicos.get('competencia', '')
-        classe_processual = dados_basicos.get('classeProcessual', '')
-        
-        for assunto in find_all(dados_basicos, 'assunto'):
-            codigo = find_first(assunto, 'codigoNacional')
-            if codigo is not None and codigo.text:
-                assuntos.append(codigo.text)
+    for assunto in _ASSUNTOS(dados_basicos):
+        codigo = _CODIGO_NACIONAL(assunto)
+        if codigo and codigo[0].text:
+            assuntos.append(codigo[0].text)
 
     movimentos = []
-    for mov in find_all(root, 'movimento'):
-        data_hora_str = mov.get('dataHora')
-        data_hora = _parse_date(data_hora_str)
-        
-        descricao = ""
-        codigo_mov = ""
-        
-        # Try to find movimentoLocal or movimentoNacional
-        mov_local = find_first(mov, 'movimentoLocal')
-        if mov_local is not None:
-            descricao = mov_local.get('descricao', '')
-            codigo_mov = mov_local.get('codigoMovimento', '')
-        else:
-            mov_nac = find_first(mov, 'movimentoNacional')
-            if mov_nac is not None:
-                codigo_mov = mov_nac.get('codigoNacional', '')
-                # Descricao might not be present for nacional, usually needs a lookup table, 
-                # but let's check if there is a descricao attribute or child
-                descricao = mov_nac.get('descricao', f"Movimento Nacional {codigo_mov}")
-
-        complemento = None
-        comp_elem = find_first(mov, 'complemento')
-        if comp_elem is not None and comp_elem.text:
-            complemento = comp_elem.text
-            
-        movimentos.append(Movimento(
-            dataHora=data_hora,
-            descricao=descricao,
-            complemento=complemento,
-            codigo=codigo_mov
+    for mov in _MOVIMENTOS(root):
+        first = {}
+        for part in _MOVIMENTO_PARTS(mov):
+            tag = part.tag
+            first.setdefault(tag[tag.rfind('}') + 1:], part)
+        local = first.get('movimentoLocal')
+        nacional = first.get('movimentoNacional')
+        complemento = first.get('complemento')
+        movimentos.append(_make_movimento(
+            mov.get('dataHora'),
+            local.attrib if local is not None else None,
+            nacional.attrib if nacional is not None else None,
+            complemento.text if complemento is not None else None,
         ))
-    
-    # Sort movements by date
-    movimentos.sort(key=lambda x: x.dataHora if x.dataHora else datetime.min)
 
-    return ProcessoData(
-        numero=numero,
-        competencia=competencia,
-        classeProcessual=classe_processual,
-        assuntos=assuntos,
-        movimentos=movimentos,
-        xml_raw=xml_content
+    return _build_process(
+        dados_basicos.get('numero', ''),
+        dados_basicos.get('competencia', ''),
+        dados_basicos.get('classeProcessual', ''),
+        assuntos, movimentos,
+        xml_content, hashlib.sha256(xml_bytes).hexdigest(), len(xml_bytes),
     )
+
+def parse_processo_xml(xml_content: str) -> ProcessoData:
+    """
+    Parses the TJ-MS XML response and extracts relevant process data.
+    Uses the lxml fast path when available, falling back to the stdlib parser.
+    """
+    if lxml_etree is not None:
+        process = _parse_lxml(xml_content)
+        if process is not None:
+            return process
+    return _parse_stdlib(xml_content)
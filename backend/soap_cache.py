@@ -0,0 +1,207 @@
+import asyncio
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+# Disk cache of consultarProcesso responses, shared by the backend and the
+# api.py downloader. Each entry is gzip-compressed and saved as
+# <directory>/<modo>/<key[:2]>/<key>.xml.gz, where key is the sha256 of the
+# process number's digits (so "0800041-28.2024.8.12.0051" and
+# "08000412820248120051" share an entry). The file's mtime is when the
+# response was fetched.
+#
+# Entries younger than ttl are served as is. Older ones, up to ttl + stale_ttl,
+# are still served, and a background fetch refreshes them (stale-while-revalidate);
+# past that they are fetched again before answering. ttl <= 0 disables the cache.
+# Only successful responses (<sucesso>true</sucesso>) are stored.
+
+_SUCCESS = re.compile(r"<(?:\w+:)?sucesso>\s*true\s*</")
+FRESH, STALE, MISS = "fresh", "stale", "miss"
+
+def is_success(xml_content: str) -> bool:
+    return _SUCCESS.search(xml_content[:4096]) is not None
+
+class SoapCache:
+    def __init__(self, directory: str, ttl: float, stale_ttl: float, compress_level: int = 6):
+        self.directory = directory
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._refreshing: Set[Tuple[str, str]] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.stores = 0
+        self.revalidations = 0
+        self.revalidations_unchanged = 0
+        self.revalidation_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def path(self, numero: str, modo: str) -> str:
+        key = hashlib.sha256(re.sub(r"\D", "", numero).encode("ascii")).hexdigest()
+        return os.path.join(self.directory, modo, key[:2], f"{key}.xml.gz")
+
+    # --- Entries ---
+
+    def lookup(self, numero: str, modo: str) -> Tuple[Optional[str], str]:
+        """
+        Returns (content, FRESH | STALE) for a usable entry, or (None, MISS).
+        """
+        path = self.path(numero, modo)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age >= self.ttl + self.stale_ttl:
+                return None, MISS
+            with open(path, "rb") as f:
+                content = gzip.decompress(f.read()).decode("utf-8")
+        except (OSError, EOFError):
+            # Missing, or a corrupt file: treat as a miss, the next store replaces it
+            return None, MISS
+        return content, FRESH if age < self.ttl else STALE
+
+    def store(self, numero: str, modo: str, content: str) -> bool:
+        """
+        Saves a response if it is cacheable. Returns False when the stored entry
+        already had the same content (only its timestamp is renewed).
+        """
+        if not self.enabled or not is_success(content):
+            return True
+        path = self.path(numero, modo)
+        data = content.encode("utf-8")
+        try:
+            with open(path, "rb") as f:
+                if gzip.decompress(f.read()) == data:
+                    os.utime(path)
+                    return False
+        except (OSError, EOFError):
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(data, compresslevel=self.compress_level))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self.stores += 1
+        return True
+
+    def invalidate(self, numero: str, modo: Optional[str] = None):
+        modos = [modo] if modo else (os.listdir(self.directory) if os.path.isdir(self.directory) else [])
+        for m in modos:
+            path = self.path(numero, m)
+            if os.path.exists(path):
+                os.remove(path)
+
+    # --- Read-through ---
+
+    def _start(self, numero: str, modo: str, bypass: bool) -> Tuple[Optional[str], str]:
+        if not self.enabled:
+            return None, MISS
+        if bypass:
+            with self._lock:
+                self.bypasses += 1
+            return None, MISS
+        content, state = self.lookup(numero, modo)
+        with self._lock:
+            if state == FRESH:
+                self.hits += 1
+            elif state == STALE:
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+            if state == STALE and (numero, modo) in self._refreshing:
+                # Someone is already revalidating this entry
+                state = FRESH
+            elif state == STALE:
+                self._refreshing.add((numero, modo))
+        return content, state
+
+    def _revalidated(self, numero: str, modo: str, content: Optional[str]):
+        changed = content is not None and self.store(numero, modo, content)
+        with self._lock:
+            self._refreshing.discard((numero, modo))
+            if content is None:
+                self.revalidation_errors += 1
+            else:
+                self.revalidations += 1
+                if not changed:
+                    self.revalidations_unchanged += 1
+
+    def get(self, numero: str, modo: str, fetch: Callable[[], str], bypass: bool = False) -> str:
+        """
+        Returns the response for (numero, modo), calling fetch() on a miss. A stale
+        entry is returned right away and refreshed on a daemon thread.
+        bypass=True skips the lookup but still stores the fresh response.
+        """
+        content, state = self._start(numero, modo, bypass)
+        if state == STALE:
+            def revalidate():
+                try:
+                    fresh = fetch()
+                except Exception:
+                    fresh = None
+                self._revalidated(numero, modo, fresh)
+            threading.Thread(target=revalidate, daemon=True).start()
+        if content is not None:
+            return content
+        content = fetch()
+        self.store(numero, modo, content)
+        return content
+
+    async def aget(self, numero: str, modo: str, fetch: Callable[[], Awaitable[str]], bypass: bool = False) -> str:
+        """
+        Async version of get(): fetch is a coroutine function and stale entries
+        are refreshed in a background task. Disk I/O runs in a worker thread.
+        """
+        content, state = await asyncio.to_thread(self._start, numero, modo, bypass)
+        if state == STALE:
+            async def revalidate():
+                try:
+                    fresh = await fetch()
+                except Exception:
+                    fresh = None
+                await asyncio.to_thread(self._revalidated, numero, modo, fresh)
+            task = asyncio.create_task(revalidate())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if content is not None:
+            return content
+        content = await fetch()
+        await asyncio.to_thread(self.store, numero, modo, content)
+        return content
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "ttl": self.ttl,
+                "stale_ttl": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "bypasses": self.bypasses,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0,
+                "stores": self.stores,
+                "revalidations": self.revalidations,
+                "revalidations_unchanged": self.revalidations_unchanged,
+                "revalidation_errors": self.revalidation_errors,
+                "refreshing": len(self._refreshing),
+            }
@@ -0,0 +1,170 @@
+import sys
+import os
+import json
+import time
+import queue
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add project root (and tests/, for the stub) to path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from stub_tjms import StubTJMS, parse_range
+
+# Load test of the ingest paths against the local MNI stand-in (stub_tjms.py):
+# POST /processes/{numero}, POST /processes/bulk and the api.py desktop
+# downloader. Every call bypasses the response cache so each one reaches the stub.
+#
+#   python tests/bench_ingest_load.py --processos 200 --concurrency 10 --latency 50-300 --error-rate 0.02
+
+def report(label, latencies_ms, elapsed, errors):
+    done = len(latencies_ms)
+    line = f"  {label:<22} {done:5d} ok {errors:4d} erros  {done / elapsed:7.1f} proc/s"
+    if done >= 2:
+        q = statistics.quantiles(latencies_ms, n=100, method="inclusive")
+        line += f"  p50 {q[49]:7.0f} ms  p95 {q[94]:7.0f} ms  p99 {q[98]:7.0f} ms"
+    print(line)
+
+def numeros(prefix, count):
+    return [f"{prefix}{i:06d}-00.2024.8.12.0001" for i in range(count)]
+
+def run_add_process(client, args):
+    latencies, errors = [], 0
+
+    def add(numero):
+        start = time.perf_counter()
+        response = client.post(f"/processes/{numero}", params={"cache": "false", "modo": args.modo})
+        return response.status_code, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        for status, ms in executor.map(add, numeros("1", args.processos)):
+            if status == 200:
+                latencies.append(ms)
+            else:
+                errors += 1
+    report("add_process", latencies, time.perf_counter() - start, errors)
+
+def run_bulk(client, args):
+    from backend.services import tjms_client
+
+    # Per-call TJ-MS latency (queueing + throttle + retries), as the bulk route sees it
+    latencies, original = [], tjms_client.async_tjms_client.consultar_processo
+
+    async def timed(*a, **kw):
+        start = time.perf_counter()
+        result = await original(*a, **kw)
+        latencies.append((time.perf_counter() - start) * 1000)
+        return result
+
+    tjms_client.async_tjms_client.consultar_processo = timed
+    try:
+        start = time.perf_counter()
+        response = client.post(
+            "/processes/bulk",
+            params={"cache": "false", "modo": args.modo, "max_concurrent": args.concurrency},
+            json={"numeros": numeros("2", args.processos)},
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        tjms_client.async_tjms_client.consultar_processo = original
+    events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+    complete = events[-1] if events and events[-1].get("type") == "complete" else {}
+    report("bulk (TJ-MS calls)", latencies, elapsed, complete.get("erros", 0))
+
+def run_downloader(stub, args):
+    try:
+        import api
+    except ImportError as e:
+        print(f"  {'downloader (api.py)':<22} ignorado: {e}")
+        return
+    api.URL_WSDL = stub.url
+    latencies, errors = [], 0
+
+    def download(numero):
+        # Same steps as processar_processos: consult, pick documents, download them
+        session = api.criar_sessao_com_retry()
+        start = time.perf_counter()
+        try:
+            resultados = api.consultar_todas_instancias(session, numero, timeout=60, usar_cache=False)
+            if not resultados:
+                return None
+            docs = api.extrair_docs_info(resultados[0]["xml_content"])
+            ids = [d["id"] for d in api._ordenar_docs(docs)][: args.docs_por_processo]
+            api._download_em_ordem_com_fallback(session, numero, ids, 120, queue.Queue())
+        except Exception:
+            return None
+        finally:
+            session.close()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        for ms in executor.map(download, numeros("3", args.processos)):
+            if ms is None:
+                errors += 1
+            else:
+                latencies.append(ms)
+    report("downloader (api.py)", latencies, time.perf_counter() - start, errors)
+
+def run_benchmark(args):
+    stub = StubTJMS(
+        latency=parse_range(args.latency),
+        error_rate=args.error_rate,
+        not_found_rate=args.not_found_rate,
+        movimentos=args.movimentos,
+        documentos=args.documentos,
+        payload_bytes=args.payload_bytes,
+    ).start()
+    os.environ["TJMS_WSDL_URL"] = stub.url
+
+    from fastapi.testclient import TestClient
+    from backend.config import Config
+    from backend.main import app
+    from backend.services.tjms_client import tjms_throttle, tjms_session, async_tjms_client
+
+    Config.TJMS_WSDL_URL = stub.url
+    if args.rate:
+        tjms_throttle.rate = tjms_throttle.burst = args.rate
+    print(
+        f"Stub: latency {args.latency} ms, error rate {args.error_rate:.0%}, "
+        f"{args.movimentos} movements / {args.documentos} documents per process"
+    )
+    print(f"Load: {args.processos} processes per scenario, concurrency {args.concurrency}, "
+          f"mode {args.modo}, throttle {tjms_throttle.rate:g}/s\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)  # processes.db, blobs/ and soap_cache/ go here
+        try:
+            with TestClient(app) as client:
+                run_add_process(client, args)
+                run_bulk(client, args)
+            run_downloader(stub, args)
+        finally:
+            os.chdir(cwd)
+
+    print(f"\nStub served {stub.requests} requests ({stub.errors} errors), {stub.bytes_sent / 1024 / 1024:.1f} MB")
+    print(f"Throttle: {tjms_throttle.stats()}")
+    print(f"Session retries: {tjms_session.stats()['retries']}, async retries: {async_tjms_client.stats()['retries']}")
+    stub.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of the TJ-MS ingest paths against stub_tjms")
+    parser.add_argument("--processos", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--modo", default="movimentos", choices=["movimentos", "completo"])
+    parser.add_argument("--latency", default="20-120", help="stub latency in ms, fixed or min-max")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--not-found-rate", type=float, default=0.0)
+    parser.add_argument("--movimentos", type=int, default=150)
+    parser.add_argument("--documentos", type=int, default=250)
+    parser.add_argument("--payload-bytes", type=int, default=50_000)
+    parser.add_argument("--docs-por-processo", type=int, default=3)
+    parser.add_argument("--rate", type=float, default=1000, help="throttle rate for the run (0 keeps TJMS_RATE_LIMIT)")
+    run_benchmark(parser.parse_args())
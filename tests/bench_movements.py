@@ -0,0 +1,71 @@
+import sys
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.models import Movimento, MovimentoList
+
+ROOT = Path(__file__).resolve().parent.parent
+PROCESSES_FILE = ROOT / "processes.json"
+
+# Replicate the bundled dataset to approximate a store with tens of thousands of processes
+COPIES = 200
+
+def measure(label, build, total_movs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    held = build()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<28} {current / 1024 / 1024:8.1f} MB  {current / total_movs:6.0f} B/movement  build {elapsed_ms:7.0f} ms")
+    del held
+    return current
+
+def iterate(label, lists):
+    # Same access pattern as classify_process / chat_about_process
+    start = time.perf_counter()
+    for movs in lists:
+        "\n".join(f"{m.dataHora}: {m.descricao} - {m.complemento or ''}" for m in movs[-25:])
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"  {label:<28} {elapsed_ms:8.0f} ms (last 25 movements of every process)")
+
+def run_benchmark():
+    data = json.loads(PROCESSES_FILE.read_text(encoding="utf-8"))
+    # Each process's movements encoded separately, with distinct complementos per
+    # copy, so both builds allocate their own strings (as loading from disk would)
+    encoded = [
+        json.dumps([
+            dict(m, complemento=f"{m['complemento']} #{copy}" if m.get("complemento") else None)
+            for m in p["movimentos"]
+        ]).encode("utf-8")
+        for copy in range(COPIES)
+        for p in data
+    ]
+    total_movs = sum(len(p["movimentos"]) for p in data) * COPIES
+    print(f"Dataset: {len(encoded)} processes, {total_movs} movements ({COPIES}x {PROCESSES_FILE.name})\n")
+
+    print("Memory held:")
+    base = measure(
+        "List[Movimento]",
+        lambda: [[Movimento(**m) for m in json.loads(raw)] for raw in encoded],
+        total_movs,
+    )
+    compact = measure(
+        "MovimentoList (columnar)",
+        lambda: [MovimentoList(Movimento(**m) for m in json.loads(raw)) for raw in encoded],
+        total_movs,
+    )
+    print(f"  reduction: {base / compact:.1f}x\n")
+
+    print("Iteration:")
+    models = [[Movimento(**m) for m in json.loads(raw)] for raw in encoded]
+    iterate("List[Movimento]", models)
+    iterate("MovimentoList (columnar)", [MovimentoList(movs) for movs in models])
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,52 @@
+import sys
+import os
+import json
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from fastapi.responses import JSONResponse
+from backend import serialization
+from backend.serialization import FastJSONResponse
+
+ROOT = Path(__file__).resolve().parent.parent
+PROCESSES_FILE = ROOT / "processes.json"
+
+def bench(label, fn, repeat=20):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed_ms = (time.perf_counter() - start) / repeat * 1000
+    print(f"  {label:<38} {elapsed_ms:9.2f} ms")
+    return elapsed_ms
+
+def run_benchmark():
+    print(f"Codec: {serialization.CODEC}")
+    raw = PROCESSES_FILE.read_bytes()
+    data = json.loads(raw)
+    print(f"Dataset: {len(data)} processes, {len(raw) / 1024:.0f} KB ({PROCESSES_FILE.name})\n")
+
+    print("Load (decode processes.json):")
+    base = bench("stdlib json.loads", lambda: json.loads(raw))
+    fast = bench(f"{serialization.CODEC} loads", lambda: serialization.loads(raw))
+    print(f"  speedup: {base / fast:.1f}x\n")
+
+    print("Save (encode the whole store):")
+    indented = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    compact = serialization.dumps(data)
+    base = bench("stdlib json.dumps(indent=2)", lambda: json.dumps(data, indent=2, ensure_ascii=False))
+    fast = bench(f"{serialization.CODEC} dumps (compact)", lambda: serialization.dumps(data))
+    print(f"  speedup: {base / fast:.1f}x, size {len(indented) / 1024:.0f} KB -> {len(compact) / 1024:.0f} KB\n")
+
+    # /processes/?include=movimentos payload (no xml_raw)
+    listing = [{k: v for k, v in p.items() if k != "xml_raw"} for p in data]
+    print("List (render /processes/?include=movimentos):")
+    base = bench("JSONResponse.render", lambda: JSONResponse(listing).body)
+    fast = bench("FastJSONResponse.render", lambda: FastJSONResponse(listing).body)
+    print(f"  speedup: {base / fast:.1f}x")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,60 @@
+import sys
+import json
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.services import xml_parser
+from backend.services.xml_parser import _parse_stdlib, _parse_lxml, parse_processo_xml, MNI_NS
+
+ROOT = Path(__file__).resolve().parent.parent
+PROCESSES_FILE = ROOT / "processes.json"
+
+def bench(label, fn, samples, repeat=10):
+    fn(samples[0])  # warm-up
+    # Best of N runs: the machine's background noise only ever adds time
+    best = min(_timed(fn, samples) for _ in range(repeat))
+    per_doc = best / len(samples) * 1000
+    print(f"  {label:<24} {best * 1000:9.2f} ms total  {per_doc:7.2f} ms/response")
+    return best
+
+def _timed(fn, samples):
+    start = time.perf_counter()
+    for xml_content in samples:
+        fn(xml_content)
+    return time.perf_counter() - start
+
+def run_benchmark():
+    if xml_parser.lxml_etree is None:
+        print("lxml is not installed; only the stdlib parser is available.")
+        return
+
+    data = json.loads(PROCESSES_FILE.read_text(encoding="utf-8"))
+    samples = [p["xml_raw"] for p in data if p.get("xml_raw")]
+    total_kb = sum(len(s.encode("utf-8")) for s in samples) / 1024
+    print(f"Dataset: {len(samples)} SOAP responses, {total_kb:.0f} KB ({PROCESSES_FILE.name})\n")
+
+    print("parse_processo_xml (XML -> ProcessoData, incl. validation and fingerprint):")
+    base = bench("stdlib (streaming)", _parse_stdlib, samples)
+    fast = bench("lxml + compiled XPath", _parse_lxml, samples)
+    print(f"  speedup: {base / fast:.1f}x\n")
+
+    # What consultarProcesso leaves out with incluirDocumentos=false (modo "movimentos")
+    movimentos_only = [strip_documents(s) for s in samples]
+    lean_kb = sum(len(s.encode("utf-8")) for s in movimentos_only) / 1024
+    print(f"Consult mode (payload {total_kb:.0f} KB completo -> {lean_kb:.0f} KB movimentos, {total_kb / lean_kb:.1f}x smaller):")
+    full = bench("completo", parse_processo_xml, samples)
+    lean = bench("movimentos", parse_processo_xml, movimentos_only)
+    print(f"  speedup: {full / lean:.1f}x")
+
+def strip_documents(xml_content: str) -> str:
+    root = xml_parser.lxml_etree.fromstring(xml_content.encode("utf-8"))
+    # processo lives in the service namespace, its documento children in the MNI one
+    for documento in root.findall(f".//{{*}}processo/{{{MNI_NS}}}documento"):
+        documento.getparent().remove(documento)
+    return xml_parser.lxml_etree.tostring(root, encoding="unicode")
+
+if __name__ == "__main__":
+    run_benchmark()
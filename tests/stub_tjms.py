@@ -0,0 +1,261 @@
+import sys
+import re
+import time
+import base64
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from xml.sax.saxutils import quoteattr
+
+# Local stand-in for the TJ-MS MNI 2.2.2 endpoint (consultarProcesso), for load
+# tests. Answers both kinds of request the clients send: process consults
+# (incluirDocumentos true/false) and document downloads (<tip:documento> ids).
+# Responses are synthetic but shaped like the real ones, and deterministic per
+# process number.
+#
+# Run standalone and point the backend at it with TJMS_WSDL_URL:
+#   python tests/stub_tjms.py --port 8099 --latency 50-300 --error-rate 0.02
+
+ENVELOPE_OPEN = (
+    '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+    '<ns4:consultarProcessoResposta xmlns="http://www.cnj.jus.br/tipos-servico-intercomunicacao-2.2.2" '
+    'xmlns:ns2="http://www.cnj.jus.br/intercomunicacao-2.2.2" '
+    'xmlns:ns4="http://www.cnj.jus.br/servico-intercomunicacao-2.2.2/">'
+)
+ENVELOPE_CLOSE = '</ns4:consultarProcessoResposta></soap:Body></soap:Envelope>'
+
+MOVIMENTOS_LOCAIS = [
+    ("50001", "Processo Distribuído por Sorteio"),
+    ("12164", "Conclusos para Decisão Interlocutória"),
+    ("11010", "Mero expediente"),
+    ("60", "Expedição de Certidão"),
+    ("12265", "Intimação Eletrônica - Expedida/Certificada"),
+    ("85", "Petição Juntada"),
+    ("51", "Retorno da Conclusão para Pautar - JV"),
+]
+MOVIMENTOS_NACIONAIS = ["12104", "12266", "123", "581", "1051"]
+TIPOS_DOCUMENTO = [("9500", "Petição"), ("6", "Despacho"), ("15", "Decisões Interlocutórias"), ("8", "Sentença"), ("9509", "Outros documentos")]
+
+_NUMERO = re.compile(r"<tip:numeroProcesso>(.*?)</tip:numeroProcesso>")
+_INCLUIR = re.compile(r"<tip:incluirDocumentos>\s*(true|false)\s*</tip:incluirDocumentos>")
+_DOCUMENTO = re.compile(r"<tip:documento>(.*?)</tip:documento>")
+
+def _stamp(dt: datetime) -> str:
+    return dt.strftime("%Y%m%d%H%M%S")
+
+@lru_cache(maxsize=2048)
+def gerar_consulta(numero: str, movimentos: int = 150, documentos: int = 250, incluir_documentos: bool = True) -> str:
+    """
+    Synthetic consultarProcesso response: dadosBasicos (with one party and one
+    assunto), `movimentos` movements and, if incluir_documentos, `documentos`
+    document metadata elements.
+    """
+    rng = random.Random(numero)
+    digits = re.sub(r"\D", "", numero) or "0"
+    start = datetime(2024, 1, 1) + timedelta(days=rng.randrange(365), seconds=rng.randrange(86400))
+    parts = [
+        ENVELOPE_OPEN,
+        "<sucesso>true</sucesso><mensagem>Consulta realizada com sucesso.</mensagem><processo>",
+        f'<ns2:dadosBasicos numero="{digits}" competencia="{rng.choice([1, 3, 24])}" '
+        f'classeProcessual="{rng.choice([7, 1116, 198])}" codigoLocalidade="{rng.randrange(1, 60)}" '
+        f'nivelSigilo="0" dataAjuizamento="{_stamp(start)}">',
+        '<ns2:polo polo="AT"><ns2:parte><ns2:pessoa nome="Parte Sintética" tipoPessoa="fisica">'
+        '<ns2:documento codigoDocumento="000.000.000-00" emissorDocumento="MF" tipoDocumento="CMF"/>'
+        '</ns2:pessoa></ns2:parte></ns2:polo>',
+        f'<ns2:assunto principal="true"><ns2:codigoNacional>{rng.choice([12502, 10064, 11884])}</ns2:codigoNacional></ns2:assunto>',
+        "</ns2:dadosBasicos>",
+    ]
+    moment = start
+    for i in range(1, movimentos + 1):
+        moment += timedelta(hours=rng.randrange(1, 240), seconds=rng.randrange(3600))
+        complemento = f"<ns2:complemento>Complemento {i} do processo {digits}</ns2:complemento>" if rng.random() < 0.6 else "<ns2:complemento/>"
+        if rng.random() < 0.3:
+            detalhe = f'<ns2:movimentoNacional codigoNacional="{rng.choice(MOVIMENTOS_NACIONAIS)}"/>'
+        else:
+            codigo, descricao = rng.choice(MOVIMENTOS_LOCAIS)
+            detalhe = f'<ns2:movimentoLocal codigoMovimento="{codigo}" descricao={quoteattr(descricao)}/>'
+        parts.append(
+            f'<ns2:movimento dataHora="{_stamp(moment)}" nivelSigilo="0" identificadorMovimento="{i}">'
+            f"{complemento}{detalhe}</ns2:movimento>"
+        )
+    if incluir_documentos:
+        moment = start
+        for i in range(documentos):
+            moment += timedelta(hours=rng.randrange(1, 200))
+            tipo, descricao = rng.choice(TIPOS_DOCUMENTO)
+            parts.append(
+                f'<ns2:documento idDocumento="{doc_id(digits, i)}" tipoDocumento="{tipo}" dataHora="{_stamp(moment)}" '
+                f'mimetype="application/pdf" nivelSigilo="0" movimento="{rng.randrange(1, movimentos + 1)}" '
+                f'descricao={quoteattr(descricao)} tipoDocumentoLocal="{tipo}"/>'
+            )
+    parts.append("</processo>")
+    parts.append(ENVELOPE_CLOSE)
+    return "".join(parts)
+
+def doc_id(digits: str, index: int) -> str:
+    return f"{int(digits[-9:] or 0) + index * 7} - {index % 2}"
+
+def nao_encontrado(numero: str) -> str:
+    return (
+        f"{ENVELOPE_OPEN}<sucesso>false</sucesso>"
+        f"<mensagem>Processo {numero} não encontrado.</mensagem>{ENVELOPE_CLOSE}"
+    )
+
+@lru_cache(maxsize=8)
+def _fake_pdf(size: int) -> str:
+    body = b"%PDF-1.4\n" + b"0" * max(size - 16, 0) + b"\n%%EOF\n"
+    return base64.b64encode(body).decode("ascii")
+
+def gerar_conteudos(ids, payload_bytes: int = 50_000) -> str:
+    """
+    Synthetic document download response: one base64 <ns2:conteudo> (a dummy
+    PDF of about payload_bytes) per requested id, in order.
+    """
+    conteudo = _fake_pdf(payload_bytes)
+    documentos = "".join(
+        f'<ns2:documento idDocumento={quoteattr(i)} mimetype="application/pdf"><ns2:conteudo>{conteudo}</ns2:conteudo></ns2:documento>'
+        for i in ids
+    )
+    return f"{ENVELOPE_OPEN}<sucesso>true</sucesso><mensagem>OK</mensagem><processo>{documentos}</processo>{ENVELOPE_CLOSE}"
+
+class StubTJMS:
+    """
+    Threaded HTTP server answering consultarProcesso like TJ-MS would.
+
+    latency: (min, max) seconds added to every response, uniformly distributed
+    error_rate: share of requests answered with HTTP error_status
+    not_found_rate: share of consults answered with <sucesso>false</sucesso>
+    movimentos / documentos: per-process counts; payload_bytes: size of each downloaded document
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency=(0.0, 0.0),
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        not_found_rate: float = 0.0,
+        movimentos: int = 150,
+        documentos: int = 250,
+        payload_bytes: int = 50_000,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.not_found_rate = not_found_rate
+        self.movimentos = movimentos
+        self.documentos = documentos
+        self.payload_bytes = payload_bytes
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8", "replace")
+                status, payload = stub.respond(body)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: threading.Thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/mniws/servico-intercomunicacao-2.2.2/intercomunicacao"
+
+    def respond(self, body: str):
+        with self._lock:
+            delay = self._rng.uniform(*self.latency)
+            fail = self._rng.random() < self.error_rate
+            missing = self._rng.random() < self.not_found_rate
+            self.requests += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.errors += 1
+            return self.error_status, b""
+
+        match = _NUMERO.search(body)
+        numero = match.group(1) if match else ""
+        ids = _DOCUMENTO.findall(body)
+        if ids:
+            xml = gerar_conteudos(ids, self.payload_bytes)
+        elif missing:
+            xml = nao_encontrado(numero)
+        else:
+            incluir = _INCLUIR.search(body)
+            xml = gerar_consulta(
+                numero, self.movimentos, self.documentos, incluir is None or incluir.group(1) == "true"
+            )
+        payload = xml.encode("utf-8")
+        with self._lock:
+            self.bytes_sent += len(payload)
+        return 200, payload
+
+    def start(self) -> "StubTJMS":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def parse_range(value: str):
+    low, _, high = value.partition("-")
+    return float(low) / 1000, float(high or low) / 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita o MNI 2.2.2 do TJ-MS")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default="0", help="latência em ms, fixa (100) ou faixa (50-300)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--not-found-rate", type=float, default=0.0)
+    parser.add_argument("--movimentos", type=int, default=150)
+    parser.add_argument("--documentos", type=int, default=250)
+    parser.add_argument("--payload-bytes", type=int, default=50_000)
+    args = parser.parse_args()
+
+    stub = StubTJMS(
+        args.host, args.port, parse_range(args.latency), args.error_rate, args.error_status,
+        args.not_found_rate, args.movimentos, args.documentos, args.payload_bytes,
+    )
+    print(f"Stub MNI em {stub.url} (TJMS_WSDL_URL={stub.url})")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"{stub.requests} requisições, {stub.errors} erros, {stub.bytes_sent / 1024 / 1024:.1f} MB enviados")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import sys
+import os
+import json
+import asyncio
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.config import Config
+from backend.models import ProcessoData
+from backend.routers import prompts
+from backend.llm_cache import LLMCache
+from backend.services.ai_classifier import OpenRouterClient, classify_process, get_client
+from backend.services import ai_classifier
+
+class StubOpenRouter:
+    """
+    Minimal chat.completions endpoint; records the client port of every request
+    to count the TCP connections used.
+    """
+
+    def __init__(self, content: dict):
+        self.ports = []
+        body = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": json.dumps(content)}}],
+        }).encode("utf-8")
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.ports.append(self.client_address[1])
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/api/v1"
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def test_shared_client():
+    stub = StubOpenRouter({"tipo_intimacao": "Despacho", "resumo": "ok"})
+    original_key, original_client, original_cache = Config.OPENROUTER_API_KEY, ai_classifier.openrouter_client, ai_classifier.llm_cache
+    Config.OPENROUTER_API_KEY = "test"
+    ai_classifier.openrouter_client = OpenRouterClient(stub.url, 4, 4, 60, 30, 5, http2=False)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            ai_classifier.llm_cache = LLMCache(os.path.join(tmp, "llm_cache.db"), ttl=0, max_entries=0)
+            prompts.save_prompts([prompts.PromptConfig(id="p7", name="Cível", classes=["7"], content="Classifique.")])
+            processes = [ProcessoData(numero=f"{i:020d}", competencia="1", classeProcessual="7") for i in range(40)]
+
+            async def run():
+                ai_classifier.openrouter_client.open()
+                assert get_client() is get_client()
+                results = await asyncio.gather(*(classify_process(p) for p in processes))
+                await ai_classifier.openrouter_client.aclose()
+                return results
+
+            print("Classifying 40 processes through the shared client (pool of 4)...")
+            results = asyncio.run(run())
+            os.chdir(cwd)
+
+        assert all(r.classificacao["tipo_intimacao"] == "Despacho" for r in results)
+        connections = len(set(stub.ports))
+        print(f"Requests: {len(stub.ports)}, connections: {connections}, clients created: {ai_classifier.openrouter_client.clients_created}")
+        assert len(stub.ports) == 40
+        assert connections <= 4, "connections should be reused from the keep-alive pool"
+        assert ai_classifier.openrouter_client.clients_created == 1
+    finally:
+        os.chdir(cwd)
+        Config.OPENROUTER_API_KEY, ai_classifier.openrouter_client = original_key, original_client
+        ai_classifier.llm_cache = original_cache
+        stub.stop()
+    print("Shared client verification passed!")
+
+def test_result_cache():
+    stub = StubOpenRouter({"tipo_intimacao": "Sentença", "resumo": "ok"})
+    original_key, original_client, original_cache = Config.OPENROUTER_API_KEY, ai_classifier.openrouter_client, ai_classifier.llm_cache
+    Config.OPENROUTER_API_KEY = "test"
+    ai_classifier.openrouter_client = OpenRouterClient(stub.url, 4, 4, 60, 30, 5, http2=False)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            cache = ai_classifier.llm_cache = LLMCache(os.path.join(tmp, "llm_cache.db"), ttl=3600, max_entries=1000)
+            prompts.save_prompts([prompts.PromptConfig(id="p7", name="Cível", classes=["7"], content="Classifique.")])
+            processes = [ProcessoData(numero=f"{i:020d}", competencia="1", classeProcessual="7") for i in range(20)]
+
+            async def classify_all(use_cache=True):
+                return await asyncio.gather(*(classify_process(p, use_cache=use_cache) for p in processes))
+
+            async def run():
+                print("Classifying 20 processes, then again with the same inputs...")
+                await classify_all()
+                assert len(stub.ports) == 20
+                again = await classify_all()
+                assert len(stub.ports) == 20, "identical inputs should not reach the LLM"
+                assert all(r.classificacao["tipo_intimacao"] == "Sentença" for r in again)
+                assert [r.numero_processo for r in again] == [p.numero for p in processes]
+
+                print("Bypassing the cache...")
+                await classify_all(use_cache=False)
+                assert len(stub.ports) == 40
+
+                print("Editing the prompt (new key for every process)...")
+                prompts.update_prompt("p7", prompts.PromptConfig(id="p7", name="Cível", classes=["7"], content="Classifique de novo."))
+                await classify_all()
+                assert len(stub.ports) == 60
+                await ai_classifier.openrouter_client.aclose()
+
+            asyncio.run(run())
+            stats = cache.stats()
+            print(f"Cache stats: {stats}")
+            assert (stats["hits"], stats["misses"], stats["bypasses"]) == (20, 40, 20)
+            assert stats["hit_rate"] == round(20 / 60, 3)
+            assert stats["entries"] == 40
+            os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+        Config.OPENROUTER_API_KEY, ai_classifier.openrouter_client = original_key, original_client
+        ai_classifier.llm_cache = original_cache
+        stub.stop()
+    print("Result cache verification passed!")
+
+def test_cache_eviction():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMCache(os.path.join(tmp, "llm_cache.db"), ttl=3600, max_entries=10)
+        for i in range(25):
+            cache.put(f"k{i}", {"tipo_intimacao": str(i)})
+        assert cache.get("k3") == {"tipo_intimacao": "3"}
+        # Least recently used go first: k3 was just read
+        assert cache.prune() == 15
+        assert cache.get("k3") is not None and cache.get("k24") is not None
+        assert cache.get("k5") is None
+
+        print("Expiring entries past the TTL...")
+        cache.ttl = 0.05
+        time.sleep(0.1)
+        cache.put("fresh", {"tipo_intimacao": "x"})
+        assert cache.get("k24") is None and cache.stats()["expired"] == 1
+        assert cache.get("fresh") is not None
+        assert cache.prune() == 10
+        assert cache.stats()["entries"] == 1
+    print("Cache eviction verification passed!")
+
+def test_missing_key():
+    original_key = Config.OPENROUTER_API_KEY
+    Config.OPENROUTER_API_KEY = None
+    client = OpenRouterClient("http://127.0.0.1:1/api/v1", 2, 2, 60, 30, 5, http2=False)
+
+    async def run():
+        client.open()  # no key: nothing to open, startup must not fail
+        try:
+            client.get()
+        except ValueError:
+            return True
+        return False
+
+    try:
+        assert asyncio.run(run())
+        assert client.clients_created == 0
+    finally:
+        Config.OPENROUTER_API_KEY = original_key
+    print("Missing key verification passed!")
+
+def test_prompt_index():
+    from fastapi import HTTPException
+
+    cwd = os.getcwd()
+    reads = []
+    original_read = prompts._read_prompts
+
+    def counting_read():
+        reads.append(1)
+        return original_read()
+
+    prompts._read_prompts = counting_read
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            prompts.create_prompt(prompts.PromptConfig(id="civel", name="Cível", classes=["7", "1116"], content="A"))
+            prompts.create_prompt(prompts.PromptConfig(id="exec", name="Execução", classes=["1117"], content="B"))
+            reads.clear()
+
+            print("Looking up classes without re-reading prompts.json...")
+            for _ in range(100):
+                assert prompts.prompt_for_class("1116").id == "civel"
+                assert ai_classifier.get_prompt_for_class("1117") == "B"
+                assert prompts.prompt_for_class("999") is None
+            assert not reads, "writes should refresh the index without re-reading the file"
+
+            print("Rejecting a class already assigned to another prompt...")
+            try:
+                prompts.create_prompt(prompts.PromptConfig(id="dup", name="Dup", classes=["7"], content="C"))
+                assert False, "conflict not detected"
+            except HTTPException as e:
+                assert e.status_code == 409 and "civel" in e.detail
+            try:
+                prompts.update_prompt("exec", prompts.PromptConfig(id="exec", name="Execução", classes=["1117", "1116"], content="B"))
+                assert False, "conflict not detected"
+            except HTTPException as e:
+                assert e.status_code == 409
+            # Moving a class: drop it from one prompt, then add it to the other
+            prompts.update_prompt("civel", prompts.PromptConfig(id="civel", name="Cível", classes=["7"], content="A2"))
+            prompts.update_prompt("exec", prompts.PromptConfig(id="exec", name="Execução", classes=["1117", "1116"], content="B"))
+            assert prompts.prompt_for_class("1116").id == "exec"
+            assert prompts.prompt_for_class("7").content == "A2"
+            prompts.delete_prompt("exec")
+            assert prompts.prompt_for_class("1117") is None
+
+            print("Picking up a hand edit of prompts.json...")
+            with open(prompts.PROMPTS_FILE, "w", encoding="utf-8") as f:
+                json.dump([{"id": "manual", "name": "Manual", "classes": ["42"], "content": "M"}], f)
+            assert prompts.prompt_for_class("42").id == "manual"
+            assert prompts.prompt_for_class("7") is None
+            assert len(reads) == 1
+            os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+        prompts._read_prompts = original_read
+    print("Prompt index verification passed!")
+
+if __name__ == "__main__":
+    test_shared_client()
+    test_result_cache()
+    test_cache_eviction()
+    test_prompt_index()
+    test_missing_key()
@@ -14,7 +14,7 @@ sys.modules['backend.services.ai_classifier'] = MagicMock()
 from backend.routers.classification import analyze_all_endpoint
 from backend.models import ProcessoData
 
-async def mock_classify_process(process):
+async def mock_classify_process(process, use_cache=True):
     print(f"Start classifying {process.numero}")
     await asyncio.sleep(0.5) # Simulate delay
     print(f"End classifying {process.numero}")
@@ -26,13 +26,16 @@ async def test_concurrency():
     # Setup mocks
     mock_db = [ProcessoData(numero=f"Proc-{i}", classeProcessual="7", competencia="Civel", movimentos=[], xml_raw="") for i in range(10)]
     
-    with patch('backend.routers.classification.load_db', return_value=mock_db), \
-         patch('backend.routers.classification.load_classifications', return_value=[]), \
+    mock_repository = MagicMock()
+    mock_repository.all.return_value = mock_db
+    mock_repository.is_classified.return_value = False
+
+    with patch('backend.routers.classification.repository', mock_repository), \
          patch('backend.routers.classification.classify_process', side_effect=mock_classify_process) as mock_classify, \
          patch('backend.routers.classification.save_classification_result'):
         
         start_time = time.time()
-        await analyze_all_endpoint(force=True)
+        await analyze_all_endpoint(force=True, max_concurrent=5, classe_processual=None)
         end_time = time.time()
         
         duration = end_time - start_time
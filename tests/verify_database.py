@@ -0,0 +1,315 @@
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend import database, blob_store
+from backend.repository import ProcessRepository
+from backend.models import ProcessoData, Movimento, ClassificacaoResult
+
+def make_process(numero, classe="7", n_movs=3):
+    return ProcessoData(
+        numero=numero,
+        competencia="Cível",
+        classeProcessual=classe,
+        assuntos=["999"],
+        movimentos=[
+            Movimento(dataHora=f"2024-01-0{i + 1}T10:00:00", descricao=f"Mov {i}", codigo=str(i))
+            for i in range(n_movs)
+        ],
+        xml_raw=f"<processo numero='{numero}'/>",
+    )
+
+def test_sqlite_storage():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_FILE = os.path.join(tmp, "test.db")
+        database.DB_FILE = os.path.join(tmp, "missing.json")
+        database.CLASSIFICATIONS_FILE = os.path.join(tmp, "missing_cls.json")
+        blob_store.BLOB_DIR = os.path.join(tmp, "blobs")
+
+        print("Saving processes...")
+        database.save_process(make_process("1"))
+        database.save_process(make_process("2", classe="1116", n_movs=5))
+        assert [p.numero for p in database.load_db()] == ["1", "2"]
+
+        p = database.load_process("2")
+        assert p.classeProcessual == "1116"
+        assert len(p.movimentos) == 5
+        assert p.movimentos[-1].descricao == "Mov 4"
+        assert database.load_process("3") is None
+
+        print("Hydrating lazily...")
+        lazy = database.load_db()[1]
+        assert not lazy.movimentos.loaded
+        assert lazy.classeProcessual == "1116" and not lazy.movimentos.loaded
+        assert lazy.model_dump() == database.load_db(strict=True)[1].model_dump() == p.model_dump()
+        assert lazy.movimentos.loaded
+
+        print("Loading raw XML from the blob store...")
+        assert p.xml_raw is None
+        assert p.load_xml_raw() == "<processo numero='2'/>"
+        assert "xml_raw" not in p.model_dump()
+
+        print("Replacing process...")
+        database.save_process(make_process("2", n_movs=1))
+        assert len(database.load_process("2").movimentos) == 1
+
+        print("Saving classifications...")
+        database.save_classification_result(ClassificacaoResult(
+            numero_processo="1", classe_processual="7", classificacao={"tipo_intimacao": "5.2.3"}
+        ))
+        database.save_classification_result(ClassificacaoResult(
+            numero_processo="1", classe_processual="7", classificacao={"tipo_intimacao": "1.1"}
+        ))
+        classifications = database.load_classifications()
+        assert len(classifications) == 1
+        assert database.load_classification("1")["classificacao"]["tipo_intimacao"] == "1.1"
+
+        print("Compacting classification log...")
+        conn = database.get_connection()
+        assert conn.execute("SELECT COUNT(*) FROM classification_log").fetchone()[0] == 2
+        database.compact_classification_log()
+        assert conn.execute("SELECT COUNT(*) FROM classification_log").fetchone()[0] == 1
+        assert database.load_classification("1")["classificacao"]["tipo_intimacao"] == "1.1"
+
+        print("Deleting...")
+        database.delete_process("1")
+        database.delete_classification("1")
+        assert database.load_process("1") is None
+        assert not blob_store.has_blob(blob_store.content_hash(b"<processo numero='1'/>"))
+        assert database.load_classification("1") is None
+        assert database.get_connection().execute(
+            "SELECT COUNT(*) FROM movements WHERE numero = '1'"
+        ).fetchone()[0] == 0
+
+        database.close_connection()
+
+    print("SQLite storage verification passed!")
+
+def test_repository():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_FILE = os.path.join(tmp, "repo.db")
+        blob_store.BLOB_DIR = os.path.join(tmp, "blobs")
+        repository = ProcessRepository()
+
+        print("Indexing processes...")
+        repository.save(make_process("1"))
+        repository.save(make_process("2", classe="1116"))
+        assert repository.get("2").classeProcessual == "1116"
+        assert [p.numero for p in repository.by_classe("7")] == ["1"]
+        generation = repository._generation
+
+        print("Picking up writes made outside the repository...")
+        database.save_process(make_process("3"))
+        assert repository.get("3") is not None
+        assert repository._generation == generation + 1
+        assert [p.numero for p in repository.by_classe("7")] == ["1", "3"]
+
+        print("Deleting through the repository...")
+        repository.delete("1")
+        assert repository.get("1") is None
+        assert repository.count() == 2
+
+        database.save_classification_result(ClassificacaoResult(
+            numero_processo="2", classe_processual="1116", classificacao={"tipo_intimacao": "1.1"}
+        ))
+        assert repository.is_classified("2")
+        assert not repository.is_classified("3")
+
+        database.close_connection()
+
+    print("Repository verification passed!")
+
+def test_blob_cleanup():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_FILE = os.path.join(tmp, "blobs.db")
+        blob_store.BLOB_DIR = os.path.join(tmp, "blobs")
+
+        def stored_blobs():
+            return sorted(name[:-3] for _, _, files in os.walk(blob_store.BLOB_DIR) for name in files)
+
+        print("Replacing a process's XML drops the old blob...")
+        first = make_process("1")
+        database.save_process(first)
+        old_sha = first.xml_sha256
+        second = make_process("1")
+        second.xml_raw = "<processo numero='1' versao='2'/>"
+        database.save_process(second)
+        assert stored_blobs() == [second.xml_sha256] and second.xml_sha256 != old_sha
+
+        print("A blob shared with another process is kept...")
+        twin = make_process("2")
+        twin.xml_raw = second.xml_raw
+        database.save_process(twin)
+        third = make_process("1")
+        third.xml_raw = "<processo numero='1' versao='3'/>"
+        database.save_processes([third])
+        assert stored_blobs() == sorted([second.xml_sha256, third.xml_sha256])
+
+        print("Replacing the whole table drops blobs of removed processes...")
+        database.save_db([database.load_process("1")])
+        assert stored_blobs() == [third.xml_sha256]
+        database.delete_process("1")
+        assert stored_blobs() == []
+
+        print("Overlapping saves of the same content keep the shared blob...")
+        import threading
+        from unittest.mock import patch
+        old, new = make_process("3"), make_process("3")
+        new.xml_raw = "<processo numero='3' versao='2'/>"
+        database.save_process(old)
+        delete_blobs = database._delete_blobs
+        bump_generation = database._bump_generation
+        stored, release = threading.Event(), threading.Event()
+
+        def paused_bump(conn):
+            # Writer B: blob stored, row not committed yet
+            if threading.current_thread().name == "writer-b":
+                stored.set()
+                release.wait(10)
+            return bump_generation(conn)
+
+        def write_old():
+            database.save_process(make_process("3"))
+            database.close_connection()
+
+        def interleaved_delete(conn, shas):
+            if threading.current_thread().name == "writer-b":
+                return delete_blobs(conn, shas)
+            # Writer A committed the new XML and found the old blob unreferenced
+            writer = threading.Thread(target=write_old, name="writer-b")
+            writer.start()
+            assert stored.wait(10)
+            delete_blobs(conn, shas)
+            release.set()
+            writer.join(10)
+
+        with patch.object(database, "_delete_blobs", interleaved_delete), \
+                patch.object(database, "_bump_generation", paused_bump):
+            database.save_process(new)
+        assert database.load_process("3").load_xml_raw() == old.xml_raw
+        assert stored_blobs() == [old.xml_sha256] and not blob_store._pins
+
+        print("...and one that committed before the cleanup ran...")
+        def committed_delete(conn, shas):
+            if threading.current_thread().name == "writer-b":
+                return delete_blobs(conn, shas)
+            writer = threading.Thread(target=write_old, name="writer-b")
+            writer.start()
+            writer.join(10)
+            delete_blobs(conn, shas)
+
+        with patch.object(database, "_delete_blobs", committed_delete):
+            database.save_process(new)
+        assert database.load_process("3").load_xml_raw() == old.xml_raw
+        database.close_connection()
+    print("Blob cleanup verification passed!")
+
+def test_list_processes():
+    from datetime import date, datetime
+    from itertools import product
+    from unittest.mock import patch
+    from fastapi import Response
+    from backend.repository import repository, SORT_KEYS
+    from backend.routers.processes import list_processes
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_FILE = os.path.join(tmp, "list.db")
+        blob_store.BLOB_DIR = os.path.join(tmp, "blobs")
+        repository.save_many([make_process(f"{i:03d}", classe=("7", "1116", "198")[i % 3], n_movs=1 + i % 7) for i in range(60)])
+        database.save_classification_results([
+            ClassificacaoResult(
+                numero_processo=f"{i:03d}", classe_processual="7",
+                classificacao={"tipo_intimacao": ("A", "B")[i % 2]},
+                data_classificacao=datetime(2024, 1, 1 + i % 20, 12),
+            )
+            for i in range(0, 60, 2) if i % 3 != 1
+        ])
+
+        def expected(classe, status, tipo, desde, sort, order):
+            classifications = database.classification_index()
+            keep = []
+            for s in repository.summaries():
+                c = classifications.get(s.numero)
+                if classe and s.classeProcessual != classe:
+                    continue
+                if status == "classificado" and c is None or status == "pendente" and c is not None:
+                    continue
+                if tipo and (c is None or c["classificacao"]["tipo_intimacao"] != tipo):
+                    continue
+                if desde and (c is None or c["data_classificacao"] < desde.isoformat()):
+                    continue
+                keep.append((SORT_KEYS[sort](s, c), s.numero))
+            return [n for _, n in sorted(keep, reverse=order == "desc")]
+
+        def listed(**params):
+            # Follows X-Next-Cursor through every page
+            numeros, cursor = [], None
+            while True:
+                response = Response()
+                page = list_processes(response, cursor=cursor, fields="numero", limit=7, **params)
+                numeros += [item["numero"] for item in page]
+                cursor = response.headers.get("X-Next-Cursor")
+                if not cursor:
+                    return numeros
+
+        print("Comparing filtered, sorted and paginated listings with a full scan...")
+        for classe, status, tipo, desde, sort, order in product(
+            (None, "7"), (None, "classificado", "pendente"), (None, "A"), (None, date(2024, 1, 10)),
+            ("data_classificacao", "numero", "total_movimentos"), ("asc", "desc"),
+        ):
+            got = listed(
+                classe_processual=classe, status=status, tipo_intimacao=tipo, classificado_desde=desde,
+                classificado_ate=None, include=None, sort=sort, order=order,
+            )
+            assert got == expected(classe, status, tipo, desde, sort, order), (classe, status, tipo, desde, sort, order)
+
+        print("Counting SQL round trips for one filtered page...")
+        with patch.object(database, "get_generation", wraps=database.get_generation) as generation, \
+             patch.object(database._classification_index, "sync", wraps=database._classification_index.sync) as index:
+            page = list_processes(
+                Response(), include=None, fields=None, classe_processual="7", status="pendente", tipo_intimacao=None,
+                classificado_desde=None, classificado_ate=None, sort="numero", order="asc", limit=None, cursor=None,
+            )
+            assert len(page) == len(expected("7", "pendente", None, None, "numero", "asc")) > 5
+            # A few per request, not one per entry
+            assert generation.call_count <= 3 and index.call_count <= 2, (generation.call_count, index.call_count)
+
+        print("Rewrites never hide an entry from concurrent readers...")
+        summaries, classifications = repository.summary_map(), repository.classification_map()
+        present = []
+        index = repository._index
+        from_row = database._classification_from_row
+
+        def probe_index(process, summary=None):
+            present.append(process.numero in repository._summaries and process.numero in repository._by_numero)
+            return index(process, summary)
+
+        def probe_row(row):
+            present.append(row["numero_processo"] in database._classification_index.entries)
+            return from_row(row)
+
+        with patch.object(repository, "_index", probe_index), patch.object(database, "_classification_from_row", probe_row):
+            repository.save_many([make_process("000", classe="198"), make_process("003")])
+            database.save_classification_results([
+                ClassificacaoResult(
+                    numero_processo="000", classe_processual="7",
+                    classificacao={"tipo_intimacao": "B"}, data_classificacao=datetime(2024, 2, 1),
+                )
+            ])
+        assert present == [True, True, True], present
+        assert [p.numero for p in repository.by_classe("198")].count("000") == 1
+        assert "000" not in {p.numero for p in repository.by_classe("7")}
+        # The maps a request already holds are its own copies
+        assert summaries["000"].classeProcessual == "7" and classifications["000"]["classificacao"]["tipo_intimacao"] == "A"
+        database.close_connection()
+    print("List processes verification passed!")
+
+if __name__ == "__main__":
+    test_sqlite_storage()
+    test_repository()
+    test_blob_cleanup()
+    test_list_processes()
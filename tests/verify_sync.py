@@ -0,0 +1,130 @@
+import sys
+import os
+import asyncio
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root (and tests/, for the stub) to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from backend import database, blob_store
+from backend.config import Config
+from backend.models import ClassificacaoResult
+from backend.repository import repository
+from backend.soap_cache import SoapCache
+from backend.services import tjms_client
+from backend.services.ingest import shutdown_executor
+from backend.services.result_writer import classification_writer
+from backend.services.sync_scheduler import SyncScheduler
+from backend.services.xml_parser import parse_processo_xml
+from stub_tjms import StubTJMS, gerar_consulta
+
+# Digits only: the stub seeds its data by the exact string the scheduler sends
+NUMEROS = ["08000010020248120001", "08000020020248120001", "08000030020248120001"]
+
+def test_sync_cycle():
+    classified = []
+
+    async def fake_classify(process):
+        classified.append(process.numero)
+        return ClassificacaoResult(
+            numero_processo=process.numero,
+            classe_processual=process.classeProcessual or "N/A",
+            classificacao={"tipo_intimacao": "NOVA"},
+            data_classificacao=datetime.now(),
+        )
+
+    async def run(scheduler, stub):
+        print("Re-syncing unchanged processes (budget 2 of 3)...")
+        first = await scheduler.run_cycle()
+        assert (first["checked"], first["unchanged"], first["changed"]) == (2, 2, 0)
+        second = await scheduler.run_cycle()
+        assert (second["checked"], second["unchanged"]) == (1, 1)
+        assert scheduler.reclassified == 0 and not classified
+
+        print("Re-syncing after TJ-MS added two movements to every process...")
+        stub.movimentos = 12
+        third = await scheduler.run_cycle()
+        assert (third["checked"], third["changed"], third["movements_added"]) == (2, 2, 4)
+        for _ in range(200):
+            if scheduler.reclassified == 2:
+                break
+            await asyncio.sleep(0.01)
+        await classification_writer.stop()
+        await scheduler.stop()
+
+    with tempfile.TemporaryDirectory() as tmp, StubTJMS(movimentos=10, documentos=5) as stub:
+        database.SQLITE_FILE = os.path.join(tmp, "sync.db")
+        database.DB_FILE = os.path.join(tmp, "missing.json")
+        database.CLASSIFICATIONS_FILE = os.path.join(tmp, "missing_cls.json")
+        blob_store.BLOB_DIR = os.path.join(tmp, "blobs")
+        original_url, original_cache = Config.TJMS_WSDL_URL, tjms_client.soap_cache
+        Config.TJMS_WSDL_URL = stub.url
+        tjms_client.soap_cache = SoapCache(os.path.join(tmp, "cache"), ttl=0, stale_ttl=0)
+        try:
+            processes = [parse_processo_xml(gerar_consulta(n, 10, 5, False)) for n in NUMEROS]
+            repository.save_many(processes)
+            # Newest last movement first; the oldest is left for the next round
+            order = [numero for _, numero in reversed(repository.sorted_index("ultima_movimentacao"))]
+            newest, oldest = order[0], order[-1]
+            database.save_classification_results([
+                ClassificacaoResult(numero_processo=newest, classe_processual="7", classificacao={"tipo_intimacao": "VELHA"}, data_classificacao=datetime.now())
+            ])
+
+            scheduler = SyncScheduler(interval=0, budget=2, concurrency=2, classify=fake_classify)
+            asyncio.run(run(scheduler, stub))
+
+            stats = scheduler.stats()
+            print(f"Stats: {stats}")
+            assert sorted(classified) == sorted(order[:2])
+            assert repository.classification(newest)["classificacao"]["tipo_intimacao"] == "NOVA"
+            assert len(repository.get(newest).movimentos) == 12
+            assert len(repository.get(oldest).movimentos) == 10
+            assert stats["rounds_completed"] == 1 and stats["checked"] == 5
+        finally:
+            Config.TJMS_WSDL_URL, tjms_client.soap_cache = original_url, original_cache
+            shutdown_executor()
+            database.close_connection()
+    print("Sync cycle verification passed!")
+
+def test_sync_endpoint():
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    from backend.services.sync_scheduler import sync_scheduler
+
+    with tempfile.TemporaryDirectory() as tmp, StubTJMS(movimentos=10, documentos=5) as stub:
+        database.SQLITE_FILE = os.path.join(tmp, "sync_api.db")
+        database.DB_FILE = os.path.join(tmp, "missing.json")
+        database.CLASSIFICATIONS_FILE = os.path.join(tmp, "missing_cls.json")
+        blob_store.BLOB_DIR = os.path.join(tmp, "blobs")
+        original_url, original_cache = Config.TJMS_WSDL_URL, tjms_client.soap_cache
+        original_reclassify = sync_scheduler.reclassify
+        Config.TJMS_WSDL_URL = stub.url
+        tjms_client.soap_cache = SoapCache(os.path.join(tmp, "cache"), ttl=0, stale_ttl=0)
+        sync_scheduler.reclassify = False
+        try:
+            repository.save_many([parse_processo_xml(gerar_consulta(n, 10, 5, False)) for n in NUMEROS])
+            stub.movimentos = 11
+            with TestClient(app) as client:
+                print("Triggering a cycle through POST /processes/sync...")
+                response = client.post("/processes/sync")
+                assert response.status_code == 202, response.text
+                for _ in range(300):
+                    status = client.get("/processes/sync_status").json()
+                    if status["cycles"] >= 1 and not status["running"]:
+                        break
+                    time.sleep(0.02)
+                print(f"Status: {status['last_cycle']}")
+                assert status["last_cycle"]["changed"] == len(NUMEROS)
+        finally:
+            Config.TJMS_WSDL_URL, tjms_client.soap_cache = original_url, original_cache
+            sync_scheduler.reclassify = original_reclassify
+            database.close_connection()
+    print("Sync endpoint verification passed!")
+
+if __name__ == "__main__":
+    test_sync_cycle()
+    test_sync_endpoint()
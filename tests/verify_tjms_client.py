@@ -0,0 +1,342 @@
+import sys
+import os
+import json
+import sqlite3
+import time
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+import httpx
+import requests
+
+# Add project root (and tests/, for the stub) to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from backend.config import Config
+from backend.soap_cache import SoapCache
+from backend.services.throttle import Throttle, CircuitOpenError
+from backend.services.xml_parser import parse_processo_xml
+from stub_tjms import StubTJMS
+from backend.services import tjms_client
+from backend.services.tjms_client import (
+    TJMSSession, AsyncTJMSClient, ConsultMetrics, build_envelope, MODO_COMPLETO, MODO_MOVIMENTOS,
+)
+
+RESPONSE = b"<soap:Envelope xmlns:soap='http://schemas.xmlsoap.org/soap/envelope/'><soap:Body/></soap:Envelope>"
+
+class EchoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    failures_left = 0  # answer this many requests with 503 first
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        if EchoHandler.failures_left > 0:
+            EchoHandler.failures_left -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+def test_envelope():
+    print("Building SOAP envelope...")
+    envelope = build_envelope("0800041-28.2024.8.12.0051").decode("utf-8")
+    assert "<tip:numeroProcesso>0800041-28.2024.8.12.0051</tip:numeroProcesso>" in envelope
+    assert f"<tip:idConsultante>{Config.TJMS_USER}</tip:idConsultante>" in envelope
+    assert "<tip:numeroProcesso>1&lt;2</tip:numeroProcesso>" in build_envelope("1<2").decode("utf-8")
+    assert "<tip:incluirDocumentos>true</tip:incluirDocumentos>" in envelope
+    lean = build_envelope("1", MODO_MOVIMENTOS).decode("utf-8")
+    assert "<tip:incluirDocumentos>false</tip:incluirDocumentos>" in lean
+    assert "<tip:movimentos>true</tip:movimentos>" in lean
+    print("Envelope verification passed!")
+
+def test_connection_reuse():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original_url, original_session = Config.TJMS_WSDL_URL, tjms_client.tjms_session
+    Config.TJMS_WSDL_URL = f"http://127.0.0.1:{server.server_port}/mni"
+    tjms_client.tjms_session = TJMSSession(pool_size=4, max_retries=0, backoff_factor=0)
+    try:
+        print("Sending 100 requests from 10 threads...")
+        with ThreadPoolExecutor(10) as executor:
+            bodies = list(executor.map(lambda _: tjms_client.soap_consultar_processo("1"), range(100)))
+        assert all(body == RESPONSE.decode() for body in bodies)
+
+        stats = tjms_client.tjms_session.stats()
+        print(f"Stats: {stats}")
+        assert stats["requests"] == 100 and stats["errors"] == 0
+        assert stats["connections_opened"] <= 4
+        assert stats["connections_reused"] >= 96
+    finally:
+        tjms_client.tjms_session.close()
+        Config.TJMS_WSDL_URL, tjms_client.tjms_session = original_url, original_session
+        server.shutdown()
+    print("Connection reuse verification passed!")
+
+def test_async_client():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original_url = Config.TJMS_WSDL_URL
+    Config.TJMS_WSDL_URL = f"http://127.0.0.1:{server.server_port}/mni"
+    client = AsyncTJMSClient(max_concurrent=3, pool_size=3, max_retries=2, backoff_factor=0.01)
+
+    async def run():
+        try:
+            return await asyncio.gather(*[client.consultar_processo(str(i)) for i in range(30)])
+        finally:
+            await client.aclose()
+
+    try:
+        print("Fetching 30 processes through the async client (2 transient 503s)...")
+        EchoHandler.failures_left = 2
+        bodies = asyncio.run(run())
+        assert all(body == RESPONSE.decode() for body in bodies)
+
+        stats = client.stats()
+        print(f"Stats: {stats}")
+        assert stats["requests"] == 30 and stats["errors"] == 0
+        assert stats["retries"] == 2
+        assert stats["max_in_flight"] <= 3
+    finally:
+        Config.TJMS_WSDL_URL = original_url
+        server.shutdown()
+    print("Async client verification passed!")
+
+def test_consult_metrics():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original_url, original_metrics = Config.TJMS_WSDL_URL, tjms_client.consult_metrics
+    Config.TJMS_WSDL_URL = f"http://127.0.0.1:{server.server_port}/mni"
+    tjms_client.consult_metrics = ConsultMetrics()
+    try:
+        print("Recording payload size and latency per consult mode...")
+        tjms_client.soap_consultar_processo("1", modo=MODO_MOVIMENTOS)
+        tjms_client.soap_consultar_processo("2", modo=MODO_MOVIMENTOS)
+        tjms_client.soap_consultar_processo("3")
+        tjms_client.consult_metrics.record_parse(MODO_MOVIMENTOS, 2.0)
+
+        stats = tjms_client.consult_metrics.stats()
+        print(f"Stats: {stats}")
+        assert stats[MODO_MOVIMENTOS]["requests"] == 2
+        assert stats[MODO_MOVIMENTOS]["bytes"] == 2 * len(RESPONSE)
+        assert stats[MODO_MOVIMENTOS]["avg_parse_ms"] == 2.0
+        assert stats[MODO_COMPLETO]["requests"] == 1 and stats[MODO_COMPLETO]["parses"] == 0
+    finally:
+        Config.TJMS_WSDL_URL, tjms_client.consult_metrics = original_url, original_metrics
+        server.shutdown()
+    print("Consult metrics verification passed!")
+
+def test_soap_cache():
+    ok = "<r><sucesso>true</sucesso>{}</r>"
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return ok.format(len(calls))
+
+    def age(cache, numero, seconds):
+        path = cache.path(numero, MODO_MOVIMENTOS)
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SoapCache(tmp, ttl=60, stale_ttl=600)
+        print("Caching consultarProcesso responses...")
+        assert cache.get("0800041-28.2024.8.12.0051", MODO_MOVIMENTOS, fetch) == ok.format(1)
+        # Same digits, same entry; other mode, other entry
+        assert cache.get("08000412820248120051", MODO_MOVIMENTOS, fetch) == ok.format(1)
+        assert cache.get("08000412820248120051", MODO_COMPLETO, fetch) == ok.format(2)
+        assert cache.get("08000412820248120051", MODO_MOVIMENTOS, fetch, bypass=True) == ok.format(3)
+
+        # Stale: served immediately, refreshed in the background
+        age(cache, "08000412820248120051", 120)
+        assert cache.get("08000412820248120051", MODO_MOVIMENTOS, fetch) == ok.format(3)
+        for _ in range(100):
+            if not cache.stats()["refreshing"]:
+                break
+            time.sleep(0.01)
+        assert cache.get("08000412820248120051", MODO_MOVIMENTOS, fetch) == ok.format(4)
+
+        # Expired: fetched before answering
+        age(cache, "08000412820248120051", 1000)
+        assert cache.get("08000412820248120051", MODO_MOVIMENTOS, fetch) == ok.format(5)
+
+        # Failed responses are never stored
+        assert cache.get("1", MODO_MOVIMENTOS, lambda: "<r><sucesso>false</sucesso></r>")
+        assert cache.lookup("1", MODO_MOVIMENTOS) == (None, "miss")
+
+        async def afetch():
+            return fetch()
+
+        async def run():
+            first = await cache.aget("2", MODO_MOVIMENTOS, afetch)
+            second = await cache.aget("2", MODO_MOVIMENTOS, afetch)
+            return first, second
+
+        assert asyncio.run(run()) == (ok.format(6), ok.format(6))
+
+        stats = cache.stats()
+        print(f"Stats: {stats}")
+        assert stats["hits"] == 3 and stats["stale_hits"] == 1 and stats["bypasses"] == 1
+        assert stats["misses"] == 5 and stats["revalidations"] == 1
+    print("SOAP cache verification passed!")
+
+def test_throttle():
+    print("Rate limiting attempts with the token bucket...")
+    throttle = Throttle(rate=50, burst=5, min_concurrency=1, max_concurrency=4, failure_threshold=3, reset_timeout=0.3)
+    start = time.perf_counter()
+    for _ in range(20):
+        throttle.acquire()
+        throttle.release(False)
+    elapsed = time.perf_counter() - start
+    # 5 from the burst, the other 15 at 50/s
+    assert elapsed >= 0.25, elapsed
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/mni"
+    session = TJMSSession(pool_size=4, max_retries=0, backoff_factor=0, throttle=throttle)
+    try:
+        print("Tripping the circuit breaker with 503s...")
+        EchoHandler.failures_left = 3
+        for _ in range(3):
+            try:
+                session.post(url, b"x", timeout=5)
+                raise AssertionError("expected HTTP 503")
+            except Exception as e:
+                assert not isinstance(e, CircuitOpenError)
+        stats = throttle.stats()
+        assert stats["state"] == "open" and stats["concurrency_limit"] < 4
+
+        # Open: fail fast without touching the server
+        try:
+            session.post(url, b"x", timeout=5)
+            raise AssertionError("expected CircuitOpenError")
+        except CircuitOpenError:
+            pass
+
+        # After reset_timeout a probe goes through and closes the circuit
+        time.sleep(0.35)
+        assert throttle.state == "half_open"
+        assert session.post(url, b"x", timeout=5).content == RESPONSE
+        stats = throttle.stats()
+        print(f"Stats: {stats}")
+        assert stats["state"] == "closed" and stats["trips"] == 1 and stats["rejected"] == 1
+
+        print("Configuration errors are raised as themselves, not as overload...")
+        for _ in range(5):
+            try:
+                session.post("127.0.0.1/mni", b"x", timeout=5)
+                raise AssertionError("expected MissingSchema")
+            except requests.exceptions.MissingSchema:
+                pass
+
+        async def bad_url():
+            client = AsyncTJMSClient(pool_size=2, max_concurrent=2, max_retries=0, backoff_factor=0, throttle=throttle)
+            try:
+                for _ in range(5):
+                    try:
+                        await client._post(client._ensure_client(), "ftp://127.0.0.1/mni", b"x", 5)
+                        raise AssertionError("expected UnsupportedProtocol")
+                    except httpx.UnsupportedProtocol:
+                        pass
+            finally:
+                await client.aclose()
+
+        asyncio.run(bad_url())
+        assert throttle.state == "closed" and throttle.stats()["trips"] == 1
+    finally:
+        EchoHandler.failures_left = 0
+        session.close()
+        server.shutdown()
+    print("Throttle verification passed!")
+
+def test_stub_server():
+    original_url, original_cache = Config.TJMS_WSDL_URL, tjms_client.soap_cache
+    with StubTJMS(movimentos=40, documentos=60) as stub, tempfile.TemporaryDirectory() as tmp:
+        Config.TJMS_WSDL_URL = stub.url
+        tjms_client.soap_cache = SoapCache(tmp, ttl=0, stale_ttl=0)
+        try:
+            print("Consulting the stub MNI server in both modes...")
+            completo = tjms_client.soap_consultar_processo("0800041-28.2024.8.12.0051", modo=MODO_COMPLETO)
+            movimentos = tjms_client.soap_consultar_processo("0800041-28.2024.8.12.0051", modo=MODO_MOVIMENTOS)
+            assert completo.count("idDocumento=") == 60 and "idDocumento=" not in movimentos
+            process = parse_processo_xml(movimentos)
+            assert process.numero == "08000412820248120051" and len(process.movimentos) == 40
+            assert parse_processo_xml(completo).fingerprint == process.fingerprint
+            assert stub.requests == 2
+        finally:
+            Config.TJMS_WSDL_URL, tjms_client.soap_cache = original_url, original_cache
+    print("Stub server verification passed!")
+
+def _bulk_events(client, numeros):
+    # Runs the SSE request in a thread so a stream that never ends fails the test
+    result = {}
+
+    def run():
+        response = client.post("/processes/bulk", params={"cache": "false"}, json={"numeros": numeros})
+        result["events"] = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive(), "bulk stream never ended"
+    return result["events"]
+
+def test_bulk_endpoint():
+    from unittest.mock import patch
+    from fastapi.testclient import TestClient
+    from backend import database, blob_store
+    from backend.main import app
+
+    original_url = Config.TJMS_WSDL_URL
+    with StubTJMS(movimentos=10, documentos=5) as stub, tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_FILE = os.path.join(tmp, "bulk.db")
+        database.DB_FILE = os.path.join(tmp, "missing.json")
+        database.CLASSIFICATIONS_FILE = os.path.join(tmp, "missing_cls.json")
+        blob_store.BLOB_DIR = os.path.join(tmp, "blobs")
+        Config.TJMS_WSDL_URL = stub.url
+        try:
+            with TestClient(app) as client:
+                print("Bulk fetch with a failing database write...")
+                with patch("backend.routers.processes.merge_parsed", side_effect=sqlite3.OperationalError("database is locked")):
+                    events = _bulk_events(client, ["0800041-28.2024.8.12.0051", "0800042-28.2024.8.12.0051"])
+                errors = [e for e in events if e["type"] == "error"]
+                assert errors and "database is locked" in errors[0]["erro"]
+                assert events[-1]["type"] == "complete"
+
+                print("Bulk fetch of processes TJ-MS does not find...")
+                stub.not_found_rate = 1.0
+                events = _bulk_events(client, ["0800043-28.2024.8.12.0051", "0800044-28.2024.8.12.0051"])
+                items = [e for e in events if "status" in e]
+                assert [e["status"] for e in items] == ["erro", "erro"], items
+                assert all("não encontrado" in e["detalhe"] for e in items)
+                assert events[-1]["erros"] == 2 and events[-1]["novos"] == 0
+                response = client.post("/processes/0800045-28.2024.8.12.0051", params={"cache": "false"})
+                assert response.status_code == 404 and "não encontrado" in response.json()["detail"]
+                assert client.get("/processes/").json() == []
+        finally:
+            Config.TJMS_WSDL_URL = original_url
+            database.close_connection()
+    print("Bulk endpoint verification passed!")
+
+if __name__ == "__main__":
+    test_envelope()
+    test_connection_reuse()
+    test_async_client()
+    test_consult_metrics()
+    test_soap_cache()
+    test_throttle()
+    test_stub_server()
+    test_bulk_endpoint()
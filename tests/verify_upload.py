@@ -1,10 +1,20 @@
 import sys
 import os
+import io
+import json
+import tarfile
+import tempfile
+import zipfile
+from datetime import datetime
 from pathlib import Path
 
 # Add project root to path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+from backend import database, blob_store
+from backend.models import ClassificacaoResult
+from backend.repository import repository
+from backend.services.ingest import parse_upload, merge_parsed, iter_entries, detect_format
 from backend.services.xml_parser import parse_processo_xml
 
 def test_xml_parsing():
@@ -46,5 +56,186 @@ def test_xml_parsing():
     
     print("XML Parsing verification passed!")
 
+def test_fingerprint():
+    xml_content = """<?xml version="1.0" encoding="UTF-8"?>
+<resposta>
+    <mensagem>Consulta realizada em {timestamp}</mensagem>
+    <processo>
+        <dadosBasicos numero="5000000-00.2024.8.12.0001" classeProcessual="7" competencia="Cível"/>
+        <movimento dataHora="20240101100000">
+            <movimentoLocal codigoMovimento="456" descricao="{descricao}"/>
+        </movimento>
+    </processo>
+</resposta>
+"""
+    print("Computing fingerprints...")
+    base = parse_processo_xml(xml_content.format(timestamp="10:00", descricao="Juntada"))
+    noise = parse_processo_xml(xml_content.format(timestamp="11:30", descricao="Juntada "))
+    changed = parse_processo_xml(xml_content.format(timestamp="10:00", descricao="Sentença"))
+
+    assert base.xml_sha256 != noise.xml_sha256
+    assert base.fingerprint == noise.fingerprint
+    assert base.fingerprint != changed.fingerprint
+
+    print("Fingerprint verification passed!")
+
+def test_namespaced_response():
+    xml_content = """<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>
+<ns4:consultarProcessoResposta xmlns:ns2="http://www.cnj.jus.br/intercomunicacao-2.2.2" xmlns:ns4="http://www.cnj.jus.br/servico-intercomunicacao-2.2.2/">
+<processo>
+    <ns2:dadosBasicos numero="0800041-28.2024.8.12.0051" classeProcessual="7" competencia="24">
+        <ns2:polo polo="AT"><ns2:parte><ns2:pessoa nome="Fulano"><ns2:endereco><ns2:complemento>Casa</ns2:complemento></ns2:endereco></ns2:pessoa></ns2:parte></ns2:polo>
+        <ns2:assunto><ns2:codigoNacional>10433</ns2:codigoNacional></ns2:assunto>
+        <ns2:assunto><ns2:assuntoLocal codigoAssunto="1"/></ns2:assunto>
+    </ns2:dadosBasicos>
+    <ns2:movimento dataHora="20240302100000">
+        <ns2:complemento>Primeiro</ns2:complemento>
+        <ns2:movimentoNacional codigoNacional="51"><ns2:complemento>Segundo</ns2:complemento></ns2:movimentoNacional>
+    </ns2:movimento>
+    <ns2:movimento dataHora="20240301100000"><ns2:movimentoLocal codigoMovimento="9" descricao="Conclusos"/></ns2:movimento>
+    <ns2:documento idDocumento="1"><ns2:conteudo>""" + "QUFB" * 50000 + """</ns2:conteudo></ns2:documento>
+</processo>
+</ns4:consultarProcessoResposta></soap:Body></soap:Envelope>"""
+
+    print("Parsing namespaced SOAP response...")
+    process_data = parse_processo_xml(xml_content)
+    assert process_data.numero == "0800041-28.2024.8.12.0051"
+    assert process_data.assuntos == ["10433"]
+    assert [m.codigo for m in process_data.movimentos] == ["9", "51"]
+    assert process_data.movimentos[1].descricao == "Movimento Nacional 51"
+    assert process_data.movimentos[1].complemento == "Primeiro"
+    assert process_data.movimentos[0].complemento is None
+    assert process_data.xml_size == len(xml_content.encode("utf-8"))
+
+    print("Namespaced response verification passed!")
+
+def test_upload_merge():
+    xml_content = """<processo>
+    <dadosBasicos numero="{numero}" classeProcessual="7" competencia="Cível"/>
+    <movimento dataHora="20240101100000"><movimentoLocal codigoMovimento="456" descricao="{descricao}"/></movimento>
+</processo>"""
+
+    def upload(*files):
+        return merge_parsed([parse_upload(name, content.encode("utf-8")) for name, content in files])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_FILE = os.path.join(tmp, "upload.db")
+        database.DB_FILE = os.path.join(tmp, "missing.json")
+        database.CLASSIFICATIONS_FILE = os.path.join(tmp, "missing_cls.json")
+        blob_store.BLOB_DIR = os.path.join(tmp, "blobs")
+
+        print("Uploading new files...")
+        a = xml_content.format(numero="1", descricao="Juntada")
+        result = upload(("a.xml", a), ("a_copia.xml", a), ("b.xml", xml_content.format(numero="2", descricao="Juntada")), ("ruim.xml", "<processo>"))
+        assert (result.total, result.novos, result.ignorados, result.erros) == (4, 2, 1, 1)
+        assert [f.status for f in result.arquivos] == ["novo", "ignorado", "novo", "erro"]
+        assert repository.count() == 2
+
+        print("Re-uploading classified processes...")
+        database.save_classification_results([
+            ClassificacaoResult(numero_processo=n, classe_processual="7", classificacao={"tipo_intimacao": "X"}, data_classificacao=datetime.now())
+            for n in ("1", "2")
+        ])
+        result = upload(("a.xml", a), ("b.xml", xml_content.format(numero="2", descricao="Sentença")))
+        assert [f.status for f in result.arquivos] == ["ignorado", "atualizado"]
+        assert repository.is_classified("1") and not repository.is_classified("2")
+        assert repository.get("2").movimentos[0].descricao == "Sentença"
+
+        print("Rejecting a file without a process number...")
+        result = upload(("sem_numero.xml", "<processo><movimento dataHora='20240101100000'/></processo>"))
+        assert [f.status for f in result.arquivos] == ["erro"]
+        assert repository.get("") is None and repository.count() == 2
+        database.close_connection()
+
+    print("Upload merge verification passed!")
+
+def test_archive_entries():
+    xml = b"<processo><dadosBasicos numero='1'/></processo>"
+
+    print("Reading ZIP entries...")
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("lote/a.xml", xml)
+        archive.writestr("lote/leia-me.txt", b"ignorado")
+    assert detect_format(buffer.getvalue()[:4]) == "zip"
+    buffer.seek(0)
+    assert list(iter_entries(buffer, "zip")) == [("lote/a.xml", xml, None)]
+
+    print("Reading tar.gz entries...")
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        info = tarfile.TarInfo("b.xml")
+        info.size = len(xml)
+        archive.addfile(info, io.BytesIO(xml))
+    assert detect_format(buffer.getvalue()[:4]) == "tar.gz"
+    buffer.seek(0)
+    assert list(iter_entries(buffer, "tar.gz")) == [("b.xml", xml, None)]
+
+    print("Reading NDJSON entries...")
+    lines = [json.dumps({"arquivo": "c.xml", "xml": xml.decode()}), json.dumps(xml.decode()), "{quebrado"]
+    entries = list(iter_entries(io.BytesIO("\n".join(lines).encode()), "ndjson"))
+    assert entries[:2] == [("c.xml", xml, None), ("linha 2", xml, None)]
+    assert entries[2][0] == "linha 3" and entries[2][1] is None
+
+    print("Reading a corrupt archive...")
+    entries = list(iter_entries(io.BytesIO(b"PK\x03\x04lixo"), "zip"))
+    assert len(entries) == 1 and entries[0][1] is None
+
+    print("Archive entries verification passed!")
+
+def test_ingest_endpoint():
+    import asyncio
+    import sqlite3
+    from unittest.mock import patch
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    from backend.routers import processes
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for i in range(3):
+            zf.writestr(f"{i}.xml", f"<processo><dadosBasicos numero='{i}'/></processo>")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.SQLITE_FILE = os.path.join(tmp, "ingest.db")
+        blob_store.BLOB_DIR = os.path.join(tmp, "blobs")
+        with TestClient(app) as client:
+            print("Ingest with a failing database write...")
+            with patch("backend.routers.processes.merge_parsed", side_effect=sqlite3.OperationalError("disk I/O error")):
+                response = client.post("/processes/ingest", content=archive.getvalue(), headers={"Content-Type": "application/zip"})
+            events = [json.loads(line[6:]) for line in response.text.splitlines() if line.startswith("data: ")]
+            assert [e["type"] for e in events] == ["start", "error", "complete"], events
+            assert "disk I/O error" in events[1]["erro"]
+
+        print("Closing the spooled body when the stream never starts...")
+        spools = []
+
+        class TrackedSpool(tempfile.SpooledTemporaryFile):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                spools.append(self)
+
+        class FakeRequest:
+            headers = {"content-type": "application/zip"}
+
+            async def stream(self):
+                yield archive.getvalue()
+
+        async def abandoned():
+            with patch.object(processes.tempfile, "SpooledTemporaryFile", TrackedSpool):
+                response = await processes.ingest_archive(FakeRequest())
+            # Client gone before the body was iterated: only the background task runs
+            await response.background()
+
+        asyncio.run(abandoned())
+        assert len(spools) == 1 and spools[0].closed
+        database.close_connection()
+    print("Ingest endpoint verification passed!")
+
 if __name__ == "__main__":
     test_xml_parsing()
+    test_fingerprint()
+    test_namespaced_response()
+    test_upload_merge()
+    test_archive_entries()
+    test_ingest_endpoint()
@@ -0,0 +1,100 @@
+import sys
+import json
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.services import xml_parser
+from backend.services.xml_parser import parse_processo_xml, _parse_stdlib, _parse_lxml
+
+ROOT = Path(__file__).resolve().parent.parent
+PROCESSES_FILE = ROOT / "processes.json"
+
+MNI_RESPONSE = """<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>
+<ns4:consultarProcessoResposta xmlns="http://www.cnj.jus.br/tipos-servico-intercomunicacao-2.2.2" xmlns:ns2="http://www.cnj.jus.br/intercomunicacao-2.2.2" xmlns:ns4="http://www.cnj.jus.br/servico-intercomunicacao-2.2.2/">
+<sucesso>true</sucesso><mensagem>Consulta realizada com sucesso.</mensagem>
+<processo>
+    <ns2:dadosBasicos numero="0800041-28.2024.8.12.0051" classeProcessual="7" competencia="24">
+        <ns2:assunto principal="true"><ns2:codigoNacional>10433</ns2:codigoNacional></ns2:assunto>
+        <ns2:assunto><ns2:codigoNacional></ns2:codigoNacional></ns2:assunto>
+    </ns2:dadosBasicos>
+    <ns2:movimento dataHora="20240302100000">
+        <ns2:movimentoNacional codigoNacional="51"><ns2:complemento>Tipo de conclusão</ns2:complemento></ns2:movimentoNacional>
+    </ns2:movimento>
+    <ns2:movimento dataHora="20240301"><ns2:movimentoLocal codigoMovimento="9" descricao="Conclusos"/><ns2:complemento>Ação Penal</ns2:complemento></ns2:movimento>
+    <ns2:movimento dataHora="invalida"><ns2:movimentoLocal codigoMovimento="1" descricao="Sem data"/></ns2:movimento>
+</processo>
+</ns4:consultarProcessoResposta></soap:Body></soap:Envelope>"""
+
+UNQUALIFIED = """<?xml version="1.0" encoding="UTF-8"?>
+<processo>
+    <dadosBasicos numero="5000000-00.2024.8.12.0001" classeProcessual="7" competencia="Cível">
+        <assunto><codigoNacional>999</codigoNacional></assunto>
+    </dadosBasicos>
+    <movimento dataHora="20240101100000"><movimentoNacional codigoNacional="123"/></movimento>
+</processo>
+"""
+
+# Declared encoding differs from the (already decoded) string: both parsers must ignore it
+LATIN1_DECLARED = UNQUALIFIED.replace('encoding="UTF-8"', 'encoding="ISO-8859-1"').replace("Cível", "Cível – ação")
+
+# Other namespace: the lxml XPath queries don't match, so the stdlib parser handles it
+OTHER_NAMESPACE = MNI_RESPONSE.replace("intercomunicacao-2.2.2", "intercomunicacao-3.0.0")
+
+NO_DADOS_BASICOS = "<resposta><sucesso>false</sucesso><mensagem>Processo não encontrado</mensagem></resposta>"
+
+CASES = {
+    "mni_response": MNI_RESPONSE,
+    "unqualified": UNQUALIFIED,
+    "latin1_declared": LATIN1_DECLARED,
+    "other_namespace": OTHER_NAMESPACE,
+    "no_dados_basicos": NO_DADOS_BASICOS,
+}
+
+def assert_same(label, xml_content):
+    fast = parse_processo_xml(xml_content)
+    reference = _parse_stdlib(xml_content)
+    assert fast.model_dump() == reference.model_dump(), f"{label}: parsers disagree"
+    assert fast.xml_raw == reference.xml_raw == xml_content, label
+
+def test_synthetic_parity():
+    print(f"Parser backend: {xml_parser.PARSER_BACKEND}")
+    for label, xml_content in CASES.items():
+        print(f"Checking {label}...")
+        assert_same(label, xml_content)
+
+    process = parse_processo_xml(MNI_RESPONSE)
+    assert process.assuntos == ["10433"]
+    assert [(m.codigo, m.complemento) for m in process.movimentos] == [
+        ("1", None), ("9", "Ação Penal"), ("51", "Tipo de conclusão")
+    ]
+    assert parse_processo_xml(LATIN1_DECLARED).competencia == "Cível – ação"
+    assert parse_processo_xml(OTHER_NAMESPACE).numero == "0800041-28.2024.8.12.0051"
+    assert parse_processo_xml(NO_DADOS_BASICOS).numero == ""
+
+    if xml_parser.lxml_etree is not None:
+        assert _parse_lxml(MNI_RESPONSE) is not None
+        assert _parse_lxml(OTHER_NAMESPACE) is None
+
+    try:
+        parse_processo_xml("<processo><dadosBasicos></processo>")
+    except ET.ParseError:
+        pass
+    else:
+        raise AssertionError("malformed XML should raise ET.ParseError")
+
+    print("Synthetic parity verification passed!")
+
+def test_dataset_parity():
+    data = json.loads(PROCESSES_FILE.read_text(encoding="utf-8"))
+    samples = [p["xml_raw"] for p in data if p.get("xml_raw")]
+    print(f"Checking {len(samples)} responses from {PROCESSES_FILE.name}...")
+    for xml_content in samples:
+        assert_same(xml_content[:80], xml_content)
+    print("Dataset parity verification passed!")
+
+if __name__ == "__main__":
+    test_synthetic_parity()
+    test_dataset_parity()